@@ -0,0 +1,26 @@
+"""Benchmarks of the survey app.
+
+They run against a throw-away test database created with the settings of
+``DJANGO_SETTINGS_MODULE`` (``tests.settings`` by default).
+"""
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Set Django up and run the enclosed block on a fresh test database."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
@@ -0,0 +1,249 @@
+"""Benchmark of the render and submit hot paths of the survey app.
+
+Run with ``python -m benchmarks.hot_paths --questions 60``. A synthetic
+survey using every question type is built in a throw-away test database,
+then each hot path is timed and its query count and peak memory recorded.
+The JSON report can be written to a file with ``--output`` and compared
+between releases.
+
+The peak memory is traced with ``tracemalloc`` when it is available
+(Python 3). Otherwise it is the growth of the peak resident set size of
+the process, reset before each run on Linux: memory already held by the
+interpreter is reused without growing it, so it is a lower bound.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def build_survey(questions=60, categories=5, choices=5,
+                 display_by_question=False):
+    """Create a published survey using every question type in turn."""
+    from survey.models import Category, Question, Survey
+    survey = Survey.objects.create(
+        name='Benchmark survey', description='Synthetic survey',
+        is_published=True, display_by_question=display_by_question)
+    category_list = [
+        Category.objects.create(name='category%d' % i, survey=survey,
+                                order=i)
+        for i in range(categories)
+    ]
+    types = [t for t, label in Question.QUESTION_TYPES]
+    for i in range(questions):
+        question_type = types[i % len(types)]
+        if question_type == Question.SELECT_IMAGE:
+            options = ['c%d:/img/c%d.png' % (c, c) for c in range(choices)]
+        else:
+            options = ['choice %d' % c for c in range(choices)]
+        Question.objects.create(
+            survey=survey, order=i, text='Question %d' % i,
+            category=category_list[i % categories] if categories else None,
+            question_type=question_type, required=True,
+            choices=survey.separator.join(options))
+    return Survey.objects.get(pk=survey.pk)
+
+
+def answer_data(survey):
+    """Return POST data answering every question of a survey."""
+    from survey.models import Question
+    data = {}
+    for q in survey.questions():
+        name = 'question_%d' % q.pk
+        choices = q.get_choices() if q.choices else ()
+        if q.question_type == Question.INTEGER:
+            data[name] = '7'
+        elif q.question_type in (Question.TEXT, Question.SHORT_TEXT):
+            data[name] = 'Benchmark answer'
+        elif q.question_type == Question.SELECT_MULTIPLE:
+            data[name] = [c[0] for c in choices[:2]]
+        else:
+            data[name] = choices[0][0]
+    return data
+
+
+def reset_peak_rss():
+    """Reset the peak resident set size of the process, on Linux only."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of the process in kB, or None."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # reported in bytes
+        max_rss //= 1024
+    return max_rss
+
+
+def measure(func, repeat=5):
+    """Run func repeat times and return its timing, queries and memory."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    timings = []
+    queries = []
+    peak = None
+    for i in range(repeat):
+        gc.collect()
+        if tracemalloc is not None:
+            tracemalloc.start()
+        else:
+            # without a reset, only the growth above the previous peak of
+            # the process is seen
+            reset_peak_rss()
+            rss_before = peak_rss_kb()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.time()
+            func()
+            timings.append(time.time() - start)
+        queries.append(len(captured))
+        if tracemalloc is not None:
+            used = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        elif rss_before is not None:
+            used = peak_rss_kb() - rss_before
+        else:
+            used = None
+        if used is not None:
+            peak = max(peak or 0, used)
+    timings.sort()
+    return {
+        'wall_time': {
+            'min': timings[0],
+            'median': timings[len(timings) // 2],
+            'max': timings[-1],
+        },
+        'queries': max(queries),
+        'peak_memory_kb': peak,
+    }
+
+
+def run(questions=60, categories=5, choices=5, repeat=5):
+    """Run every benchmark and return the report as a dict."""
+    import django
+    from django.contrib.auth.models import AnonymousUser
+    from django.core.urlresolvers import reverse
+    from django.db import connection
+    from django.test import Client
+
+    from survey.forms import ResponseForm
+    from survey.schema import local_cache
+
+    survey = build_survey(questions, categories, choices)
+    step_survey = build_survey(questions, categories, choices,
+                               display_by_question=True)
+    data = answer_data(survey)
+    step_data = answer_data(step_survey)
+    client = Client()
+    detail_url = reverse('survey-detail', kwargs={'id': survey.pk})
+
+    def form_cold():
+        local_cache.clear()
+        ResponseForm(survey=survey, user=AnonymousUser())
+
+    def form_warm():
+        ResponseForm(survey=survey, user=AnonymousUser())
+
+    def form_save():
+        form = ResponseForm(data, survey=survey, user=AnonymousUser())
+        assert form.is_valid(), form.errors
+        form.save()
+
+    def detail_get():
+        assert client.get(detail_url).status_code == 200
+
+    def detail_post():
+        assert client.post(detail_url, data).status_code == 302
+
+    step_questions = list(step_survey.questions())
+
+    def step_post():
+        for step, question in enumerate(step_questions):
+            name = 'question_%d' % question.pk
+            url = reverse('survey-detail-step',
+                          kwargs={'id': step_survey.pk, 'step': step})
+            assert client.post(url, {name: step_data[name]}).status_code \
+                == 302
+
+    results = {}
+    for name, func in [
+        ('response_form_init_cold', form_cold),
+        ('response_form_init', form_warm),
+        ('response_form_save', form_save),
+        ('survey_detail_get', detail_get),
+        ('survey_detail_post', detail_post),
+        ('survey_detail_post_steps', step_post),
+    ]:
+        form_warm()
+        results[name] = measure(func, repeat)
+    results['survey_detail_post_steps']['steps'] = len(step_questions)
+    max_rss = peak_rss_kb()
+    return {
+        'config': {
+            'questions': questions,
+            'categories': categories,
+            'choices': choices,
+            'repeat': repeat,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'max_rss_kb': max_rss,
+            'memory_measure': 'tracemalloc' if tracemalloc else 'rss',
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--questions', type=int, default=60)
+    parser.add_argument('--categories', type=int, default=5)
+    parser.add_argument('--choices', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None,
+                        help="JSON report file, standard output by default.")
+    args = parser.parse_args(argv)
+
+    from benchmarks import test_database
+    with test_database():
+        report = run(args.questions, args.categories, args.choices,
+                     args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Benchmark of the write-behind ingestion against the synchronous saves.
+
+Run with ``python -m benchmarks.ingestion --responses 1000``. The same
+validated responses are saved with ``ResponseForm.save_values``, then
+appended to a spool (see survey.spool) and drained, in a throw-away test
+database. The report gives the throughput of each path in responses per
+second: the spool append is what a submission waits for, the drain is the
+sustained rate of the background writer.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.hot_paths import answer_data, build_survey
+
+
+def throughput(count, seconds):
+    return count / seconds if seconds else None
+
+
+def run(questions=20, responses=1000, batch_size=500):
+    """Run the benchmark and return the report as a dict."""
+    import django
+    from django.contrib.auth.models import AnonymousUser
+    from django.db import connection
+
+    from survey.forms import ResponseForm
+    from survey.spool import Spool, drain, spool_values
+
+    survey = build_survey(questions, categories=2)
+    data = answer_data(survey)
+    form = ResponseForm(data, survey=survey, user=AnonymousUser())
+    assert form.is_valid(), form.errors
+    values = form.cleaned_data
+
+    def new_form():
+        return ResponseForm(survey=survey, user=AnonymousUser())
+
+    start = time.time()
+    for i in range(responses):
+        new_form().save_values(values)
+    sync_time = time.time() - start
+
+    directory = tempfile.mkdtemp()
+    spool = Spool(os.path.join(directory, 'spool.sqlite3'))
+    try:
+        start = time.time()
+        for i in range(responses):
+            spool_values(new_form(), values, spool)
+        append_time = time.time() - start
+        start = time.time()
+        drained = 0
+        while True:
+            batch = drain(spool, batch_size=batch_size)
+            if not batch:
+                break
+            drained += batch
+        drain_time = time.time() - start
+    finally:
+        spool.close()
+        shutil.rmtree(directory)
+    assert drained == responses
+    return {
+        'config': {
+            'questions': questions,
+            'responses': responses,
+            'batch_size': batch_size,
+        },
+        'environment': {
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'results': {
+            'synchronous_save': throughput(responses, sync_time),
+            'spool_append': throughput(responses, append_time),
+            'spool_drain': throughput(responses, drain_time),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--responses', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--output', default=None,
+                        help="JSON report file, standard output by default.")
+    args = parser.parse_args(argv)
+
+    from benchmarks import test_database
+    with test_database():
+        report = run(args.questions, args.responses, args.batch_size)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Check that the hot lookups of the survey app use their indexes.
+
+Run with ``python -m benchmarks.query_plans``; it prints a JSON report
+with the query plan of each lookup and the index it is expected to use.
+The plans come from ``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` on
+PostgreSQL.
+"""
+import json
+import sys
+
+
+def explain(queryset):
+    """Return the query plan of a queryset as a list of lines."""
+    from django.db import connections
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return [' '.join(str(c) for c in row) for row in cursor.fetchall()]
+
+
+def index_name(model, columns):
+    """Return the name of the index of a model covering exactly columns."""
+    from django.db import connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table)
+    for name, constraint in constraints.items():
+        if constraint['index'] and constraint['columns'] == list(columns):
+            return name
+    return None
+
+
+def hot_queries():
+    """Return ``(label, queryset, model, indexed columns)`` tuples."""
+    from survey.models import AnswerBase, Category, Question, Response
+    return [
+        ('response by survey and user',
+         Response.objects.filter(survey=1, user=1),
+         Response, ('survey_id', 'user_id')),
+        ('response by interview uuid',
+         Response.objects.filter(interview_uuid='0' * 32),
+         Response, ('interview_uuid',)),
+        ('questions of a survey',
+         Question.objects.filter(survey=1).order_by('category__order',
+                                                    'order'),
+         Question, ('survey_id', 'category_id', 'order')),
+        ('categories of a survey',
+         Category.objects.filter(survey=1).order_by('order'),
+         Category, ('survey_id', 'order')),
+        ('answers of a response',
+         AnswerBase.objects.filter(response=1),
+         AnswerBase, ('response_id', 'question_id')),
+        ('answer of a response to a question',
+         AnswerBase.objects.filter(response=1, question=1),
+         AnswerBase, ('response_id', 'question_id')),
+    ]
+
+
+def report():
+    """Return the plan of every hot query and whether it uses its index."""
+    results = []
+    for label, queryset, model, columns in hot_queries():
+        plan = explain(queryset)
+        index = index_name(model, columns)
+        results.append({
+            'query': label,
+            'index': index,
+            'uses_index': bool(index) and any(index in line for line in plan),
+            'plan': plan,
+        })
+    return results
+
+
+def main():
+    from benchmarks import test_database
+    with test_database() as connection:
+        results = report()
+        json.dump({'vendor': connection.vendor, 'queries': results},
+                  sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0 if all(r['uses_index'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,10 +9,10 @@ setup(
     license="AGPL",
     url="https://github.com/jibaku/tanuki/",
     description="""Create dynamic forms in Django""".strip(),
-    packages=find_packages(exclude=[]),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     install_requires=[
-        'Django>=1.4',
+        'Django>=1.8',
     ],
     classifiers=[
         "Development Status :: 3 - Alpha",
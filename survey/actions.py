@@ -1,4 +1,10 @@
-from django.utils.translation import ungettext, ugettext_lazy
+from django.contrib import messages
+from django.http import StreamingHttpResponse
+from django.utils.translation import ugettext, ungettext, ugettext_lazy
+
+from .export import EXPORT_FORMATS
+from .listing import invalidate_survey_list
+from .routers import replica_database
 
 
 # Actions
@@ -7,6 +13,8 @@ def make_published(modeladmin, request, queryset):
     Mark the given survey as published
     """
     count = queryset.update(is_published=True)
+    # update() does not send the signals refreshing the cached list
+    invalidate_survey_list()
     message = ungettext(
         u'%(count)d survey was successfully marked as published.',
         u'%(count)d surveys were successfully marked as published',
@@ -16,3 +24,39 @@ def make_published(modeladmin, request, queryset):
 make_published.short_description = ugettext_lazy(
     u"Mark selected surveys as published"
 )
+
+
+def export_responses(export_format, description):
+    """
+    Build an action streaming the responses of the selected survey.
+    """
+    def action(modeladmin, request, queryset):
+        surveys = list(queryset[:2])
+        if len(surveys) != 1:
+            modeladmin.message_user(
+                request,
+                ugettext(u'Select exactly one survey to export.'),
+                level=messages.WARNING
+            )
+            return None
+        survey = surveys[0]
+        lines, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(lines(survey,
+                                               using=replica_database()),
+                                         content_type=content_type)
+        filename = 'survey-%d-responses.%s' % (survey.pk, export_format)
+        response['Content-Disposition'] = (
+            'attachment; filename="%s"' % filename
+        )
+        return response
+    action.__name__ = 'export_responses_%s' % export_format
+    action.short_description = description
+    return action
+
+
+export_responses_csv = export_responses(
+    'csv', ugettext_lazy(u"Export responses of the selected survey (CSV)")
+)
+export_responses_jsonl = export_responses(
+    'jsonl', ugettext_lazy(u"Export responses of the selected survey (JSONL)")
+)
@@ -1,9 +1,19 @@
+from django.conf.urls import url
 from django.contrib import admin
-
-from .models import Question, Category, Survey, Response, AnswerText
-from .models import AnswerRadio, AnswerSelect
-from .models import AnswerInteger, AnswerSelectMultiple
-from .actions import make_published
+from django.core.urlresolvers import reverse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.utils.encoding import force_text
+from django.utils.html import format_html, format_html_join
+from django.utils.translation import ugettext_lazy as _
+
+from .models import Question, Category, Survey, Response
+from .analytics import (answer_counts, crosstab, numeric_summary,
+                        parse_filters, response_count)
+from .answers import response_answers
+from .instrumentation import RingBufferSink
+from .actions import (make_published, export_responses_csv,
+                      export_responses_jsonl)
 
 
 class QuestionInline(admin.TabularInline):
@@ -18,51 +28,116 @@ class CategoryInline(admin.TabularInline):
 
 
 class SurveyAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_published', 'need_logged_user', 'template')
+    list_display = ('name', 'is_published', 'need_logged_user', 'template',
+                    'results_link')
     list_filter = ('is_published', 'need_logged_user')
     inlines = [CategoryInline, QuestionInline]
-    actions = [make_published]
-
-
-class AnswerBaseInline(admin.StackedInline):
-    fields = ('question', 'body')
-    readonly_fields = ('question',)
-    extra = 0
-
-
-class AnswerTextInline(AnswerBaseInline):
-    model = AnswerText
-
-
-class AnswerRadioInline(AnswerBaseInline):
-    model = AnswerRadio
-
-
-class AnswerSelectInline(AnswerBaseInline):
-    model = AnswerSelect
-
-
-class AnswerSelectMultipleInline(AnswerBaseInline):
-    model = AnswerSelectMultiple
-
-
-class AnswerIntegerInline(AnswerBaseInline):
-    model = AnswerInteger
+    actions = [make_published, export_responses_csv, export_responses_jsonl]
+
+    def get_urls(self):
+        urls = [
+            url(r'^metrics/$', self.admin_site.admin_view(self.metrics_view),
+                name='survey_survey_metrics'),
+            url(r'^(\d+)/results/$',
+                self.admin_site.admin_view(self.results_view),
+                name='survey_survey_results'),
+        ]
+        return urls + super(SurveyAdmin, self).get_urls()
+
+    def results_link(self, obj):
+        return format_html(u'<a href="{}">{}</a>',
+                           reverse('admin:survey_survey_results',
+                                   args=(obj.pk,)),
+                           _(u'Results'))
+    results_link.short_description = _(u'results')
+
+    def metrics_view(self, request):
+        """Show the metrics kept by the RingBufferSink."""
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_(u'Survey views metrics'),
+            opts=self.model._meta,
+            entries=RingBufferSink.entries(),
+        )
+        return TemplateResponse(request, 'admin/survey/metrics.html',
+                                context)
+
+    def results_view(self, request, object_id):
+        """
+        Show the answer counts of the questions of a survey, optionally
+        filtered, and the crosstab of two of its questions.
+
+        The query string is the one of the analytics JSON endpoint, see
+        ``survey.analytics.survey_results``.
+        """
+        survey = get_object_or_404(Survey, pk=object_id)
+        questions = list(survey.questions())
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_(u'Results of %s') % survey.name,
+            opts=self.model._meta,
+            survey=survey,
+            questions=questions,
+        )
+        try:
+            filters = parse_filters(dict((q.pk, q) for q in questions),
+                                    request.GET)
+        except ValueError as e:
+            context['error'] = e
+            filters = []
+        context['filters'] = filters
+        context['responses'] = response_count(survey, filters)
+        results = []
+        for question in questions:
+            if question.question_type == Question.INTEGER:
+                results.append((question, None,
+                                numeric_summary(question, filters)))
+            elif question.question_type in Question.CHOICES_TYPES:
+                results.append((question, answer_counts(question, filters),
+                                None))
+        context['results'] = results
+        by_pk = dict((str(q.pk), q) for q in questions)
+        row = by_pk.get(request.GET.get('row'))
+        column = by_pk.get(request.GET.get('column'))
+        if row is not None and column is not None:
+            table = crosstab(row, column, filters)
+            context['crosstab'] = {
+                'row': row, 'column': column, 'columns': table['columns'],
+                'rows': list(zip(table['rows'], table['counts'])),
+            }
+        return TemplateResponse(request, 'admin/survey/results.html',
+                                context)
 
 
 class ResponseAdmin(admin.ModelAdmin):
     list_display = ('interview_uuid', 'survey', 'created', 'user')
     list_filter = ('survey', 'created')
+    list_select_related = ('survey', 'user')
     date_hierarchy = 'created'
-    inlines = [
-        AnswerTextInline, AnswerRadioInline, AnswerSelectInline,
-        AnswerSelectMultipleInline, AnswerIntegerInline
-    ]
     # specifies the order as well as which fields to act on
     readonly_fields = (
-        'survey', 'created', 'updated', 'interview_uuid', 'user'
+        'survey', 'created', 'updated', 'interview_uuid', 'user', 'answers'
     )
 
+    def answers(self, obj):
+        """Show the answers of every type in one table."""
+        if obj.pk is None:
+            return u''
+        rows = format_html_join(
+            u'\n', u'<tr><th>{}</th><td>{}</td></tr>',
+            ((question.text, self.answer_display(value))
+             for question, value in response_answers(obj))
+        )
+        return format_html(u'<table>{}</table>', rows)
+    answers.short_description = _(u'answers')
+
+    def answer_display(self, value):
+        if value is None:
+            return u''
+        if isinstance(value, (list, tuple)):
+            return u', '.join(force_text(v) for v in value)
+        return force_text(value)
+
 
 admin.site.register(Survey, SurveyAdmin)
 admin.site.register(Response, ResponseAdmin)
@@ -0,0 +1,318 @@
+"""Cross-tabulations, filtered counts and numeric summaries of answers.
+
+Each result is computed by grouped queries over the answer tables: the
+answers to a question are read as ``(response, value)`` rows, joined on
+the response when several questions are involved, so no per-response row
+is loaded in Python. Both answer stores are supported (see survey.answers),
+the archived responses are not included.
+
+Filters restrict the responses taken into account, answers to the same
+question must match one of the values or the bounds of the filter::
+
+    filters = [Filter(gender, values=['woman']), Filter(age, minimum=18)]
+    crosstab(q5, q2, filters)
+"""
+import math
+
+from django.db import connections
+from django.db.models import (Avg, Count, ExpressionWrapper, F, IntegerField,
+                              Max, Min, Value)
+
+from survey.answers import unified_store
+from survey.models import (Answer, AnswerInteger, AnswerRadio, AnswerSelect,
+                           AnswerSelectMultipleChoice, AnswerText, Question,
+                           Response)
+
+HISTOGRAM_BINS = 10
+
+LEGACY_MODELS = {
+    Question.TEXT: AnswerText,
+    Question.SHORT_TEXT: AnswerText,
+    Question.RADIO: AnswerRadio,
+    Question.SELECT: AnswerSelect,
+    Question.SELECT_IMAGE: AnswerSelect,
+    Question.INTEGER: AnswerInteger,
+}
+
+
+class Filter(object):
+    """Keep the responses whose answer to a question matches."""
+
+    def __init__(self, question, values=None, minimum=None, maximum=None):
+        self.question = question
+        self.values = values
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def responses(self, unified=None):
+        """Return the ids of the matching responses, as a subquery."""
+        qs, response_field, value_field = _source(self.question, unified)
+        if self.values is not None:
+            qs = qs.filter(**{value_field + '__in': self.values})
+        if self.minimum is not None:
+            qs = qs.filter(**{value_field + '__gte': self.minimum})
+        if self.maximum is not None:
+            qs = qs.filter(**{value_field + '__lte': self.maximum})
+        return qs.values(response_field)
+
+
+def _source(question, unified=None):
+    """
+    Return the answers to a question with the names of their response and
+    value fields.
+    """
+    if unified is None:
+        unified = unified_store()
+    if unified:
+        if question.question_type == Question.INTEGER:
+            value_field = 'number'
+        elif question.question_type in Question.CHOICES_TYPES:
+            value_field = 'choice'
+        else:
+            value_field = 'text'
+        return Answer.objects.filter(question=question), 'response', \
+            value_field
+    if question.question_type == Question.SELECT_MULTIPLE:
+        return AnswerSelectMultipleChoice.objects.filter(question=question), \
+            'answer__response', 'choice'
+    model = LEGACY_MODELS[question.question_type]
+    return model.objects.filter(question=question), 'response', 'body'
+
+
+def _answers(question, filters=(), unified=None):
+    """Return the answers to a question having a value, like ``_source``."""
+    qs, response_field, value_field = _source(question, unified)
+    qs = qs.exclude(**{value_field: None})
+    if question.question_type != Question.INTEGER:
+        qs = qs.exclude(**{value_field: ''})
+    for answer_filter in filters:
+        qs = qs.filter(**{response_field + '__in':
+                          answer_filter.responses(unified)})
+    return qs.order_by(), response_field, value_field
+
+
+def order_values(question, values):
+    """Sort the values of the answers to a question, choices first."""
+    if question.question_type in Question.CHOICES_TYPES:
+        order = dict((value, i) for i, (value, label)
+                     in enumerate(question.get_choices()))
+        return sorted(values, key=lambda v: (order.get(v, len(order)), v))
+    return sorted(values)
+
+
+def response_count(survey, filters=(), unified=None):
+    """Return the number of responses to a survey matching the filters."""
+    qs = Response.objects.filter(survey=survey)
+    for answer_filter in filters:
+        qs = qs.filter(pk__in=answer_filter.responses(unified))
+    return qs.count()
+
+
+def answer_counts(question, filters=(), unified=None):
+    """
+    Return the ``(value, count)`` of the answers to a question.
+
+    The choices of select multiple answers are counted separately.
+    """
+    qs, response_field, value_field = _answers(question, filters, unified)
+    counts = dict(qs.values_list(value_field).annotate(count=Count('pk')))
+    return [(value, counts[value])
+            for value in order_values(question, counts)]
+
+
+def crosstab(row_question, column_question, filters=(), unified=None):
+    """
+    Count the responses by their answers to two questions.
+
+    Return the ordered values of the ``rows`` and ``columns`` and the
+    ``counts`` table, with a list of counts per row. A response is counted
+    in every cell matching its answers, once per pair of choices for the
+    select multiple questions.
+    """
+    queries = []
+    params = []
+    rows, response_field, value_field = _answers(row_question, filters,
+                                                 unified)
+    columns, column_response_field, column_value_field = _answers(
+        column_question, unified=unified)
+    for qs, response, value in ((rows, response_field, value_field),
+                                (columns, column_response_field,
+                                 column_value_field)):
+        qs = qs.annotate(response_key=F(response), value_key=F(value))
+        sql, sql_params = qs.values_list(
+            'response_key', 'value_key').query.sql_with_params()
+        queries.append(sql)
+        params.extend(sql_params)
+    sql = ('SELECT r.value_key, c.value_key, COUNT(*) '
+           'FROM (%s) r INNER JOIN (%s) c ON r.response_key = c.response_key '
+           'GROUP BY r.value_key, c.value_key' % tuple(queries))
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        cells = dict(((row, column), count)
+                     for row, column, count in cursor.fetchall())
+    return crosstab_table(row_question, column_question, cells)
+
+
+def crosstab_table(row_question, column_question, cells):
+    """Return the crosstab of ``{(row value, column value): count}``."""
+    row_values = order_values(row_question, set(row for row, c in cells))
+    column_values = order_values(column_question,
+                                 set(column for r, column in cells))
+    return {
+        'rows': row_values,
+        'columns': column_values,
+        'counts': [[cells.get((row, column), 0) for column in column_values]
+                   for row in row_values],
+    }
+
+
+def bucket_width(minimum, maximum, bins=HISTOGRAM_BINS):
+    """Return the width of the histogram buckets of integer values."""
+    return int(math.ceil((maximum - minimum + 1) / float(bins)))
+
+
+def histogram(minimum, maximum, width, counts):
+    """
+    Return the histogram buckets of integer values from
+    ``{bucket number: count}``, numbered from ``minimum``.
+    """
+    buckets = []
+    for bucket in range((maximum - minimum) // width + 1):
+        start = minimum + bucket * width
+        buckets.append({'start': start, 'end': start + width - 1,
+                        'count': counts.get(bucket, 0)})
+    return buckets
+
+
+def numeric_summary(question, filters=(), bins=HISTOGRAM_BINS,
+                    unified=None):
+    """
+    Summarize the answers to an integer question.
+
+    Return their ``count``, ``mean``, ``median``, ``minimum``, ``maximum``
+    and a ``histogram`` of at most ``bins`` buckets of equal width, each
+    one a ``{'start', 'end', 'count'}`` dict with inclusive bounds.
+    """
+    qs, response_field, value_field = _answers(question, filters, unified)
+    summary = qs.aggregate(count=Count(value_field), mean=Avg(value_field),
+                           minimum=Min(value_field), maximum=Max(value_field))
+    summary['median'] = None
+    summary['histogram'] = []
+    count = summary['count']
+    if not count:
+        return summary
+    # only the one or two middle values are read
+    middle = qs.order_by(value_field).values_list(value_field, flat=True)
+    middle = list(middle[(count - 1) // 2:count // 2 + 1])
+    summary['median'] = sum(middle) / float(len(middle))
+
+    minimum, maximum = summary['minimum'], summary['maximum']
+    width = bucket_width(minimum, maximum, bins)
+    counts = dict(qs.annotate(bucket=ExpressionWrapper(
+        (F(value_field) - Value(minimum)) / Value(width),
+        output_field=IntegerField()
+    )).values_list('bucket').annotate(count=Count('pk')))
+    summary['histogram'] = histogram(minimum, maximum, width, counts)
+    return summary
+
+
+def parse_filters(questions, query):
+    """
+    Return the filters of a query string.
+
+    ``questions`` maps the question ids of the survey to the questions.
+    ``filter=<question id>:<value>`` keeps the responses with this answer,
+    ``min=<question id>:<n>`` and ``max=<question id>:<n>`` bound the
+    answers of integer questions only. Raise ValueError if a filter is
+    invalid.
+    """
+    filters = {}
+    for param in ('filter', 'min', 'max'):
+        for item in query.getlist(param):
+            question_id, sep, value = item.partition(':')
+            try:
+                question = questions[int(question_id)]
+            except (ValueError, KeyError):
+                raise ValueError("Unknown question %r." % question_id)
+            answer_filter = filters.setdefault(question.pk, Filter(question))
+            if param == 'filter':
+                answer_filter.values = (answer_filter.values or []) + [value]
+                continue
+            if question.question_type != Question.INTEGER:
+                raise ValueError("Question %d is not an integer question." %
+                                 question.pk)
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError("Invalid bound %r." % value)
+            if param == 'min':
+                answer_filter.minimum = value
+            else:
+                answer_filter.maximum = value
+    return [filters[pk] for pk in sorted(filters)]
+
+
+class DatabaseResults(object):
+    """
+    The results of a survey read from the answer tables, with the methods
+    of ``survey.snapshot.Snapshot``.
+    """
+
+    def __init__(self, survey):
+        self.survey = survey
+
+    def response_count(self, filters=()):
+        return response_count(self.survey, filters)
+
+    def answer_counts(self, question, filters=()):
+        return answer_counts(question, filters)
+
+    def crosstab(self, row_question, column_question, filters=()):
+        return crosstab(row_question, column_question, filters)
+
+    def numeric_summary(self, question, filters=(), bins=HISTOGRAM_BINS):
+        return numeric_summary(question, filters, bins)
+
+
+def survey_results(survey, query, snapshot=None):
+    """
+    Return the results of a survey asked by a query string, as a dict.
+
+    ``question=<id>`` gives the answer counts of a question, and the summary
+    of the integer questions, ``row=<id>&column=<id>`` the crosstab of two
+    questions. See ``parse_filters`` for the filters. Raise ValueError if
+    the query is invalid.
+
+    The results are computed from ``snapshot`` (see survey.snapshot) when
+    it holds the answers of the questions involved, and the date of its
+    newest response is given as ``snapshot``.
+    """
+    questions = dict((q.pk, q) for q in survey.questions())
+    filters = parse_filters(questions, query)
+
+    def get_question(param):
+        try:
+            return questions[int(query[param])]
+        except (ValueError, KeyError):
+            raise ValueError("Unknown %s question." % param)
+    if 'row' in query or 'column' in query:
+        asked = [get_question('row'), get_question('column')]
+    else:
+        asked = [get_question('question')]
+    results = {}
+    source = DatabaseResults(survey)
+    if snapshot is not None and snapshot.covers(
+            asked + [f.question for f in filters]):
+        source = snapshot
+        results['snapshot'] = snapshot.high_water
+    results['responses'] = source.response_count(filters)
+    if len(asked) == 2:
+        results.update(source.crosstab(asked[0], asked[1], filters))
+        results.update({'row': asked[0].pk, 'column': asked[1].pk})
+    else:
+        question = asked[0]
+        results['question'] = question.pk
+        results['counts'] = source.answer_counts(question, filters)
+        if question.question_type == Question.INTEGER:
+            results['summary'] = source.numeric_summary(question, filters)
+    return results
@@ -0,0 +1,402 @@
+"""Batched persistence and retrieval of survey answers.
+
+The answer models use multi-table inheritance (every ``Answer*`` row has a
+parent ``AnswerBase`` row), which ``bulk_create`` does not support. The
+helpers below work around it: the parent rows are inserted with a single
+``bulk_create``, their primary keys are read back with one query and the
+child rows are then inserted with one multi-row insert per answer table.
+The choices of select multiple answers are also stored one per row in
+``AnswerSelectMultipleChoice``.
+
+When ``TANUKI_ANSWER_STORE`` is ``'unified'``, the answers are stored in
+the single ``Answer`` table instead, with typed value columns, so saving or
+reading answers takes a single query. The answer objects handled by the
+code are still the legacy ones, only the storage differs. The
+``migrate_answers`` command moves the existing answers from one store to
+the other. It can run once the setting is switched, as the responses saved
+meanwhile are already in the target store, and run again to move the
+stragglers.
+"""
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from survey.models import (Answer, AnswerBase, AnswerInteger, AnswerRadio,
+                           AnswerSelect, AnswerSelectMultiple,
+                           AnswerSelectMultipleChoice, AnswerText, Question,
+                           Response)
+from survey.completion import record_completion
+from survey.outbox import enqueue, enqueue_many
+from survey.stats import record_answers
+from survey.utils import parse_multiple
+
+# maximum number of ids in the IN clause of the queries reading back the
+# primary keys of bulk inserted rows (SQLite allows 999 parameters)
+LOOKUP_BATCH_SIZE = 500
+
+ANSWER_MODELS = {
+    Question.TEXT: AnswerText,
+    Question.SHORT_TEXT: AnswerText,
+    Question.RADIO: AnswerRadio,
+    Question.SELECT: AnswerSelect,
+    Question.SELECT_IMAGE: AnswerSelect,
+    Question.SELECT_MULTIPLE: AnswerSelectMultiple,
+    Question.INTEGER: AnswerInteger,
+}
+
+
+CHOICE_MAX_LENGTH = Answer._meta.get_field('choice').max_length
+
+
+def unified_store():
+    """Return True if the answers are stored in the unified Answer table."""
+    return getattr(settings, 'TANUKI_ANSWER_STORE', 'legacy') == 'unified'
+
+
+def build_answer(question, value):
+    """Return an unsaved answer object of the right type for the question."""
+    answer_class = ANSWER_MODELS[question.question_type]
+    return answer_class(question=question, body=value)
+
+
+def _insert_children(model, objs, using):
+    """Insert the child table rows of already saved answers."""
+    connection = connections[using]
+    fields = [model._meta.pk, model._meta.get_field('body')]
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        model._base_manager._insert(objs[start:start + batch_size],
+                                    fields=fields, using=using)
+
+
+def _selected_choices(answers):
+    """Return the normalized rows of the choices of saved multiple answers."""
+    max_length = AnswerSelectMultipleChoice._meta.get_field(
+        'choice').max_length
+    rows = []
+    for answer in answers:
+        choices = answer.body
+        if not isinstance(choices, (list, tuple)):
+            choices = parse_multiple(choices)
+        for choice in choices:
+            rows.append(AnswerSelectMultipleChoice(
+                answer_id=answer.pk, question_id=answer.question_id,
+                choice=choice[:max_length]
+            ))
+    return rows
+
+
+def unified_rows(answer):
+    """Return the unsaved Answer rows storing an answer object."""
+    question_type = answer.question.question_type
+    row = dict(response_id=answer.response_id,
+               question_id=answer.question_id, kind=question_type)
+    if question_type == Question.SELECT_MULTIPLE:
+        choices = answer.body
+        if not isinstance(choices, (list, tuple)):
+            choices = parse_multiple(choices)
+        if not choices:
+            return [Answer(**row)]
+        return [Answer(choice=choice[:CHOICE_MAX_LENGTH], **row)
+                for choice in choices]
+    if question_type == Question.INTEGER:
+        return [Answer(number=answer.body, **row)]
+    if question_type in Question.CHOICES_TYPES:
+        choice = answer.body
+        if choice is not None:
+            choice = choice[:CHOICE_MAX_LENGTH]
+        return [Answer(choice=choice, **row)]
+    return [Answer(text=answer.body, **row)]
+
+
+def bulk_create_answers(answers, unified=None):
+    """
+    Save a list of unsaved answer objects.
+
+    The answers must already be linked to a saved response. A response can
+    only hold one answer per question, which is what is used to match the
+    parent rows with their primary keys once inserted. ``unified`` forces
+    the store to write to, the configured one is used by default.
+    """
+    if not answers:
+        return answers
+    if unified is None:
+        unified = unified_store()
+    if unified:
+        rows = []
+        for answer in answers:
+            rows.extend(unified_rows(answer))
+        using = router.db_for_write(Answer)
+        Answer.objects.using(using).bulk_create(rows)
+        return answers
+    using = router.db_for_write(AnswerBase)
+    with transaction.atomic(using=using):
+        parents = [
+            AnswerBase(question_id=a.question_id, response_id=a.response_id)
+            for a in answers
+        ]
+        AnswerBase.objects.using(using).bulk_create(parents)
+        response_ids = list(set(a.response_id for a in answers))
+        pk_map = {}
+        for start in range(0, len(response_ids), LOOKUP_BATCH_SIZE):
+            pks = AnswerBase.objects.using(using).filter(
+                response__in=response_ids[start:start + LOOKUP_BATCH_SIZE]
+            ).values_list('response_id', 'question_id', 'pk')
+            pk_map.update(((r, q), pk) for r, q, pk in pks)
+
+        by_model = {}
+        for answer, parent in zip(answers, parents):
+            answer.answerbase_ptr_id = answer.id = pk_map[
+                (answer.response_id, answer.question_id)]
+            answer.created = parent.created
+            answer.updated = parent.updated
+            by_model.setdefault(type(answer), []).append(answer)
+        for model, objs in by_model.items():
+            _insert_children(model, objs, using)
+        AnswerSelectMultipleChoice.objects.using(using).bulk_create(
+            _selected_choices(by_model.get(AnswerSelectMultiple, ()))
+        )
+    return answers
+
+
+def save_response(response, answers, event=None):
+    """
+    Save a response with its answers, update the statistics and record the
+    completion of the survey by the user.
+
+    If given, the survey_completed payload ``event`` is written in the
+    outbox. Everything is written in a single transaction.
+    """
+    using = router.db_for_write(response.__class__, instance=response)
+    with transaction.atomic(using=using):
+        response.save(using=using)
+        for answer in answers:
+            answer.response = response
+        bulk_create_answers(answers)
+        record_answers(answers)
+        record_completion(response)
+        if event is not None:
+            enqueue(response, event)
+    return response
+
+
+def insert_responses(responses, using=None):
+    """
+    Insert unsaved responses and set their primary keys.
+
+    The responses must have an ``interview_uuid``, which is used to read
+    back their primary keys. Their ``created`` and ``updated`` dates are
+    kept when they are set, unlike with ``bulk_create``, and set to now
+    otherwise.
+    """
+    using = using or router.db_for_write(Response)
+    now = timezone.now()
+    for response in responses:
+        if response.created is None:
+            response.created = now
+        if response.updated is None:
+            response.updated = now
+    connection = connections[using]
+    fields = [f for f in Response._meta.concrete_fields if not f.primary_key]
+    batch_size = max(connection.ops.bulk_batch_size(fields, responses), 1)
+    for start in range(0, len(responses), batch_size):
+        Response._base_manager._insert(responses[start:start + batch_size],
+                                       fields=fields, using=using, raw=True)
+    uuids = [response.interview_uuid for response in responses]
+    pk_map = {}
+    for start in range(0, len(uuids), LOOKUP_BATCH_SIZE):
+        pk_map.update(Response.objects.using(using).filter(
+            interview_uuid__in=uuids[start:start + LOOKUP_BATCH_SIZE]
+        ).values_list('interview_uuid', 'pk'))
+    for response in responses:
+        response.pk = pk_map[response.interview_uuid]
+
+
+def save_responses(items):
+    """
+    Save several responses with their answers in a single transaction.
+
+    ``items`` is a list of ``(response, answers, event)`` tuples, handled
+    like the arguments of ``save_response``. The responses are inserted by
+    ``insert_responses``. The number of queries does not depend on the
+    number of responses, except for the completions of the logged users.
+    """
+    if not items:
+        return []
+    using = router.db_for_write(Response)
+    responses = [response for response, answers, event in items]
+    with transaction.atomic(using=using):
+        insert_responses(responses, using)
+        all_answers = []
+        events = []
+        for response, answers, event in items:
+            for answer in answers:
+                answer.response = response
+            all_answers.extend(answers)
+            if event is not None:
+                events.append((response, event))
+        bulk_create_answers(all_answers)
+        record_answers(all_answers)
+        for response in responses:
+            record_completion(response)
+        enqueue_many(events)
+    return responses
+
+
+def answer_values(response_ids, using=None, unified=None):
+    """
+    Return the answers of the given responses.
+
+    The result maps each response id to a ``{question_id: value}`` dict. It
+    takes one query per answer table, whatever the number of responses.
+    ``unified`` forces the store to read, the configured one is used by
+    default.
+    """
+    values = dict((pk, {}) for pk in response_ids)
+    if not values:
+        return values
+    if unified is None:
+        unified = unified_store()
+    if unified:
+        qs = Answer.objects.using(using).filter(response__in=response_ids)
+        rows = qs.order_by('pk').values_list(
+            'response_id', 'question_id', 'kind', 'text', 'number', 'choice')
+        for response_id, question_id, kind, text, number, choice in \
+                rows.iterator():
+            values[response_id][question_id] = _unified_value(
+                values[response_id].get(question_id), kind, text, number,
+                choice)
+        return values
+    for model in (AnswerText, AnswerRadio, AnswerSelect, AnswerSelectMultiple,
+                  AnswerInteger):
+        qs = model.objects.using(using).filter(response__in=response_ids)
+        rows = qs.values_list('response_id', 'question_id', 'body')
+        for response_id, question_id, body in rows.iterator():
+            if model is AnswerSelectMultiple:
+                body = parse_multiple(body)
+            values[response_id][question_id] = body
+    return values
+
+
+def _unified_value(current, kind, text, number, choice):
+    """Return the value of an answer once a row of it is read."""
+    if kind == Question.SELECT_MULTIPLE:
+        current = current or []
+        if choice is not None:
+            current.append(choice)
+        return current
+    if kind == Question.INTEGER:
+        return number
+    if kind in Question.CHOICES_TYPES:
+        return choice
+    return text
+
+
+# accessors of the answer tables from AnswerBase
+ANSWER_ACCESSORS = ('answertext', 'answerradio', 'answerselect',
+                    'answerselectmultiple', 'answerinteger')
+
+
+def response_answers(response, using=None):
+    """
+    Return the ``(question, value)`` answers of a response, in the order of
+    the questions.
+
+    The answers of every type and their questions are read with a single
+    query.
+    """
+    order = ('question__category__order', 'question__order')
+    if unified_store():
+        qs = Answer.objects.using(using).filter(response=response)
+        qs = qs.select_related('question').order_by(*order + ('pk',))
+        answers = []
+        for row in qs:
+            if answers and answers[-1][0].pk == row.question_id:
+                question, value = answers.pop()
+            else:
+                question, value = row.question, None
+            answers.append((question, _unified_value(
+                value, row.kind, row.text, row.number, row.choice)))
+        return answers
+    qs = AnswerBase.objects.using(using).filter(response=response)
+    qs = qs.select_related('question', *ANSWER_ACCESSORS)
+    qs = qs.order_by(*order)
+    answers = []
+    for base in qs:
+        for accessor in ANSWER_ACCESSORS:
+            try:
+                answer = getattr(base, accessor)
+            except ObjectDoesNotExist:
+                continue
+            value = answer.body
+            if accessor == 'answerselectmultiple':
+                value = parse_multiple(value)
+            answers.append((base.question, value))
+            break
+    return answers
+
+
+def delete_answers(response_ids, using=None, unified=None):
+    """
+    Delete the answers of the given responses, from both stores, or only
+    from the unified store if ``unified`` is True or from the legacy tables
+    if it is False.
+
+    The rows are deleted table by table, without loading them nor sending
+    the delete signals.
+    """
+    if unified is not True:
+        answers = AnswerBase.objects.using(using).filter(
+            response__in=response_ids).values('pk')
+        AnswerSelectMultipleChoice.objects.using(using).filter(
+            answer__in=answers)._raw_delete(using)
+        for model in (AnswerText, AnswerRadio, AnswerSelect,
+                      AnswerSelectMultiple, AnswerInteger):
+            model.objects.using(using).filter(
+                pk__in=answers)._raw_delete(using)
+        AnswerBase.objects.using(using).filter(
+            response__in=response_ids)._raw_delete(using)
+    if unified is not False:
+        Answer.objects.using(using).filter(
+            response__in=response_ids)._raw_delete(using)
+
+
+def move_answers(unified, chunk_size=1000):
+    """
+    Move the answers of every response to the unified store, or back to
+    the legacy tables if ``unified`` is False.
+
+    Responses are handled by chunks of ``chunk_size``, one transaction per
+    chunk. The responses already in the target store are left as they are.
+    Return the number of responses moved.
+    """
+    using = router.db_for_write(Response)
+    last_pk = 0
+    moved = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(Response.objects.using(using).filter(
+                pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True)[:chunk_size])
+            if not chunk:
+                break
+            values = answer_values(chunk, using=using, unified=not unified)
+            # only the responses with answers in the source store
+            values = dict((response_id, response_values)
+                          for response_id, response_values in values.items()
+                          if response_values)
+            questions = Question.objects.using(using).in_bulk(set(
+                question_id for response_values in values.values()
+                for question_id in response_values))
+            answers = []
+            for response_id, response_values in values.items():
+                for question_id, value in response_values.items():
+                    answer = build_answer(questions[question_id], value)
+                    answer.response_id = response_id
+                    answers.append(answer)
+            delete_answers(list(values), using, unified=not unified)
+            bulk_create_answers(answers, unified=unified)
+        moved += len(values)
+        last_pk = chunk[-1]
+    return moved
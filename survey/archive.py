@@ -0,0 +1,128 @@
+"""Archival of the responses of unpublished surveys.
+
+``archive_survey`` moves the responses of a survey and their answers from
+the hot tables into ``ArchivedResponse``, one compact row per response, so
+``Response`` and the answer tables only hold the responses of the running
+surveys. ``restore_survey`` moves them back. Both work by chunks of
+``chunk_size`` responses, one transaction per chunk, so memory use does not
+depend on the number of responses.
+
+Archived responses are still exported (see survey.export) and counted by
+``rebuild_survey_stats``. The statistics and the completions of the users
+are left as they are by the archival.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+
+from survey.answers import (answer_values, build_answer, bulk_create_answers,
+                            delete_answers, insert_responses)
+from survey.models import ArchivedResponse, OutboxMessage, Question, Response
+
+CHUNK_SIZE = 1000
+
+
+def _delete_responses(response_ids, using):
+    """
+    Delete responses and their answers.
+
+    Like the answers, the responses are deleted without sending the delete
+    signals, so the completions of the users are kept.
+    """
+    delete_answers(response_ids, using)
+    OutboxMessage.objects.using(using).filter(
+        response__in=response_ids).update(response=None)
+    Response.objects.using(using).filter(
+        pk__in=response_ids)._raw_delete(using)
+
+
+def archive_survey(survey, chunk_size=CHUNK_SIZE):
+    """Archive the responses of a survey, return their number."""
+    using = router.db_for_write(Response)
+    archived = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(Response.objects.using(using).filter(
+                survey=survey
+            ).order_by('pk').values_list(
+                'pk', 'interview_uuid', 'created', 'updated', 'user_id'
+            )[:chunk_size])
+            if not chunk:
+                break
+            response_ids = [row[0] for row in chunk]
+            values = answer_values(response_ids, using=using)
+            ArchivedResponse.objects.using(using).bulk_create(
+                ArchivedResponse(
+                    survey_id=survey.pk, response_id=pk,
+                    interview_uuid=interview_uuid, created=created,
+                    updated=updated, user_id=user_id,
+                    answers=json.dumps(values[pk], cls=DjangoJSONEncoder))
+                for pk, interview_uuid, created, updated, user_id in chunk
+            )
+            _delete_responses(response_ids, using)
+        archived += len(chunk)
+    return archived
+
+
+def _load_answers(archived):
+    return dict((int(question_id), value) for question_id, value
+                in json.loads(archived.answers).items())
+
+
+def iter_archived(survey, chunk_size=CHUNK_SIZE, using=None):
+    """
+    Yield the archived responses of a survey, in their original order.
+
+    Each one is yielded with its answers, a ``{question_id: value}`` dict
+    like the ones returned by ``answer_values``.
+    """
+    last_pk = 0
+    while True:
+        chunk = list(ArchivedResponse.objects.using(using).filter(
+            survey=survey, pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not chunk:
+            break
+        for archived in chunk:
+            yield archived, _load_answers(archived)
+        last_pk = chunk[-1].pk
+
+
+def restore_survey(survey, chunk_size=CHUNK_SIZE):
+    """
+    Move the archived responses of a survey back to the hot tables.
+
+    The answers to questions deleted in the meantime are dropped. Return
+    the number of restored responses.
+    """
+    using = router.db_for_write(Response)
+    questions = Question.objects.using(using).filter(survey=survey)
+    questions = dict((q.pk, q) for q in questions)
+    restored = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(ArchivedResponse.objects.using(using).filter(
+                survey=survey).order_by('pk')[:chunk_size])
+            if not chunk:
+                break
+            responses = [
+                Response(survey_id=survey.pk,
+                         interview_uuid=archived.interview_uuid,
+                         created=archived.created, updated=archived.updated,
+                         user_id=archived.user_id)
+                for archived in chunk
+            ]
+            insert_responses(responses, using)
+            answers = []
+            for archived, response in zip(chunk, responses):
+                for question_id, value in _load_answers(archived).items():
+                    if question_id not in questions:
+                        continue
+                    answer = build_answer(questions[question_id], value)
+                    answer.response = response
+                    answers.append(answer)
+            bulk_create_answers(answers)
+            ArchivedResponse.objects.using(using).filter(
+                pk__in=[archived.pk for archived in chunk]).delete()
+        restored += len(chunk)
+    return restored
@@ -0,0 +1,83 @@
+"""Know whether a logged user has already completed a survey.
+
+Completions are recorded in ``SurveyCompletion`` when a response of a
+logged user is saved. Positive answers can also be kept in the Django
+cache named by the ``TANUKI_COMPLETION_CACHE`` setting.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+
+from survey.models import SurveyCompletion
+
+
+def _cache():
+    alias = getattr(settings, 'TANUKI_COMPLETION_CACHE', None)
+    if alias:
+        return caches[alias]
+    return None
+
+
+def on_commit(func):
+    """
+    Call ``func`` once the current transaction is committed, or right away
+    before Django 1.9, which cannot defer it.
+    """
+    if hasattr(transaction, 'on_commit'):
+        transaction.on_commit(func)
+    else:
+        func()
+
+
+def cache_key(user_id, survey_id):
+    return 'tanuki:completed:%d:%d' % (user_id, survey_id)
+
+
+def record_completion(response):
+    """Record that the user of a response has completed its survey."""
+    if response.user_id is None:
+        return
+    try:
+        with transaction.atomic():
+            SurveyCompletion.objects.create(survey_id=response.survey_id,
+                                            user_id=response.user_id)
+    except IntegrityError:
+        # the user already completed the survey
+        pass
+    cache = _cache()
+    if cache is not None:
+        key = cache_key(response.user_id, response.survey_id)
+        on_commit(lambda: cache.set(key, True, None))
+
+
+def forget_completion(user_id, survey_id):
+    """Remove the completion of a survey by a user."""
+    SurveyCompletion.objects.filter(user_id=user_id,
+                                    survey_id=survey_id).delete()
+    cache = _cache()
+    if cache is not None:
+        cache.delete(cache_key(user_id, survey_id))
+
+
+def has_completed(user, survey):
+    """Return True if the user has already completed the survey."""
+    if not user.is_authenticated():
+        return False
+    cache = _cache()
+    key = cache_key(user.pk, survey.pk)
+    if cache is not None and cache.get(key):
+        return True
+    completed = SurveyCompletion.objects.filter(user=user,
+                                                survey=survey).exists()
+    if completed and cache is not None:
+        cache.set(key, True, None)
+    return completed
+
+
+def completed_survey_ids(user, surveys):
+    """Return the ids of the given surveys completed by the user."""
+    if not user.is_authenticated():
+        return set()
+    return set(SurveyCompletion.objects.filter(
+        user=user, survey__in=[s.pk for s in surveys]
+    ).values_list('survey_id', flat=True))
@@ -0,0 +1,97 @@
+"""Server-side storage of the progress through multi-step surveys.
+
+Each step of a ``display_by_question`` survey only writes the values of
+its own fields in ``ResponseDraftValue`` rows, instead of rewriting the
+whole progress in the session. The final step saves the response from the
+stored values, which were already cleaned by their own step, once every
+required question has a value.
+
+Drafts expire ``TANUKI_DRAFT_TTL`` seconds (one week by default) after
+their last step, ``clear_expired_drafts`` removes them.
+"""
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from survey.models import ResponseDraft, ResponseDraftValue
+from survey.schema import get_schema
+
+
+def get_ttl():
+    return datetime.timedelta(
+        seconds=getattr(settings, 'TANUKI_DRAFT_TTL', 7 * 24 * 3600)
+    )
+
+
+def draft_key(request):
+    """Return the key of the draft of the current respondent."""
+    if request.user.is_authenticated():
+        return 'user:%d' % request.user.pk
+    if not request.session.session_key:
+        request.session.save()
+    return 'session:%s' % request.session.session_key
+
+
+def save_step(survey, key, user, cleaned_data):
+    """Store the cleaned values of a step in the draft."""
+    expires = timezone.now() + get_ttl()
+    if not user.is_authenticated():
+        user = None
+    with transaction.atomic():
+        updated = ResponseDraft.objects.filter(survey=survey, key=key).update(
+            expires=expires, updated=timezone.now())
+        if not updated:
+            try:
+                with transaction.atomic():
+                    ResponseDraft.objects.create(survey=survey, key=key,
+                                                 user=user, expires=expires)
+            except IntegrityError:
+                # created by a concurrent request of the same respondent
+                pass
+        draft_id = ResponseDraft.objects.filter(
+            survey=survey, key=key).values_list('pk', flat=True)[0]
+        ResponseDraftValue.objects.filter(
+            draft_id=draft_id, field_name__in=list(cleaned_data)).delete()
+        ResponseDraftValue.objects.bulk_create(
+            ResponseDraftValue(draft_id=draft_id, field_name=name,
+                               value=json.dumps(value, cls=DjangoJSONEncoder))
+            for name, value in cleaned_data.items()
+        )
+
+
+def load_values(survey, key):
+    """Return the values stored in a draft that has not expired."""
+    values = ResponseDraftValue.objects.filter(
+        draft__survey=survey, draft__key=key,
+        draft__expires__gt=timezone.now()
+    ).values_list('field_name', 'value')
+    return dict((name, json.loads(value)) for name, value in values)
+
+
+def missing_step(survey, values):
+    """
+    Return the first step of a required question without a value in
+    ``values``, or None if the response is complete.
+    """
+    for step, question in enumerate(get_schema(survey).questions):
+        if question.required and values.get(question.field_name) in (
+                None, '', []):
+            return step
+    return None
+
+
+def delete_draft(survey, key):
+    ResponseDraft.objects.filter(survey=survey, key=key).delete()
+
+
+def clear_expired_drafts():
+    """Delete the expired drafts and return how many there were."""
+    expired = ResponseDraft.objects.filter(expires__lte=timezone.now())
+    count = expired.count()
+    ResponseDraftValue.objects.filter(draft__in=expired).delete()
+    expired.delete()
+    return count
@@ -0,0 +1,105 @@
+"""Streaming export of the responses of a survey.
+
+Responses are read by primary key ranges of ``chunk_size`` rows and the
+answers of each chunk are merged from the answer tables with one query per
+table, so memory use does not depend on the number of responses. Each
+response becomes one row with one column per question. The archived
+responses of the survey, if any, come after the others.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+from django.utils.encoding import force_text
+
+from survey.answers import answer_values
+from survey.archive import iter_archived
+from survey.models import Response
+from survey.schema import get_schema
+
+CHUNK_SIZE = 1000
+META_COLUMNS = ['interview_uuid', 'created', 'user']
+
+
+def get_columns(survey):
+    """Return the header of the export of a survey."""
+    return META_COLUMNS + [q.field_name for q in get_schema(survey).questions]
+
+
+def iter_responses(survey, chunk_size=CHUNK_SIZE, using=None):
+    """
+    Yield one dict per response of the survey.
+
+    Dict keys are the names returned by ``get_columns``, unanswered
+    questions are left out.
+    """
+    questions = get_schema(survey).questions
+
+    def make_row(interview_uuid, created, user_id, values):
+        row = {
+            'interview_uuid': interview_uuid,
+            'created': created,
+            'user': user_id,
+        }
+        for q in questions:
+            if q.pk in values:
+                row[q.field_name] = values[q.pk]
+        return row
+    last_pk = 0
+    while True:
+        qs = Response.objects.using(using).filter(survey=survey,
+                                                  pk__gt=last_pk)
+        qs = qs.order_by('pk').values_list('pk', 'interview_uuid', 'created',
+                                           'user_id')
+        chunk = list(qs[:chunk_size].iterator())
+        if not chunk:
+            break
+        answers = answer_values([row[0] for row in chunk], using=using)
+        for pk, interview_uuid, created, user_id in chunk:
+            yield make_row(interview_uuid, created, user_id, answers[pk])
+        last_pk = chunk[-1][0]
+    for archived, values in iter_archived(survey, chunk_size, using):
+        yield make_row(archived.interview_uuid, archived.created,
+                       archived.user_id, values)
+
+
+class Echo(object):
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value, separator):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        value = separator.join(force_text(v) for v in value)
+    value = force_text(value)
+    if six.PY2:
+        value = value.encode('utf-8')
+    return value
+
+
+def csv_lines(survey, chunk_size=CHUNK_SIZE, using=None):
+    """Yield the export of a survey as CSV lines, header first."""
+    writer = csv.writer(Echo())
+    columns = get_columns(survey)
+    yield writer.writerow(columns)
+    for row in iter_responses(survey, chunk_size=chunk_size, using=using):
+        yield writer.writerow([
+            _csv_cell(row.get(column), survey.separator) for column in columns
+        ])
+
+
+def jsonl_lines(survey, chunk_size=CHUNK_SIZE, using=None):
+    """Yield the export of a survey as JSON lines, one per response."""
+    for row in iter_responses(survey, chunk_size=chunk_size, using=using):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+}
@@ -1,19 +1,29 @@
 """Dynamic forms created from DB data."""
 import logging
+import re
 import uuid
 
 from django import forms
 from django.core.urlresolvers import reverse
+from django.db import IntegrityError
 from django.forms import models
 from django.utils.safestring import mark_safe
 
-from survey.models import (AnswerInteger, AnswerRadio, AnswerSelect,
-                           AnswerSelectMultiple, AnswerText, Question,
-                           Response)
+from survey import outbox
+from survey.answers import build_answer, save_response
+from survey.instrumentation import timer
+from survey.models import Question, Response
+from survey.schema import get_schema
 from survey.signals import survey_completed
-from survey.utils import get_choices
 from survey.widgets import ImageSelectWidget
 
+TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def valid_token(value):
+    """Return True if value can be used as a submission token."""
+    return bool(value) and TOKEN_RE.match(value) is not None
+
 
 class HorizontalRadioRenderer(forms.RadioSelect.renderer):
     """FormRendered to have radio button horizontaly rather than verticaly."""
@@ -30,123 +40,139 @@ class ResponseForm(models.ModelForm):
         model = Response
         fields = ()
 
+    @timer('form_build')
     def __init__(self, *args, **kwargs):
-        """A survey object need to be passed as the survey kwargs."""
-        empty_tuple = ('', '-------------')
+        """
+        A survey object need to be passed as the survey kwargs.
+
+        The interview uuid of the response is the submission token posted
+        with the form, or the ``submission_token`` kwarg, so a replayed
+        submission cannot create a second response.
+        """
         survey = kwargs.pop('survey')
         self.survey = survey
         self.user = kwargs.pop('user')
         self.separator = self.survey.separator
         self.callback_code = kwargs.pop('callback_code', None)
+        token = kwargs.pop('submission_token', None)
         try:
             self.step = int(kwargs.pop('step'))
         except KeyError:
             self.step = None
 
         super(ResponseForm, self).__init__(*args, **kwargs)
-        random_uuid = uuid.uuid4().hex
-        self.uuid = random_uuid
+        if self.data and valid_token(
+                self.data.get('tanuki_submission_token')):
+            token = self.data['tanuki_submission_token']
+        if not valid_token(token):
+            token = uuid.uuid4().hex
+        self.uuid = token
         self.fields['tanuki_callback_code'] = forms.CharField(
             widget=forms.HiddenInput, required=False
         )
         self.fields['tanuki_callback_code'].initial = self.callback_code
-        self.steps_count = survey.questions().count()
+        self.fields['tanuki_submission_token'] = forms.CharField(
+            widget=forms.HiddenInput, required=False
+        )
+        self.fields['tanuki_submission_token'].initial = self.uuid
+        schema = get_schema(survey)
+        self.steps_count = len(schema.questions)
         # add a field for each survey question, corresponding to the question
-        # type as appropriate.
+        # type as appropriate. In step mode, only the question of the current
+        # step is needed and it is picked from the compiled ordering.
         data = kwargs.get('data')
-        for index, q in enumerate(survey.questions()):
-            if (self.survey.display_by_question and
-               index != self.step and self.step is not None):
-                continue
+        if self.survey.display_by_question and self.step is not None:
+            questions = schema.questions[self.step:self.step + 1]
+        else:
+            questions = schema.questions
+        for q in questions:
+            self.add_question_field(q, data)
+
+    def add_question_field(self, q, data=None):
+        """Add the field of a question, described by its schema spec."""
+        empty_tuple = ('', '-------------')
+        field_name = q.field_name
+        if q.question_type == Question.TEXT:
+            self.fields[field_name] = forms.CharField(
+                label=q.text,
+                widget=forms.Textarea
+            )
+        elif q.question_type == Question.SHORT_TEXT:
+            self.fields[field_name] = forms.CharField(
+                label=q.text,
+                widget=forms.TextInput
+            )
+        elif q.question_type == Question.RADIO:
+            self.fields[field_name] = forms.ChoiceField(
+                label=q.text,
+                widget=forms.RadioSelect(
+                    renderer=HorizontalRadioRenderer
+                ),
+                choices=q.choices
+            )
+        elif q.question_type == Question.SELECT:
+            # add an empty option at the top so that the user has to
+            # explicitly select one of the options
+            question_choices = tuple([empty_tuple]) + q.choices
+            self.fields[field_name] = forms.ChoiceField(
+                label=q.text,
+                widget=forms.Select,
+                choices=question_choices
+            )
+        elif q.question_type == Question.SELECT_IMAGE:
+            # add an empty option at the top so that the user has to
+            # explicitly select one of the options
+            question_choices = tuple([empty_tuple]) + q.choices
+            self.fields[field_name] = forms.ChoiceField(
+                label=q.text,
+                widget=ImageSelectWidget(images=dict(q.images)),
+                choices=question_choices
+            )
+        elif q.question_type == Question.SELECT_MULTIPLE:
+            self.fields[field_name] = forms.MultipleChoiceField(
+                label=q.text,
+                widget=forms.CheckboxSelectMultiple,
+                choices=q.choices
+            )
+        elif q.question_type == Question.INTEGER:
+            self.fields[field_name] = forms.IntegerField(label=q.text)
+        # if the field is required, give it a corresponding css class.
+        if q.required:
+            self.fields[field_name].required = True
+            self.fields[field_name].widget.attrs["class"] = "required"
+            self.fields[field_name].widget.attrs["required"] = True
+        else:
+            self.fields[field_name].required = False
+        # add the category as a css class, and add it as a data
+        # attribute as well (this is used in the template to allow
+        # sorting the questions by category)
+        if q.category_id:
+            cat_name = q.category_name
+            classes = self.fields[field_name].widget.attrs.get("class")
+            category_class = " cat_%s" % q.category_name
+            if classes:
+                new_classes = classes + (category_class)
             else:
-                field_name = "question_%d" % q.pk
-                if q.question_type == Question.TEXT:
-                    self.fields[field_name] = forms.CharField(
-                        label=q.text,
-                        widget=forms.Textarea
-                    )
-                elif q.question_type == Question.SHORT_TEXT:
-                    self.fields[field_name] = forms.CharField(
-                        label=q.text,
-                        widget=forms.TextInput
-                    )
-                elif q.question_type == Question.RADIO:
-                    question_choices = get_choices(q.choices,
-                                                   separator=self.separator)
-                    self.fields[field_name] = forms.ChoiceField(
-                        label=q.text,
-                        widget=forms.RadioSelect(
-                            renderer=HorizontalRadioRenderer
-                        ),
-                        choices=question_choices
-                    )
-                elif q.question_type == Question.SELECT:
-                    question_choices = get_choices(q.choices,
-                                                   separator=self.separator)
-                    # add an empty option at the top so that the user has to
-                    # explicitly select one of the options
-                    question_choices = tuple([empty_tuple]) + question_choices
-                    self.fields[field_name] = forms.ChoiceField(
-                        label=q.text,
-                        widget=forms.Select,
-                        choices=question_choices
-                    )
-                elif q.question_type == Question.SELECT_IMAGE:
-                    question_choices = get_choices(q.choices,
-                                                   separator=self.separator)
-                    # add an empty option at the top so that the user has to
-                    # explicitly select one of the options
-                    question_choices = tuple([empty_tuple]) + question_choices
-                    self.fields[field_name] = forms.ChoiceField(
-                        label=q.text,
-                        widget=ImageSelectWidget,
-                        choices=question_choices
-                    )
-                elif q.question_type == Question.SELECT_MULTIPLE:
-                    question_choices = get_choices(q.choices,
-                                                   separator=self.separator)
-                    self.fields[field_name] = forms.MultipleChoiceField(
-                        label=q.text,
-                        widget=forms.CheckboxSelectMultiple,
-                        choices=question_choices
-                    )
-                elif q.question_type == Question.INTEGER:
-                    self.fields[field_name] = forms.IntegerField(label=q.text)
-                # if the field is required, give it a corresponding css class.
-                if q.required:
-                    self.fields[field_name].required = True
-                    self.fields[field_name].widget.attrs["class"] = "required"
-                    self.fields[field_name].widget.attrs["required"] = True
-                else:
-                    self.fields[field_name].required = False
-                # add the category as a css class, and add it as a data
-                # attribute as well (this is used in the template to allow
-                # sorting the questions by category)
-                if q.category:
-                    cat_name = q.category.name
-                    classes = self.fields[field_name].widget.attrs.get("class")
-                    category_class = " cat_%s" % q.category.name
-                    if classes:
-                        new_classes = classes + (category_class)
-                    else:
-                        new_classes = (category_class)
-                    self.fields[field_name].widget.attrs["class"] = new_classes
-                    self.fields[field_name].widget.attrs["category"] = cat_name
-
-                classes = self.fields[field_name].widget.attrs.get("class")
-                if q.question_type == Question.SELECT:
-                    new_classes = classes + (" cs-select cs-skin-boxes")
-                elif q.question_type == Question.RADIO:
-                    new_classes = classes + (
-                        " fs-radio-group fs-radio-custom clearfix")
-                # elif q.question_type == Question.SELECT_MULTIPLE:
-                #    new_classes = classes + (" ")
-                self.fields[field_name].widget.attrs["class"] = new_classes
-
-                # initialize the form field with values from a POST request, if
-                # any.
-                if data:
-                    self.fields[field_name].initial = data.get(field_name)
+                new_classes = (category_class)
+            self.fields[field_name].widget.attrs["class"] = new_classes
+            self.fields[field_name].widget.attrs["category"] = cat_name
+
+        classes = self.fields[field_name].widget.attrs.get("class", "")
+        new_classes = classes
+        if q.question_type == Question.SELECT:
+            new_classes = classes + (" cs-select cs-skin-boxes")
+        elif q.question_type == Question.RADIO:
+            new_classes = classes + (
+                " fs-radio-group fs-radio-custom clearfix")
+        # elif q.question_type == Question.SELECT_MULTIPLE:
+        #    new_classes = classes + (" ")
+        if new_classes:
+            self.fields[field_name].widget.attrs["class"] = new_classes
+
+        # initialize the form field with values from a POST request, if
+        # any.
+        if data:
+            self.fields[field_name].initial = data.get(field_name)
 
     def has_next_step(self):
         """Check if the form has a next step."""
@@ -178,60 +204,102 @@ class ResponseForm(models.ModelForm):
         """
         save the response object
         """
-        response = super(ResponseForm, self).save(commit=False)
+        super(ResponseForm, self).save(commit=False)
+        return self.save_values(self.cleaned_data)
+
+    def clean_values(self, values):
+        """
+        Validate the answers of a response with the rules of the fields.
+
+        ``values`` is keyed by field name. Return the cleaned values and the
+        errors, keyed by field name as well. Only the question fields are
+        used, so a single unbound form can validate many responses.
+        """
+        cleaned = {}
+        errors = {}
+        for field_name, field in self.fields.items():
+            if not field_name.startswith("question_"):
+                continue
+            try:
+                cleaned[field_name] = field.clean(values.get(field_name))
+            except forms.ValidationError as e:
+                errors[field_name] = e.messages
+        return cleaned, errors
+
+    def build_response(self, response, values, callback_code=None,
+                       questions=None):
+        """
+        Fill an unsaved response from cleaned field values.
+
+        Return the unsaved answers of the response and the survey_completed
+        payload. ``questions`` can be given as a ``{pk: question}`` dict to
+        avoid loading the questions again for each response.
+        """
         response.survey = self.survey
-        response.interview_uuid = self.uuid
         if self.user.is_authenticated():
             response.user = self.user
-        response.save()
 
         # response "raw" data as dict (for signal)
         data = {
             'survey_id': response.survey.id,
             'interview_uuid': response.interview_uuid,
-            'callback_code': self.callback_code,
+            'callback_code': callback_code,
             'responses': []
         }
-        # create an answer object for each question and associate it with this
-        # response.
-        for field_name, field_value in self.cleaned_data.iteritems():
-            if field_name.startswith("question_"):
-                # warning: this way of extracting the id is very fragile and
-                # entirely dependent on the way the question_id is encoded in
-                # the field name in the __init__ method of this form class.
-                q_id = int(field_name.split("_")[1])
-                q = Question.objects.get(pk=q_id)
-
-                if q.question_type in [Question.TEXT, Question.SHORT_TEXT]:
-                    a = AnswerText(question=q)
-                    a.body = field_value
-                elif q.question_type == Question.RADIO:
-                    a = AnswerRadio(question=q)
-                    a.body = field_value
-                elif q.question_type == Question.SELECT:
-                    a = AnswerSelect(question=q)
-                    a.body = field_value
-                elif q.question_type == Question.SELECT_IMAGE:
-                    a = AnswerSelect(question=q)
-                    value, img_src = field_value.split(":", 1)
-                    a.body = value
-                elif q.question_type == Question.SELECT_MULTIPLE:
-                    a = AnswerSelectMultiple(question=q)
-                    a.body = field_value
-                elif q.question_type == Question.INTEGER:
-                    a = AnswerInteger(question=q)
-                    a.body = field_value
-                data['responses'].append((a.question.id, a.body))
-                # Some debug info
-                msg = "creating answer to question %d of type %s" % (
-                    q_id, a.question.question_type
-                )
-                logging.debug(msg)
-                logging.debug(a.question.text)
-                logging.debug('answer value:')
-                logging.debug(field_value)
-
-                a.response = response
-                a.save()
-        survey_completed.send(sender=Response, instance=response, data=data)
+        # warning: this way of extracting the id is very fragile and entirely
+        # dependent on the way the question_id is encoded in the field name in
+        # the __init__ method of this form class.
+        values = [
+            (int(field_name.split("_")[1]), field_value)
+            for field_name, field_value in values.iteritems()
+            if field_name.startswith("question_")
+        ]
+        if questions is None:
+            questions = Question.objects.in_bulk(
+                [q_id for q_id, v in values])
+        # create an answer object for each question, they are saved along
+        # with the response in a constant number of queries.
+        answers = []
+        for q_id, field_value in values:
+            a = build_answer(questions[q_id], field_value)
+            data['responses'].append((a.question.id, a.body))
+            # Some debug info
+            msg = "creating answer to question %d of type %s" % (
+                q_id, a.question.question_type
+            )
+            logging.debug(msg)
+            logging.debug(a.question.text)
+            logging.debug('answer value:')
+            logging.debug(field_value)
+            answers.append(a)
+        return answers, data
+
+    @timer('form_save')
+    def save_values(self, values):
+        """
+        Save the response object from already cleaned field values.
+
+        The values are keyed by field name, like the form cleaned_data.
+        If a response was already saved with the submission token of the
+        form, it is returned instead and nothing is written.
+        """
+        response = self.instance
+        response.interview_uuid = self.uuid
+        answers, data = self.build_response(response, values,
+                                            self.callback_code)
+        queue = outbox.is_async()
+        try:
+            # survey_completed is sent later by deliver_survey_events
+            save_response(response, answers, event=data if queue else None)
+        except IntegrityError:
+            # the interview uuid is unique: the token was already used, by
+            # a replayed or concurrent submission of the same form
+            original = Response.objects.filter(
+                survey=self.survey, interview_uuid=self.uuid).first()
+            if original is None:
+                raise
+            return original
+        if not queue:
+            survey_completed.send(sender=Response, instance=response,
+                                  data=data)
         return response
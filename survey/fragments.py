@@ -0,0 +1,75 @@
+"""Cache of the rendered question block of survey forms.
+
+For anonymous visitors the HTML of the questions of an unsubmitted
+``ResponseForm`` only depends on the survey schema, the step and the
+language, the CSRF token and the hidden fields (callback code and
+submission token) being rendered outside of it. When
+``TANUKI_FRAGMENT_CACHE`` names a Django cache alias, this HTML is cached so
+a hit skips both the form construction and the widget rendering.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+TEMPLATE_NAME = 'survey/forms/questions.html'
+
+
+def _cache():
+    alias = getattr(settings, 'TANUKI_FRAGMENT_CACHE', None)
+    if alias:
+        return caches[alias]
+    return None
+
+
+def fragment_key(survey, step):
+    return 'tanuki:fragment:%d:%s:%s:%s' % (
+        survey.pk, survey.schema_version, step, get_language())
+
+
+@python_2_unicode_compatible
+class LazyHTML(object):
+    """
+    Safe HTML returned by ``func`` the first time a template renders it.
+
+    Unlike SimpleLazyObject or ``lazy``, it is rendered as a safe string by
+    the templates of Django 1.8.
+    """
+
+    def __init__(self, func):
+        self._func = func
+        self._html = None
+
+    def __str__(self):
+        if self._html is None:
+            self._html = mark_safe(self._func())
+        return self._html
+
+    def __html__(self):
+        return self.__str__()
+
+
+def render_questions(form):
+    """Render the question fields of a ResponseForm."""
+    return mark_safe(render_to_string(TEMPLATE_NAME, {'form': form}))
+
+
+def cached_questions(survey, step, build_form):
+    """
+    Return the rendered questions of a survey step.
+
+    ``build_form`` is only called to build the form on a cache miss. The
+    questions are rendered lazily when the cache is disabled.
+    """
+    cache = _cache()
+    if cache is None:
+        return LazyHTML(lambda: render_questions(build_form()))
+    key = fragment_key(survey, step)
+    html = cache.get(key)
+    if html is None:
+        html = render_questions(build_form())
+        timeout = getattr(settings, 'TANUKI_FRAGMENT_CACHE_TIMEOUT', 3600)
+        cache.set(key, html, timeout)
+    return mark_safe(html)
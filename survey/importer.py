@@ -0,0 +1,204 @@
+"""Streaming import of responses collected offline.
+
+The input uses the format of ``survey.export``: CSV with a header row or
+JSON lines, one response per line, with one ``question_<pk>`` column per
+answered question. The optional ``interview_uuid``, ``user`` and
+``callback_code`` columns are kept; the other columns are ignored. In CSV,
+the choices of select multiple questions are joined with the separator of
+the survey.
+
+Each row is validated with the fields of a single unbound ``ResponseForm``
+and the valid rows are saved ``chunk_size`` at a time, one transaction
+per chunk, so memory use does not depend on the size of the file. Invalid
+rows are passed to a callback, with their errors, to be written in a
+reject file.
+"""
+import csv
+import json
+import uuid
+
+from django import forms
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+from django.utils.encoding import force_text
+
+from survey.forms import ResponseForm
+from survey.models import Response
+from survey.submission import save_cleaned_responses
+
+CHUNK_SIZE = 1000
+UUID_MAX_LENGTH = Response._meta.get_field('interview_uuid').max_length
+
+
+def csv_rows(lines):
+    """Yield the rows of CSV lines as dicts, keyed by the header."""
+    if six.PY2:
+        lines = (force_text(line).encode('utf-8') for line in lines)
+    for row in csv.DictReader(lines):
+        if six.PY2:
+            row = dict((force_text(k), force_text(v) if v is not None else v)
+                       for k, v in row.items())
+        yield row
+
+
+def jsonl_rows(lines):
+    """
+    Yield the rows of JSON lines, skipping blank lines.
+
+    Lines which are not valid JSON are yielded as is, to be rejected.
+    """
+    for line in lines:
+        line = force_text(line).strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+IMPORT_FORMATS = {
+    'csv': csv_rows,
+    'jsonl': jsonl_rows,
+}
+
+
+class Importer(object):
+    """
+    Validate and save rows of responses of a survey.
+
+    ``reject`` is called with each invalid row and its errors, a dict of
+    messages keyed by column. ``send_signals`` is passed to
+    ``save_cleaned_responses``.
+    """
+
+    def __init__(self, survey, chunk_size=CHUNK_SIZE, reject=None,
+                 send_signals=True):
+        self.survey = survey
+        self.chunk_size = chunk_size
+        self.reject = reject
+        self.send_signals = send_signals
+        self.form = ResponseForm(survey=survey, user=AnonymousUser())
+        self.imported = 0
+        self.rejected = 0
+
+    def prepare(self, row):
+        """Return the field values of a row, as the form fields expect."""
+        values = {}
+        for field_name in self.form.fields:
+            value = row.get(field_name)
+            if not field_name.startswith('question_') or value in (None, ''):
+                continue
+            field = self.form.fields[field_name]
+            if isinstance(field, forms.MultipleChoiceField):
+                if not isinstance(value, (list, tuple)):
+                    value = value.split(self.survey.separator)
+            values[field_name] = value
+        return values
+
+    def clean(self, row):
+        """Return an unsaved response and its values, and the errors."""
+        values, errors = self.form.clean_values(self.prepare(row))
+        interview_uuid = force_text(row.get('interview_uuid') or '')
+        if len(interview_uuid) > UUID_MAX_LENGTH:
+            errors['interview_uuid'] = ["Invalid interview uuid."]
+        response = Response(interview_uuid=interview_uuid or uuid.uuid4().hex)
+        user = row.get('user')
+        if user not in (None, ''):
+            try:
+                response.user_id = int(user)
+            except (TypeError, ValueError):
+                errors['user'] = ["Invalid user id."]
+        return (response, values, row.get('callback_code') or None), errors
+
+    def check_chunk(self, chunk):
+        """
+        Reject the rows of a chunk conflicting with the saved data.
+
+        Their interview uuid must be new and their user must exist.
+        """
+        uuids = set(r.interview_uuid for (r, v, c), row in chunk)
+        existing = set(Response.objects.filter(
+            interview_uuid__in=uuids).values_list('interview_uuid',
+                                                  flat=True))
+        user_ids = set(r.user_id for (r, v, c), row in chunk
+                       if r.user_id is not None)
+        if user_ids:
+            user_ids = set(User.objects.filter(
+                pk__in=user_ids).values_list('pk', flat=True))
+        valid = []
+        for item, row in chunk:
+            response = item[0]
+            errors = {}
+            if response.interview_uuid in existing:
+                errors['interview_uuid'] = ["Duplicate interview uuid."]
+            if response.user_id is not None and \
+                    response.user_id not in user_ids:
+                errors['user'] = ["Unknown user."]
+            if errors:
+                self.reject_row(row, errors)
+            else:
+                existing.add(response.interview_uuid)
+                valid.append(item)
+        return valid
+
+    def reject_row(self, row, errors):
+        self.rejected += 1
+        if self.reject is not None:
+            self.reject(row, errors)
+
+    def save_chunk(self, chunk):
+        valid = self.check_chunk(chunk)
+        save_cleaned_responses(self.form, valid, self.send_signals)
+        self.imported += len(valid)
+
+    def run(self, rows):
+        """Import rows, return the number of imported and rejected rows."""
+        chunk = []
+        for row in rows:
+            if not isinstance(row, dict):
+                self.reject_row(row, {'row': ["Invalid row."]})
+                continue
+            item, errors = self.clean(row)
+            if errors:
+                self.reject_row(row, errors)
+                continue
+            chunk.append((item, row))
+            if len(chunk) >= self.chunk_size:
+                self.save_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.save_chunk(chunk)
+        return self.imported, self.rejected
+
+
+class CsvRejectWriter(object):
+    """Write rejected rows as CSV, with an additional errors column."""
+
+    def __init__(self, output, columns):
+        self.columns = list(columns) + ['errors']
+        self.writer = csv.writer(output)
+        self.writer.writerow(self.columns)
+
+    def __call__(self, row, errors):
+        row = dict(row, errors=json.dumps(errors))
+        cells = []
+        for column in self.columns:
+            value = force_text(row.get(column) or '')
+            if six.PY2:
+                value = value.encode('utf-8')
+            cells.append(value)
+        self.writer.writerow(cells)
+
+
+class JsonlRejectWriter(object):
+    """Write rejected rows as JSON lines, with an additional errors key."""
+
+    def __init__(self, output):
+        self.output = output
+
+    def __call__(self, row, errors):
+        if not isinstance(row, dict):
+            row = {'row': row}
+        line = json.dumps(dict(row, errors=errors), cls=DjangoJSONEncoder)
+        self.output.write(line + '\n')
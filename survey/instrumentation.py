@@ -0,0 +1,177 @@
+"""Per-request metrics of the survey views.
+
+``survey.middleware.InstrumentationMiddleware`` measures, for the survey
+views, the number of queries and the database time of a request, the time
+spent building and saving the ``ResponseForm`` and the template rendering
+time. Each measure is then passed to the sinks listed in the
+``TANUKI_METRICS_SINKS`` setting, either dotted paths or
+``(dotted path, kwargs)`` pairs::
+
+    TANUKI_METRICS_SINKS = [
+        'survey.instrumentation.LoggingSink',
+        ('survey.instrumentation.StatsdSink', {'port': 8125}),
+        'survey.instrumentation.RingBufferSink',
+    ]
+"""
+import functools
+import logging
+import socket
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('survey.metrics')
+
+_local = threading.local()
+
+TIMERS = ('form_build', 'form_save', 'render')
+
+
+def start(view):
+    """Start collecting the metrics of a request handled by view."""
+    _local.metrics = {
+        'view': view,
+        'timestamp': timezone.now(),
+        'queries': 0,
+        'db_time': 0.0,
+    }
+    for name in TIMERS:
+        _local.metrics[name] = 0.0
+    return _local.metrics
+
+
+def stop():
+    """Stop collecting and return the metrics of the current request."""
+    metrics = getattr(_local, 'metrics', None)
+    _local.metrics = None
+    return metrics
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+class InstrumentedView(object):
+    """
+    Mixin of the class-based views measured by the middleware.
+
+    The view functions returned by ``as_view`` carry the name of their class
+    in ``instrumented_view``, Django only sets ``view_class`` from 1.9.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super(InstrumentedView, cls).as_view(**initkwargs)
+        view.instrumented_view = cls.__name__
+        return view
+
+
+class timer(object):
+    """
+    Add the time spent in a block, in milliseconds, to a metric of the
+    current request. Can also decorate functions.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics = current()
+        if metrics is not None:
+            elapsed = (time.time() - self.start) * 1000
+            metrics[self.name] = metrics.get(self.name, 0.0) + elapsed
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class LoggingSink(object):
+    """Write one log line per request on the survey.metrics logger."""
+
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def emit(self, metrics):
+        logger.log(
+            self.level,
+            "%(view)s %(status)s queries=%(queries)d db=%(db_time).1fms "
+            "form_build=%(form_build).1fms form_save=%(form_save).1fms "
+            "render=%(render).1fms total=%(total).1fms", metrics
+        )
+
+
+class StatsdSink(object):
+    """Send the metrics as StatsD timers and counters over UDP."""
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='tanuki'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, metrics):
+        prefix = '%s.%s' % (self.prefix, metrics['view'])
+        lines = ['%s.queries:%d|c' % (prefix, metrics['queries'])]
+        for name in ('db_time', 'total') + TIMERS:
+            lines.append('%s.%s:%.3f|ms' % (prefix, name, metrics[name]))
+        try:
+            self.socket.sendto('\n'.join(lines).encode('ascii'),
+                               self.address)
+        except socket.error:
+            logger.exception("Unable to send metrics to %s:%s",
+                             *self.address)
+
+
+class RingBufferSink(object):
+    """Keep the metrics of the latest requests in memory."""
+
+    buffer = deque(maxlen=getattr(settings, 'TANUKI_METRICS_BUFFER_SIZE',
+                                  500))
+
+    def emit(self, metrics):
+        self.buffer.append(metrics)
+
+    @classmethod
+    def entries(cls):
+        """Return the buffered metrics, latest first."""
+        return list(reversed(cls.buffer))
+
+
+_sinks = {}
+
+
+def get_sinks():
+    """Return the sink instances configured in TANUKI_METRICS_SINKS."""
+    config = getattr(settings, 'TANUKI_METRICS_SINKS',
+                     ['survey.instrumentation.LoggingSink'])
+    key = repr(config)
+    if key not in _sinks:
+        sinks = []
+        for sink in config:
+            if isinstance(sink, (list, tuple)):
+                path, kwargs = sink
+            else:
+                path, kwargs = sink, {}
+            sinks.append(import_string(path)(**kwargs))
+        _sinks[key] = sinks
+    return _sinks[key]
+
+
+def emit(metrics):
+    """Pass the metrics of a request to every sink."""
+    for sink in get_sinks():
+        try:
+            sink.emit(metrics)
+        except Exception:
+            logger.exception("Metrics sink %r failed", sink)
@@ -0,0 +1,70 @@
+"""Cached list of the published surveys shown by IndexView.
+
+The list is computed with a single query annotating each survey with its
+number of questions, categories and responses. It is cached per
+visibility class (anonymous or authenticated users) in the cache named by
+the ``TANUKI_SURVEY_LIST_CACHE`` setting, if any, and dropped whenever a
+survey, a question or a category changes. The cache must be shared by all
+the processes serving the site, a local memory cache would only be
+invalidated in the process making the change. Response counts are
+not invalidated and may lag by up to ``TANUKI_SURVEY_LIST_TIMEOUT``
+seconds.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from survey.models import Category, Question, Response, Survey
+
+CACHE_KEY = 'tanuki:survey_list:%s'
+VISIBILITY_CLASSES = ('anonymous', 'authenticated')
+
+
+def _cache():
+    alias = getattr(settings, 'TANUKI_SURVEY_LIST_CACHE', None)
+    if alias:
+        return caches[alias]
+    return None
+
+
+def _count_subquery(model):
+    qn = connection.ops.quote_name
+    return 'SELECT COUNT(*) FROM %s WHERE %s.%s = %s.%s' % (
+        qn(model._meta.db_table),
+        qn(model._meta.db_table), qn(model._meta.get_field('survey').column),
+        qn(Survey._meta.db_table), qn(Survey._meta.pk.column),
+    )
+
+
+def annotate_counts(queryset):
+    """Add question_count, category_count and response_count to surveys."""
+    return queryset.extra(select={
+        'question_count': _count_subquery(Question),
+        'category_count': _count_subquery(Category),
+        'response_count': _count_subquery(Response),
+    })
+
+
+def published_surveys(authenticated):
+    """Return the list of the surveys published for a visibility class."""
+    visibility = VISIBILITY_CLASSES[bool(authenticated)]
+    cache = _cache()
+    if cache is not None:
+        surveys = cache.get(CACHE_KEY % visibility)
+        if surveys is not None:
+            return surveys
+    qs = Survey.objects.filter(is_published=True)
+    if not authenticated:
+        qs = qs.filter(need_logged_user=False)
+    surveys = list(annotate_counts(qs).order_by('pk'))
+    if cache is not None:
+        timeout = getattr(settings, 'TANUKI_SURVEY_LIST_TIMEOUT', 300)
+        cache.set(CACHE_KEY % visibility, surveys, timeout)
+    return surveys
+
+
+def invalidate_survey_list():
+    """Drop the cached lists of surveys."""
+    cache = _cache()
+    if cache is not None:
+        cache.delete_many([CACHE_KEY % v for v in VISIBILITY_CLASSES])
@@ -0,0 +1,32 @@
+"""Archive the responses of unpublished surveys."""
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.archive import CHUNK_SIZE, archive_survey
+from survey.models import Survey
+
+
+class Command(BaseCommand):
+    help = ("Move the responses of unpublished surveys to the archive "
+            "table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, nargs='+')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--force', action='store_true', default=False,
+                            help="Archive published surveys too.")
+
+    def handle(self, *args, **options):
+        surveys = []
+        for survey_id in options['survey_id']:
+            try:
+                survey = Survey.objects.get(pk=survey_id)
+            except Survey.DoesNotExist:
+                raise CommandError("Survey %s does not exist" % survey_id)
+            if survey.is_published and not options['force']:
+                raise CommandError("Survey %s is published, unpublish it "
+                                   "or use --force" % survey_id)
+            surveys.append(survey)
+        for survey in surveys:
+            count = archive_survey(survey, chunk_size=options['chunk_size'])
+            self.stdout.write("Archived %d responses of survey %d" %
+                              (count, survey.pk))
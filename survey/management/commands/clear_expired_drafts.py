@@ -0,0 +1,13 @@
+"""Delete the expired drafts of multi-step surveys."""
+from django.core.management.base import BaseCommand
+
+from survey.drafts import clear_expired_drafts
+
+
+class Command(BaseCommand):
+    help = "Delete the expired drafts of multi-step surveys."
+
+    def handle(self, *args, **options):
+        count = clear_expired_drafts()
+        if options['verbosity'] > 0:
+            self.stdout.write("Deleted %d expired drafts" % count)
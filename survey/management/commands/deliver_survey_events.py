@@ -0,0 +1,41 @@
+"""Send the survey_completed signals waiting in the outbox."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey import outbox
+
+
+class Command(BaseCommand):
+    help = "Send the survey_completed signals waiting in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=outbox.BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Number of delivery threads.")
+        parser.add_argument('--max-attempts', type=int,
+                            default=outbox.MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the outbox.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds between two polls of an empty "
+                                 "outbox, with --loop.")
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        while True:
+            batch_sent, batch_failed = outbox.deliver_pending(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                max_attempts=options['max_attempts'],
+            )
+            sent += batch_sent
+            failed += batch_failed
+            if not batch_sent and not batch_failed:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        if options['verbosity'] > 0:
+            self.stdout.write("Delivered %d messages, %d failures" %
+                              (sent, failed))
@@ -0,0 +1,36 @@
+"""Save the responses waiting in the ingestion spool."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from survey import spool
+
+
+class Command(BaseCommand):
+    help = "Save the responses waiting in the ingestion spool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=spool.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the spool.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds between two polls of an empty "
+                                 "spool, with --loop.")
+        parser.add_argument('--no-signals', action='store_true',
+                            help="Do not send survey_completed.")
+
+    def handle(self, *args, **options):
+        if spool.get_spool() is None:
+            raise CommandError("TANUKI_SPOOL_PATH is not set.")
+        saved = 0
+        while True:
+            batch = spool.drain(batch_size=options['batch_size'],
+                                send_signals=not options['no_signals'])
+            saved += batch
+            if not batch:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        if options['verbosity'] > 0:
+            self.stdout.write("Drained %d responses" % saved)
@@ -0,0 +1,39 @@
+"""Export the responses of a survey as CSV or JSON lines."""
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.export import CHUNK_SIZE, EXPORT_FORMATS
+from survey.models import Survey
+from survey.routers import replica_database
+
+
+class Command(BaseCommand):
+    help = "Export the responses of a survey, one line per response."
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int)
+        parser.add_argument('--format', default='csv',
+                            choices=sorted(EXPORT_FORMATS))
+        parser.add_argument('--output', default=None,
+                            help="Output file, standard output by default.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            survey = Survey.objects.get(pk=options['survey_id'])
+        except Survey.DoesNotExist:
+            raise CommandError("Survey %s does not exist" %
+                               options['survey_id'])
+        lines, content_type = EXPORT_FORMATS[options['format']]
+        lines = lines(survey, chunk_size=options['chunk_size'],
+                      using=replica_database())
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for line in lines:
+                    if not isinstance(line, bytes):
+                        line = line.encode('utf-8')
+                    output.write(line)
+        else:
+            for line in lines:
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                self.stdout.write(line, ending='')
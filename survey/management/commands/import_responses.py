@@ -0,0 +1,78 @@
+"""Import responses of a survey from CSV or JSON lines."""
+import io
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import six
+
+from survey.export import get_columns
+from survey.importer import (CHUNK_SIZE, IMPORT_FORMATS, CsvRejectWriter,
+                             Importer, JsonlRejectWriter)
+from survey.models import Survey
+
+
+def open_output(path):
+    if six.PY2:
+        return open(path, 'wb')
+    return io.open(path, 'w', encoding='utf-8', newline='')
+
+
+class Command(BaseCommand):
+    help = ("Import the responses of a survey, in the format written by "
+            "export_responses.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int)
+        parser.add_argument('input', help="CSV or JSON lines file.")
+        parser.add_argument('--format', default=None,
+                            choices=sorted(IMPORT_FORMATS),
+                            help="Guessed from the file extension by "
+                                 "default.")
+        parser.add_argument('--reject', default=None,
+                            help="File receiving the invalid rows and "
+                                 "their errors.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--no-signals', action='store_false',
+                            dest='send_signals', default=True,
+                            help="Do not send survey_completed for the "
+                                 "imported responses.")
+
+    def handle(self, *args, **options):
+        try:
+            survey = Survey.objects.get(pk=options['survey_id'])
+        except Survey.DoesNotExist:
+            raise CommandError("Survey %s does not exist" %
+                               options['survey_id'])
+        input_format = options['format']
+        if input_format is None:
+            extension = os.path.splitext(options['input'])[1].lstrip('.')
+            if extension not in IMPORT_FORMATS:
+                raise CommandError("Unable to guess the format of %s, use "
+                                   "--format" % options['input'])
+            input_format = extension
+        reject_file = reject = None
+        if options['reject']:
+            reject_file = open_output(options['reject'])
+            if input_format == 'csv':
+                reject = CsvRejectWriter(
+                    reject_file, get_columns(survey) + ['callback_code'])
+            else:
+                reject = JsonlRejectWriter(reject_file)
+        importer = Importer(survey, chunk_size=options['chunk_size'],
+                            reject=reject,
+                            send_signals=options['send_signals'])
+        start = time.time()
+        try:
+            with io.open(options['input'], encoding='utf-8',
+                         newline='') as lines:
+                imported, rejected = importer.run(
+                    IMPORT_FORMATS[input_format](lines))
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+        elapsed = time.time() - start
+        self.stdout.write(
+            "Imported %d responses, rejected %d rows in %.1fs "
+            "(%.0f rows/s)" % (imported, rejected, elapsed,
+                               (imported + rejected) / max(elapsed, 1e-6)))
@@ -0,0 +1,19 @@
+"""Move the answers between the legacy tables and the unified table."""
+from django.core.management.base import BaseCommand
+
+from survey.answers import move_answers
+
+
+class Command(BaseCommand):
+    help = ("Move every answer to the unified Answer table, or back to the "
+            "legacy tables. Set TANUKI_ANSWER_STORE accordingly.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('store', choices=['unified', 'legacy'])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = move_answers(options['store'] == 'unified',
+                             chunk_size=options['chunk_size'])
+        self.stdout.write("Moved the answers of %d responses to the %s "
+                          "store" % (count, options['store']))
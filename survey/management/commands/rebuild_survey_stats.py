@@ -0,0 +1,22 @@
+"""Recompute the pre-aggregated answer statistics."""
+from django.core.management.base import BaseCommand
+
+from survey.models import Survey
+from survey.stats import rebuild_survey_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the answer statistics of the given surveys (or all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        surveys = Survey.objects.order_by('pk')
+        if options['survey_id']:
+            surveys = surveys.filter(pk__in=options['survey_id'])
+        for survey in surveys:
+            rebuild_survey_stats(survey)
+            if options['verbosity'] > 0:
+                self.stdout.write("Rebuilt statistics of survey %d" %
+                                  survey.pk)
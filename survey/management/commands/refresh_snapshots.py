@@ -0,0 +1,36 @@
+"""Refresh the columnar snapshots of the answers of surveys."""
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.models import Survey
+from survey.snapshot import CHUNK_SIZE, refresh_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = ("Append the new responses of surveys to their snapshots, see "
+            "survey.snapshot.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, nargs='*',
+                            help="The published surveys by default.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--rebuild', action='store_true', default=False,
+                            help="Build the snapshots from scratch.")
+
+    def handle(self, *args, **options):
+        if not snapshot_dir():
+            raise CommandError("TANUKI_SNAPSHOT_DIR is not set.")
+        if options['survey_id']:
+            surveys = []
+            for survey_id in options['survey_id']:
+                try:
+                    surveys.append(Survey.objects.get(pk=survey_id))
+                except Survey.DoesNotExist:
+                    raise CommandError("Survey %s does not exist" %
+                                       survey_id)
+        else:
+            surveys = Survey.objects.filter(is_published=True)
+        for survey in surveys:
+            count = refresh_snapshot(survey, rebuild=options['rebuild'],
+                                     chunk_size=options['chunk_size'])
+            self.stdout.write("Added %d responses to the snapshot of "
+                              "survey %d" % (count, survey.pk))
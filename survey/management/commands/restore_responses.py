@@ -0,0 +1,25 @@
+"""Restore the archived responses of surveys."""
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.archive import CHUNK_SIZE, restore_survey
+from survey.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Move the archived responses of surveys back to the hot tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, nargs='+')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        surveys = []
+        for survey_id in options['survey_id']:
+            try:
+                surveys.append(Survey.objects.get(pk=survey_id))
+            except Survey.DoesNotExist:
+                raise CommandError("Survey %s does not exist" % survey_id)
+        for survey in surveys:
+            count = restore_survey(survey, chunk_size=options['chunk_size'])
+            self.stdout.write("Restored %d responses of survey %d" %
+                              (count, survey.pk))
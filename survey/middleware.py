@@ -0,0 +1,80 @@
+"""Middlewares of the survey app."""
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from survey import instrumentation, routers
+
+
+class InstrumentationMiddleware(object):
+    """
+    Record the metrics of the requests handled by the survey views.
+
+    Only the views based on ``survey.instrumentation.InstrumentedView`` are
+    measured. Queries are captured through the debug cursor of each
+    connection for the time of the request only, see survey.instrumentation
+    for the sinks.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = getattr(view_func, 'instrumented_view', None)
+        if view_name is None:
+            return None
+        instrumentation.start(view_name)
+        request._tanuki_metrics = {
+            'start': time.time(),
+            'connections': [
+                (c, c.force_debug_cursor, len(c.queries_log))
+                for c in connections.all()
+            ],
+        }
+        for connection in connections.all():
+            connection.force_debug_cursor = True
+        return None
+
+    def process_template_response(self, request, response):
+        if getattr(request, '_tanuki_metrics', None) is not None:
+            with instrumentation.timer('render'):
+                response.render()
+        return response
+
+    def process_response(self, request, response):
+        state = getattr(request, '_tanuki_metrics', None)
+        if state is None:
+            return response
+        request._tanuki_metrics = None
+        metrics = instrumentation.stop()
+        for connection, debug_cursor, offset in state['connections']:
+            queries = list(connection.queries_log)[offset:]
+            metrics['queries'] += len(queries)
+            metrics['db_time'] += sum(float(q['time']) for q in queries) * 1000
+            connection.force_debug_cursor = debug_cursor
+        metrics['total'] = (time.time() - state['start']) * 1000
+        metrics['path'] = request.path
+        metrics['method'] = request.method
+        metrics['status'] = response.status_code
+        instrumentation.emit(metrics)
+        return response
+
+
+class ReplicaPinningMiddleware(object):
+    """
+    Keep reading from the primary database for a while after a client
+    wrote survey data, see survey.routers.
+    """
+
+    cookie_name = 'tanuki_primary'
+
+    def process_request(self, request):
+        # the pinning of the previous request is reset by request_started
+        if request.COOKIES.get(self.cookie_name):
+            routers.pin()
+
+    def process_response(self, request, response):
+        if routers.has_written():
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=getattr(settings, 'TANUKI_REPLICA_PIN_SECONDS', 10),
+                httponly=True)
+        return response
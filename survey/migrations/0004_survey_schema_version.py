@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0003_auto_20160313_2126'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='schema_version',
+            field=models.CharField(default=b'', editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0004_survey_schema_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionChoiceCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('choice', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='survey.Question')),
+            ],
+            options={
+                'verbose_name': 'question choice count',
+                'verbose_name_plural': 'question choice counts',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionNumericSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('minimum', models.IntegerField(blank=True, null=True)),
+                ('maximum', models.IntegerField(blank=True, null=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='survey.Question')),
+            ],
+            options={
+                'verbose_name': 'question numeric summary',
+                'verbose_name_plural': 'question numeric summaries',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='questionchoicecount',
+            unique_together=set([('question', 'choice')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_answer_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerSelectMultipleChoice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('choice', models.CharField(max_length=255)),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selected_choices', to='survey.AnswerSelectMultiple')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='survey.Question')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='answerselectmultiplechoice',
+            index_together=set([('question', 'choice')]),
+        ),
+    ]
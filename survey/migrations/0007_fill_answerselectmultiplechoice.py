@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from survey.utils import parse_multiple
+
+BATCH_SIZE = 1000
+
+
+def fill_selected_choices(apps, schema_editor):
+    AnswerSelectMultiple = apps.get_model('survey', 'AnswerSelectMultiple')
+    AnswerSelectMultipleChoice = apps.get_model(
+        'survey', 'AnswerSelectMultipleChoice')
+    max_length = AnswerSelectMultipleChoice._meta.get_field(
+        'choice').max_length
+    rows = AnswerSelectMultiple.objects.values_list(
+        'pk', 'question_id', 'body').order_by('pk')
+    batch = []
+    for pk, question_id, body in rows.iterator():
+        for choice in parse_multiple(body):
+            batch.append(AnswerSelectMultipleChoice(
+                answer_id=pk, question_id=question_id,
+                choice=choice[:max_length]))
+        if len(batch) >= BATCH_SIZE:
+            AnswerSelectMultipleChoice.objects.bulk_create(batch)
+            batch = []
+    AnswerSelectMultipleChoice.objects.bulk_create(batch)
+
+
+def clear_selected_choices(apps, schema_editor):
+    AnswerSelectMultipleChoice = apps.get_model(
+        'survey', 'AnswerSelectMultipleChoice')
+    AnswerSelectMultipleChoice.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0006_answerselectmultiplechoice'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_selected_choices, clear_selected_choices),
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_fill_answerselectmultiplechoice'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answerbase',
+            name='response',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='survey.Response'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='survey',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='survey.Survey'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='survey',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='survey.Survey'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='interview_uuid',
+            field=models.CharField(max_length=36, unique=True, verbose_name='Interview unique identifier'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='survey',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='survey.Survey'),
+        ),
+        migrations.AlterIndexTogether(
+            name='answerbase',
+            index_together=set([('response', 'question')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='category',
+            index_together=set([('survey', 'order')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='question',
+            index_together=set([('survey', 'category', 'order')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='response',
+            index_together=set([('survey', 'user')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def fill_completions(apps, schema_editor):
+    Response = apps.get_model('survey', 'Response')
+    SurveyCompletion = apps.get_model('survey', 'SurveyCompletion')
+    rows = Response.objects.exclude(user=None).values_list(
+        'survey_id', 'user_id').distinct().order_by()
+    SurveyCompletion.objects.bulk_create(
+        SurveyCompletion(survey_id=survey_id, user_id=user_id)
+        for survey_id, user_id in rows
+    )
+
+
+def clear_completions(apps, schema_editor):
+    SurveyCompletion = apps.get_model('survey', 'SurveyCompletion')
+    SurveyCompletion.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_surveycompletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_completions, clear_completions),
+    ]
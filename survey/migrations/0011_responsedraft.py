@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:07
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('survey', '0010_fill_surveycompletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseDraft',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('expires', models.DateTimeField(db_index=True)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='survey.Survey')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'response draft',
+                'verbose_name_plural': 'response drafts',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResponseDraftValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=100)),
+                ('value', models.TextField()),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='survey.ResponseDraft')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='responsedraftvalue',
+            unique_together=set([('draft', 'field_name')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='responsedraft',
+            unique_together=set([('survey', 'key')]),
+        ),
+    ]
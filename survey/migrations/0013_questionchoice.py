@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0012_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionChoice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField()),
+                ('value', models.TextField()),
+                ('label', models.TextField()),
+                ('image', models.TextField(blank=True)),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='question_choices', to='survey.Question')),
+            ],
+            options={
+                'ordering': ('question', 'order'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='questionchoice',
+            unique_together=set([('question', 'order')]),
+        ),
+    ]
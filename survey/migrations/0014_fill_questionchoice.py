@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import uuid
+
+from django.db import migrations
+
+from survey.utils import parse_choices
+
+BATCH_SIZE = 1000
+CHOICES_TYPES = ('radio', 'select', 'select_image', 'select-multiple')
+
+
+def fill_question_choices(apps, schema_editor):
+    Question = apps.get_model('survey', 'Question')
+    QuestionChoice = apps.get_model('survey', 'QuestionChoice')
+    Survey = apps.get_model('survey', 'Survey')
+    questions = Question.objects.filter(
+        question_type__in=CHOICES_TYPES
+    ).values_list('pk', 'question_type', 'choices', 'survey__separator')
+    batch = []
+    for pk, question_type, choices, separator in questions.iterator():
+        for order, (value, label, image) in enumerate(parse_choices(
+                choices, separator=separator,
+                images=question_type == 'select_image')):
+            batch.append(QuestionChoice(question_id=pk, order=order,
+                                        value=value, label=label,
+                                        image=image))
+        if len(batch) >= BATCH_SIZE:
+            QuestionChoice.objects.bulk_create(batch)
+            batch = []
+    QuestionChoice.objects.bulk_create(batch)
+    # the cached schemas and rendered forms use the old choices
+    for pk in Survey.objects.values_list('pk', flat=True):
+        Survey.objects.filter(pk=pk).update(schema_version=uuid.uuid4().hex)
+
+
+def clear_question_choices(apps, schema_editor):
+    QuestionChoice = apps.get_model('survey', 'QuestionChoice')
+    QuestionChoice.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0013_questionchoice'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_question_choices, clear_question_choices),
+    ]
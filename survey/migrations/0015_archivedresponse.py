@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 12:19
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('survey', '0014_fill_questionchoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResponse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('response_id', models.IntegerField()),
+                ('interview_uuid', models.CharField(max_length=36, unique=True)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('answers', models.TextField()),
+                ('survey', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='survey.Survey')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'archived response',
+                'verbose_name_plural': 'archived responses',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedresponse',
+            index_together=set([('survey', 'response_id')]),
+        ),
+    ]
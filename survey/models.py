@@ -1,9 +1,14 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from .utils import validate_list
 from django.conf import settings
-from survey.utils import get_choices
+from survey.utils import parse_choices
 
 
 class Survey(models.Model):
@@ -14,6 +19,10 @@ class Survey(models.Model):
     display_by_question = models.BooleanField(default=False)
     template = models.CharField(max_length=255, null=True, blank=True)
     separator = models.CharField(max_length=1, default=',')
+    # renewed each time the survey or its questions/categories change, used
+    # to invalidate the cached schema (see survey.schema)
+    schema_version = models.CharField(max_length=32, editable=False,
+                                      default='')
 
     class Meta:
         verbose_name = _('survey')
@@ -37,12 +46,14 @@ class Survey(models.Model):
 
 class Category(models.Model):
     name = models.CharField(max_length=400)
-    survey = models.ForeignKey(Survey)
+    # indexed by the (survey, order) index below
+    survey = models.ForeignKey(Survey, db_index=False)
     order = models.IntegerField(blank=True, null=True)
 
     class Meta:
         verbose_name = _('category')
         verbose_name_plural = _('categories')
+        index_together = [('survey', 'order')]
 
     def __unicode__(self):
         return (self.name)
@@ -66,12 +77,15 @@ class Question(models.Model):
         (SELECT_IMAGE, _(u'Select Image')),
         (INTEGER, _(u'integer')),
     )
+    # question types answered by picking among the choices
+    CHOICES_TYPES = (RADIO, SELECT, SELECT_IMAGE, SELECT_MULTIPLE)
 
     text = models.TextField()
     order = models.IntegerField()
     required = models.BooleanField(default=False)
     category = models.ForeignKey(Category, blank=True, null=True,)
-    survey = models.ForeignKey(Survey)
+    # indexed by the (survey, category, order) index below
+    survey = models.ForeignKey(Survey, db_index=False)
     question_type = models.CharField(max_length=200,
                                      choices=QUESTION_TYPES,
                                      default=TEXT)
@@ -87,6 +101,7 @@ class Question(models.Model):
         verbose_name = _('question')
         verbose_name_plural = _('questions')
         ordering = ('survey', 'order')
+        index_together = [('survey', 'category', 'order')]
 
     def save(self, *args, **kwargs):
         is_radio = self.question_type == Question.RADIO
@@ -94,13 +109,88 @@ class Question(models.Model):
         is_select_multiple = self.question_type == Question.SELECT_MULTIPLE
         if (is_radio or is_select or is_select_multiple):
             validate_list(self.choices, separator=self.survey.separator)
-        super(Question, self).save(*args, **kwargs)
+        # the choice rows must be up to date when the new schema version of
+        # the survey becomes visible.
+        with transaction.atomic(using=kwargs.get('using')):
+            super(Question, self).save(*args, **kwargs)
+            self.save_choices(using=kwargs.get('using'))
+
+    def save_choices(self, using=None):
+        """
+        Update the QuestionChoice rows to the parsed choices.
+
+        Only the rows of the choices that changed are written. The choices
+        set by a queryset ``update()`` are not seen, this method must be
+        called on the questions afterwards.
+        """
+        choices = []
+        if self.question_type in Question.CHOICES_TYPES:
+            choices = parse_choices(
+                self.choices, separator=self.survey.separator,
+                images=self.question_type == Question.SELECT_IMAGE)
+        rows = QuestionChoice.objects.using(using).filter(question=self)
+        existing = dict((c.order, c) for c in rows)
+        created = []
+        for order, (value, label, image) in enumerate(choices):
+            row = existing.pop(order, None)
+            if row is None:
+                created.append(QuestionChoice(
+                    question=self, order=order, value=value, label=label,
+                    image=image))
+            elif (row.value, row.label, row.image) != (value, label, image):
+                rows.filter(pk=row.pk).update(value=value, label=label,
+                                              image=image)
+        if existing:
+            rows.filter(pk__in=[c.pk for c in existing.values()]).delete()
+        if created:
+            QuestionChoice.objects.using(using).bulk_create(created)
 
     def __unicode__(self):
         return (self.text)
 
+    def parsed_choices(self):
+        """
+        Return the (value, label, image) choices of the question.
+
+        Prefetch ``question_choices`` to get the choices of many questions
+        in one query. The ``choices`` field is parsed when there is no
+        QuestionChoice row, as for questions created by ``update()``. The
+        rows are trusted otherwise, see ``save_choices``.
+        """
+        rows = [(c.value, c.label, c.image)
+                for c in self.question_choices.all()]
+        if rows or self.question_type not in Question.CHOICES_TYPES:
+            return rows
+        return parse_choices(
+            self.choices, separator=self.survey.separator,
+            images=self.question_type == Question.SELECT_IMAGE)
+
     def get_choices(self):
-        return get_choices(self.choices, separator=self.survey.separator)
+        """Return the (value, label) choices of the question."""
+        return tuple((value, label)
+                     for value, label, image in self.parsed_choices())
+
+
+class QuestionChoice(models.Model):
+    """
+    A choice of a question, parsed from ``Question.choices`` each time the
+    question is saved, loaded from a fixture, or the separator of its survey
+    changes.
+    """
+    # indexed by the (question, order) unique index below
+    question = models.ForeignKey(Question, related_name='question_choices',
+                                 db_index=False)
+    order = models.PositiveIntegerField()
+    value = models.TextField()
+    label = models.TextField()
+    image = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('question', 'order')
+        unique_together = ('question', 'order')
+
+    def __unicode__(self):
+        return (self.label)
 
 
 class Response(models.Model):
@@ -110,25 +200,82 @@ class Response(models.Model):
     """
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
-    survey = models.ForeignKey(Survey)
+    # indexed by the (survey, user) index below
+    survey = models.ForeignKey(Survey, db_index=False)
     user = models.ForeignKey(User, null=True, blank=True)
     interview_uuid = models.CharField(_(u"Interview unique identifier"),
-                                      max_length=36)
+                                      max_length=36, unique=True)
 
     class Meta:
         verbose_name = _('response')
         verbose_name_plural = _('responses')
+        index_together = [('survey', 'user')]
 
     def __unicode__(self):
         return ("response %s" % self.interview_uuid)
 
 
+class SurveyCompletion(models.Model):
+    """Record that a logged user has completed a survey."""
+    survey = models.ForeignKey(Survey)
+    user = models.ForeignKey(User)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('survey completion')
+        verbose_name_plural = _('survey completions')
+        unique_together = ('user', 'survey')
+
+    def __unicode__(self):
+        return (u"%s completed %s" % (self.user, self.survey))
+
+
+class ResponseDraft(models.Model):
+    """
+    Progress of a respondent through a multi-step survey.
+
+    A draft is identified by its survey and a key built from the user or
+    the session of the respondent, it expires after some inactivity.
+    """
+    survey = models.ForeignKey(Survey)
+    key = models.CharField(max_length=100)
+    user = models.ForeignKey(User, null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    expires = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = _('response draft')
+        verbose_name_plural = _('response drafts')
+        unique_together = ('survey', 'key')
+
+    def __unicode__(self):
+        return ("draft %s" % self.key)
+
+
+class ResponseDraftValue(models.Model):
+    """Cleaned value of one field of a draft, JSON encoded."""
+    draft = models.ForeignKey(ResponseDraft, related_name='values')
+    field_name = models.CharField(max_length=100)
+    value = models.TextField()
+
+    class Meta:
+        unique_together = ('draft', 'field_name')
+
+    def __unicode__(self):
+        return (self.field_name)
+
+
 class AnswerBase(models.Model):
     question = models.ForeignKey(Question)
-    response = models.ForeignKey(Response)
+    # indexed by the (response, question) index below
+    response = models.ForeignKey(Response, db_index=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        index_together = [('response', 'question')]
+
 # these type-specific answer models use a text field to allow for flexible
 # field sizes depending on the actual question this answer corresponds to. any
 # "required" attribute will be enforced by the form.
@@ -152,3 +299,207 @@ class AnswerSelectMultiple(AnswerBase):
 
 class AnswerInteger(AnswerBase):
     body = models.IntegerField(blank=True, null=True)
+
+
+class AnswerSelectMultipleChoice(models.Model):
+    """
+    One of the choices selected in an AnswerSelectMultiple.
+
+    Selected choices are stored one per row so they can be filtered and
+    counted in the database, the answer body keeps the whole selection.
+    """
+    answer = models.ForeignKey(AnswerSelectMultiple,
+                               related_name='selected_choices')
+    question = models.ForeignKey(Question)
+    choice = models.CharField(max_length=255)
+
+    class Meta:
+        index_together = [('question', 'choice')]
+
+    def __unicode__(self):
+        return (self.choice)
+
+
+class Answer(models.Model):
+    """
+    An answer of the unified answer store, see survey.answers.
+
+    ``kind`` is the type of the question. Text answers are stored in
+    ``text``, integer answers in ``number`` and the picked choice in
+    ``choice``. A select multiple answer takes one row per selected choice,
+    or a single row without choice if nothing was selected.
+    """
+    # indexed by the (response, question) index below
+    response = models.ForeignKey(Response, db_index=False)
+    # indexed by the (question, choice) index below
+    question = models.ForeignKey(Question, db_index=False)
+    kind = models.CharField(max_length=200, choices=Question.QUESTION_TYPES)
+    text = models.TextField(blank=True, null=True)
+    number = models.IntegerField(blank=True, null=True)
+    choice = models.CharField(max_length=255, blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('answer')
+        verbose_name_plural = _('answers')
+        index_together = [('response', 'question'), ('question', 'choice')]
+
+    def __unicode__(self):
+        return (u"answer to question %d" % self.question_id)
+
+
+class ArchivedResponse(models.Model):
+    """
+    A response of an archived survey, with its answers in a single row.
+
+    ``answers`` maps the question ids to the answer values, JSON encoded.
+    See survey.archive.
+    """
+    # indexed by the (survey, response_id) index below
+    survey = models.ForeignKey(Survey, db_index=False)
+    # primary key of the response before it was archived
+    response_id = models.IntegerField()
+    interview_uuid = models.CharField(max_length=36, unique=True)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    user = models.ForeignKey(User, null=True, blank=True,
+                             on_delete=models.SET_NULL)
+    answers = models.TextField()
+
+    class Meta:
+        verbose_name = _('archived response')
+        verbose_name_plural = _('archived responses')
+        index_together = [('survey', 'response_id')]
+
+    def __unicode__(self):
+        return ("archived response %s" % self.interview_uuid)
+
+
+class OutboxMessage(models.Model):
+    """
+    survey_completed payload waiting to be delivered to the receivers.
+
+    Messages are written in the same transaction as their response when
+    the signal is dispatched asynchronously (see survey.outbox).
+    """
+    response = models.ForeignKey(Response, null=True, blank=True,
+                                 on_delete=models.SET_NULL)
+    payload = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    delivered = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = _('outbox message')
+        verbose_name_plural = _('outbox messages')
+        index_together = [('delivered', 'next_attempt')]
+
+    def __unicode__(self):
+        return (u"message %d" % self.pk)
+
+
+class QuestionChoiceCount(models.Model):
+    """Number of answers of a choices question that picked a choice."""
+    question = models.ForeignKey(Question)
+    choice = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _('question choice count')
+        verbose_name_plural = _('question choice counts')
+        unique_together = ('question', 'choice')
+
+    def __unicode__(self):
+        return (u"%s: %d" % (self.choice, self.count))
+
+
+class QuestionNumericSummary(models.Model):
+    """Running summary of the answers of an integer question."""
+    question = models.OneToOneField(Question)
+    count = models.PositiveIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    minimum = models.IntegerField(blank=True, null=True)
+    maximum = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('question numeric summary')
+        verbose_name_plural = _('question numeric summaries')
+
+    def __unicode__(self):
+        return (u"%d answers" % self.count)
+
+    @property
+    def mean(self):
+        if self.count:
+            return float(self.total) / self.count
+        return None
+
+
+@receiver(pre_save, sender=Survey)
+def bump_survey_schema_version(sender, instance, raw, using, **kwargs):
+    instance.schema_version = uuid.uuid4().hex
+    instance._separator_changed = not raw and instance.pk is not None and \
+        Survey.objects.using(using).filter(pk=instance.pk).exclude(
+            separator=instance.separator).exists()
+
+
+@receiver(post_save, sender=Survey)
+def parse_survey_choices(sender, instance, using, **kwargs):
+    if not getattr(instance, '_separator_changed', False):
+        return
+    instance._separator_changed = False
+    questions = Question.objects.using(using).filter(
+        survey=instance, question_type__in=Question.CHOICES_TYPES)
+    for question in questions:
+        question.survey = instance
+        question.save_choices(using=using)
+    # a schema may have been built from the previous choices meanwhile
+    instance.schema_version = uuid.uuid4().hex
+    Survey.objects.using(using).filter(pk=instance.pk).update(
+        schema_version=instance.schema_version)
+
+
+@receiver(post_save, sender=Question)
+def parse_loaded_choices(sender, instance, raw, using, **kwargs):
+    # loaddata saves the questions without calling Question.save()
+    if raw:
+        instance.save_choices(using=using)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Question)
+def bump_related_schema_version(sender, instance, **kwargs):
+    Survey.objects.filter(pk=instance.survey_id).update(
+        schema_version=uuid.uuid4().hex
+    )
+
+
+@receiver([post_save, post_delete], sender=Survey)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_survey_list(sender, instance, **kwargs):
+    from survey.listing import invalidate_survey_list
+    invalidate_survey_list()
+
+
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=AnswerInteger)
+@receiver(post_delete, sender=AnswerSelectMultiple)
+@receiver(post_delete, sender=AnswerSelect)
+@receiver(post_delete, sender=AnswerRadio)
+def forget_answer_stats(sender, instance, **kwargs):
+    from survey.stats import forget_answers
+    forget_answers([instance])
+
+
+@receiver(post_delete, sender=Response)
+def forget_survey_completion(sender, instance, **kwargs):
+    if instance.user_id is None:
+        return
+    others = Response.objects.filter(survey=instance.survey_id,
+                                     user=instance.user_id)
+    if not others.exists():
+        from survey.completion import forget_completion
+        forget_completion(instance.user_id, instance.survey_id)
@@ -0,0 +1,141 @@
+"""Asynchronous dispatch of the survey_completed signal.
+
+When ``TANUKI_ASYNC_SIGNALS`` is set, saving a response does not send
+``survey_completed`` but writes its payload as an ``OutboxMessage`` in the
+same transaction as the response. The ``deliver_survey_events`` command
+then sends the signal to the registered receivers, in batches and with a
+pool of worker threads. A message whose receivers raised is retried later
+with an exponential backoff, so receivers must accept to see a payload
+more than once.
+"""
+import datetime
+import json
+import logging
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from survey.models import OutboxMessage, Response
+from survey.signals import survey_completed
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 10
+# seconds to wait after the first failure, doubled after each failure
+BACKOFF = 30
+MAX_BACKOFF = 6 * 3600
+# seconds a claimed message is hidden from the other workers
+LEASE = 300
+
+
+def is_async():
+    return getattr(settings, 'TANUKI_ASYNC_SIGNALS', False)
+
+
+def enqueue(response, data):
+    """Write the survey_completed payload of a response in the outbox."""
+    return OutboxMessage.objects.create(
+        response=response, payload=json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def enqueue_many(events):
+    """Write the payloads of a list of ``(response, data)`` in the outbox."""
+    return OutboxMessage.objects.bulk_create(
+        OutboxMessage(response=response,
+                      payload=json.dumps(data, cls=DjangoJSONEncoder))
+        for response, data in events
+    )
+
+
+def backoff(attempts):
+    """Return the delay before the next attempt after a failure."""
+    return datetime.timedelta(
+        seconds=min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF))
+
+
+def pending_messages(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Claim and return up to batch_size messages due for delivery."""
+    now = timezone.now()
+    candidates = OutboxMessage.objects.filter(
+        delivered=None, next_attempt__lte=now, attempts__lt=max_attempts
+    ).order_by('next_attempt')[:batch_size]
+    lease = now + datetime.timedelta(seconds=LEASE)
+    claimed = []
+    for message in candidates:
+        # another worker may have claimed the message in the meantime
+        if OutboxMessage.objects.filter(
+                pk=message.pk, next_attempt=message.next_attempt
+        ).update(next_attempt=lease):
+            claimed.append(message)
+    return claimed
+
+
+def deliver(message):
+    """
+    Send survey_completed for a message.
+
+    Return None on success, or the error raised by a receiver.
+    """
+    try:
+        data = json.loads(message.payload)
+        data['responses'] = [tuple(r) for r in data['responses']]
+        if message.response_id is not None:
+            instance = Response.objects.get(pk=message.response_id)
+        else:
+            instance = None
+        results = survey_completed.send_robust(sender=Response,
+                                               instance=instance, data=data)
+        for receiver, result in results:
+            if isinstance(result, Exception):
+                return u'%s: %r' % (getattr(receiver, '__name__', receiver),
+                                    result)
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def _deliver_in_thread(message):
+    try:
+        return deliver(message)
+    finally:
+        connection.close()
+
+
+def deliver_pending(batch_size=BATCH_SIZE, workers=1,
+                    max_attempts=MAX_ATTEMPTS):
+    """
+    Deliver one batch of messages.
+
+    Return the number of messages sent and the number of failures.
+    """
+    messages = pending_messages(batch_size, max_attempts)
+    if not messages:
+        return 0, 0
+    if workers > 1:
+        pool = ThreadPool(workers)
+        try:
+            errors = pool.map(_deliver_in_thread, messages)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        errors = [deliver(message) for message in messages]
+    now = timezone.now()
+    delivered = []
+    for message, error in zip(messages, errors):
+        if error is None:
+            delivered.append(message.pk)
+            continue
+        attempts = message.attempts + 1
+        logger.warning("survey_completed delivery %d of message %d failed: "
+                       "%s", attempts, message.pk, error)
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            attempts=attempts, next_attempt=now + backoff(attempts),
+            last_error=error)
+    OutboxMessage.objects.filter(pk__in=delivered).update(delivered=now)
+    return len(delivered), len(messages) - len(delivered)
@@ -0,0 +1,97 @@
+"""Database router sending the survey schema reads to a read replica.
+
+Set ``TANUKI_REPLICA_DATABASE`` to the alias of a replica of the primary
+database and install the router and its middleware::
+
+    DATABASE_ROUTERS = ['survey.routers.ReplicaRouter']
+    MIDDLEWARE_CLASSES = [
+        ...
+        'survey.middleware.ReplicaPinningMiddleware',
+    ]
+
+Surveys, categories, questions and their choices are then read from the
+replica, as well as the exports (see ``replica_database``). Responses,
+answers, drafts and completions are read from and written to the primary
+database, ``TANUKI_PRIMARY_DATABASE`` ('default' by default).
+
+Once survey data has been written, reads are pinned to the primary until
+the end of the request and, with the middleware, for
+``TANUKI_REPLICA_PIN_SECONDS`` after it for the same client, so a client
+reads its own writes despite the replication lag.
+"""
+import threading
+
+from django.conf import settings
+from django.core.signals import request_started
+
+SCHEMA_MODELS = ('survey', 'category', 'question', 'questionchoice')
+
+_local = threading.local()
+
+
+def primary_database():
+    return getattr(settings, 'TANUKI_PRIMARY_DATABASE', 'default')
+
+
+def replica_database():
+    """
+    Return the alias of the replica to read from.
+
+    Return None if no replica is configured or if the reads are pinned to
+    the primary database.
+    """
+    if is_pinned():
+        return None
+    return getattr(settings, 'TANUKI_REPLICA_DATABASE', None)
+
+
+def pin(written=False):
+    """Pin the reads of the current thread to the primary database."""
+    _local.pinned = True
+    if written:
+        _local.written = True
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False)
+
+
+def has_written():
+    """Return True if survey data was written since the last reset."""
+    return getattr(_local, 'written', False)
+
+
+def reset(**kwargs):
+    """Forget the pinning, called at the start of each request."""
+    _local.pinned = False
+    _local.written = False
+
+
+request_started.connect(reset)
+
+
+class ReplicaRouter(object):
+    """Route the reads of the survey schema to the replica."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'survey':
+            return None
+        if model._meta.model_name in SCHEMA_MODELS:
+            replica = replica_database()
+            if replica is not None:
+                return replica
+        return primary_database()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'survey':
+            return None
+        pin(written=True)
+        return primary_database()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both databases hold the same data
+        databases = (primary_database(),
+                     getattr(settings, 'TANUKI_REPLICA_DATABASE', None))
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
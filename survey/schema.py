@@ -0,0 +1,121 @@
+"""Compiled and cached description of the questions of a survey.
+
+Building a ``ResponseForm`` needs the ordered questions of a survey, their
+categories and their parsed choices. A ``SurveySchema`` holds all of that
+in immutable tuples so it can be shared between requests. The choices are
+read from the ``QuestionChoice`` rows, already parsed. Schemas are kept
+in a process-local LRU and, if ``TANUKI_SCHEMA_CACHE`` names a Django cache
+alias, in that cache too.
+
+Entries are keyed by ``Survey.schema_version``, a stamp renewed every time
+the survey, one of its categories or one of its questions is saved or
+deleted, so outdated schemas are simply never looked up again.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from survey.models import Category, Question
+
+CHOICES_TYPES = Question.CHOICES_TYPES
+
+QuestionSpec = namedtuple('QuestionSpec', [
+    'pk', 'field_name', 'text', 'question_type', 'required', 'choices',
+    'images', 'category_id', 'category_name',
+])
+
+CategorySpec = namedtuple('CategorySpec', ['pk', 'name', 'order'])
+
+SurveySchema = namedtuple('SurveySchema', [
+    'survey_id', 'version', 'questions', 'categories',
+])
+
+
+class LRUCache(object):
+    """Minimal thread safe least-recently-used mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return None
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(getattr(settings, 'TANUKI_SCHEMA_LRU_SIZE', 128))
+
+
+def cache_key(survey):
+    """Return the key identifying the current schema of a survey."""
+    return 'tanuki:schema:%d:%s' % (survey.pk, survey.schema_version)
+
+
+def build_schema(survey):
+    """Compile the schema of a survey from the database."""
+    questions = survey.questions().select_related('category')
+    questions = questions.prefetch_related('question_choices')
+    question_specs = []
+    for q in questions:
+        q.survey = survey
+        parsed = q.parsed_choices()
+        choices = tuple((value, label) for value, label, image in parsed)
+        images = tuple((value, image) for value, label, image in parsed
+                       if image)
+        question_specs.append(QuestionSpec(
+            pk=q.pk,
+            field_name="question_%d" % q.pk,
+            text=q.text,
+            question_type=q.question_type,
+            required=q.required,
+            choices=choices,
+            images=images,
+            category_id=q.category_id,
+            category_name=q.category.name if q.category else None,
+        ))
+    categories = Category.objects.filter(survey=survey).order_by('order')
+    return SurveySchema(
+        survey_id=survey.pk,
+        version=survey.schema_version,
+        questions=tuple(question_specs),
+        categories=tuple(CategorySpec(c.pk, c.name, c.order)
+                         for c in categories),
+    )
+
+
+def get_schema(survey):
+    """Return the schema of a survey, building it only on a cache miss."""
+    if not survey.pk:
+        return SurveySchema(None, None, (), ())
+    key = cache_key(survey)
+    schema = local_cache.get(key)
+    if schema is not None:
+        return schema
+    alias = getattr(settings, 'TANUKI_SCHEMA_CACHE', None)
+    if alias:
+        schema = caches[alias].get(key)
+    if schema is None:
+        schema = build_schema(survey)
+        if alias:
+            caches[alias].set(key, schema)
+    local_cache.set(key, schema)
+    return schema
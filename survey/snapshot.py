@@ -0,0 +1,547 @@
+"""Columnar snapshots of the answers of a survey.
+
+A snapshot holds the answers of the responses of a survey in one array per
+question, in a file of ``TANUKI_SNAPSHOT_DIR``, so the dashboards can
+count answers without querying the answer tables:
+
+* the radio and select questions are dictionary-encoded, an array of codes
+  (-1 for no answer) indexing the list of the distinct values,
+* the select multiple questions are dictionary-encoded too, with an array
+  of offsets telling where the codes of each response start,
+* the integer questions are an array of values with an array flagging the
+  responses that answered.
+
+Text questions are left out. The file is a list of segments, each one a
+JSON header followed by the arrays of the responses it adds and by the
+values it adds to the dictionaries. ``load_snapshot`` maps the file in
+memory and the arrays of a question are ctypes arrays over the map, made
+when a query first uses the question, so nothing is copied (unless the
+file was written on a machine of another byte order).
+
+The queries scan the arrays with ``map``, ``itertools.compress`` and
+``collections.Counter`` rather than with loops of Python statements, but
+without numpy they still look at the rows one by one: they are not
+vectorized.
+
+``refresh_snapshot`` appends the responses created since the high-water
+``Response.created`` of the snapshot, reading them by chunks, as a new
+segment at the end of the file; a segment left incomplete by a crash is
+ignored and overwritten by the next refresh. Two refreshes of a survey
+must not run at the same time. Responses created in the last
+``TANUKI_SNAPSHOT_LAG`` seconds (60 by default) are left for the next
+refresh, so a response saved by a transaction still running is not
+missed. The snapshot is rebuilt when the questions of the survey change;
+deleted or archived responses stay in it until it is rebuilt.
+"""
+import ctypes
+import datetime
+import json
+import mmap
+import operator
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from itertools import chain, compress
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.six.moves import map, zip
+
+from survey.analytics import (HISTOGRAM_BINS, bucket_width, crosstab_table,
+                              histogram, order_values)
+from survey.answers import answer_values
+from survey.models import Question, Response
+
+MAGIC = b'TNKSNAP2'
+PREAMBLE = struct.Struct('<8sI')
+ALIGNMENT = 8
+CHUNK_SIZE = 1000
+MISSING = -1
+CTYPES = {'b': ctypes.c_byte, 'i': ctypes.c_int}
+
+
+def snapshot_dir():
+    return getattr(settings, 'TANUKI_SNAPSHOT_DIR', None)
+
+
+def snapshot_path(survey):
+    return os.path.join(snapshot_dir(), 'survey-%d.snapshot' % survey.pk)
+
+
+def _from_bytes(typecode, data, byteorder):
+    values = array(typecode)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:  # Python 2
+        values.fromstring(data)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def _view(typecode, data, start, size, byteorder):
+    """Return the values of an array of the file, without copying them."""
+    if byteorder != sys.byteorder:
+        return _from_bytes(typecode, data[start:start + size], byteorder)
+    ctype = CTYPES[typecode]
+    return (ctype * (size // ctypes.sizeof(ctype))).from_buffer(data, start)
+
+
+def _select(values, mask):
+    return values if mask is None else compress(values, mask)
+
+
+class Column(object):
+    """The answers of a question, one set of arrays per segment."""
+
+    arrays = ()
+
+    def __init__(self):
+        self.dictionary = []
+        self.index = {}
+        # the dictionary values already in the file
+        self.saved = 0
+        self.segments = []
+        # the arrays of the rows appended since the last save
+        self.pending = self.new_arrays()
+
+    def new_arrays(self):
+        return dict((name, array(typecode))
+                    for name, typecode in self.arrays)
+
+    def add_segment(self, dictionary, arrays):
+        for value in dictionary:
+            self.encode(value)
+        self.saved = len(self.dictionary)
+        self.segments.append(arrays)
+
+    def chain(self, name):
+        return chain.from_iterable(arrays[name] for arrays
+                                   in self.segments + [self.pending])
+
+    def encode(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def decode(self, code):
+        return self.dictionary[code]
+
+    def wanted(self, answer_filter):
+        return set(self.index[value] for value in answer_filter.values or ()
+                   if value in self.index)
+
+
+class ChoiceColumn(Column):
+    """Dictionary-encoded answers of a radio or select question."""
+
+    arrays = (('codes', 'i'),)
+
+    def append(self, value):
+        if value in (None, ''):
+            self.pending['codes'].append(MISSING)
+        else:
+            self.pending['codes'].append(self.encode(value))
+
+    def row_codes(self):
+        return (() if code == MISSING else (code,)
+                for code in self.chain('codes'))
+
+    def match(self, answer_filter):
+        return bytearray(map(self.wanted(answer_filter).__contains__,
+                             self.chain('codes')))
+
+    def counts(self, mask=None):
+        counts = Counter(_select(self.chain('codes'), mask))
+        counts.pop(MISSING, None)
+        return counts
+
+
+class MultipleColumn(Column):
+    """Dictionary-encoded answers of a select multiple question."""
+
+    arrays = (('offsets', 'i'), ('codes', 'i'))
+
+    def new_arrays(self):
+        arrays = super(MultipleColumn, self).new_arrays()
+        arrays['offsets'].append(0)
+        return arrays
+
+    def append(self, value):
+        codes = self.pending['codes']
+        for choice in value or ():
+            codes.append(self.encode(choice))
+        self.pending['offsets'].append(len(codes))
+
+    def row_codes(self):
+        for arrays in self.segments + [self.pending]:
+            offsets, codes = arrays['offsets'], arrays['codes']
+            for row in range(len(offsets) - 1):
+                yield codes[offsets[row]:offsets[row + 1]]
+
+    def match(self, answer_filter):
+        wanted = self.wanted(answer_filter)
+        return bytearray(not wanted.isdisjoint(codes)
+                         for codes in self.row_codes())
+
+    def counts(self, mask=None):
+        return Counter(chain.from_iterable(
+            _select(self.row_codes(), mask)))
+
+
+class IntegerColumn(Column):
+    """Answers of an integer question, the values are not encoded."""
+
+    arrays = (('values', 'i'), ('present', 'b'))
+
+    def append(self, value):
+        self.pending['values'].append(value if value is not None else 0)
+        self.pending['present'].append(value is not None)
+
+    def row_codes(self):
+        return ((value,) if present else () for value, present
+                in zip(self.chain('values'), self.chain('present')))
+
+    def decode(self, code):
+        return code
+
+    def match(self, answer_filter):
+        wanted = None
+        if answer_filter.values is not None:
+            wanted = set()
+            for value in answer_filter.values:
+                try:
+                    wanted.add(int(value))
+                except ValueError:
+                    pass
+        low, high = answer_filter.minimum, answer_filter.maximum
+
+        def test(value):
+            if wanted is not None and value not in wanted:
+                return False
+            if low is not None and value < low:
+                return False
+            return high is None or value <= high
+        return bytearray(map(operator.and_, self.chain('present'),
+                             map(test, self.chain('values'))))
+
+    def answers(self, mask=None):
+        present = self.chain('present')
+        if mask is not None:
+            present = map(operator.and_, present, mask)
+        return compress(self.chain('values'), present)
+
+    def counts(self, mask=None):
+        return Counter(self.answers(mask))
+
+
+COLUMN_CLASSES = {
+    Question.RADIO: ChoiceColumn,
+    Question.SELECT: ChoiceColumn,
+    Question.SELECT_IMAGE: ChoiceColumn,
+    Question.SELECT_MULTIPLE: MultipleColumn,
+    Question.INTEGER: IntegerColumn,
+}
+
+
+def survey_columns(survey):
+    """Return the ``[question id, question type]`` of the snapshot."""
+    questions = survey.questions().filter(
+        question_type__in=list(COLUMN_CLASSES))
+    return [[pk, question_type] for pk, question_type
+            in questions.order_by('pk').values_list('pk', 'question_type')]
+
+
+class Snapshot(object):
+    """The answers of the responses of a survey, one array per question."""
+
+    def __init__(self, survey_id, columns, high_water=None,
+                 boundary_ids=()):
+        self.survey_id = survey_id
+        # [question id, question type] of the columns
+        self.columns = columns
+        self.high_water = high_water
+        # ids of the responses created at the high-water date
+        self.boundary_ids = list(boundary_ids)
+        self.response_segments = []
+        # ids of the responses appended since the last save
+        self.responses = array('i')
+        self._columns = {}
+        # the map of the file and the (header, data start) of its segments
+        self._data = None
+        self._segments = []
+        # the end of the last segment of the file, None without a file
+        self._end = None
+
+    @classmethod
+    def empty(cls, survey):
+        snapshot = cls(survey.pk, survey_columns(survey))
+        for question_id, question_type in snapshot.columns:
+            snapshot._columns[question_id] = COLUMN_CLASSES[question_type]()
+        return snapshot
+
+    def __len__(self):
+        segments = self.response_segments + [self.responses]
+        return sum(len(ids) for ids in segments)
+
+    def covers(self, questions):
+        """Return True if the snapshot holds the answers to questions."""
+        question_ids = set(pk for pk, question_type in self.columns)
+        return all(q.pk in question_ids for q in questions)
+
+    def column(self, question_id):
+        """Return the column of a question, mapped from the file if needed."""
+        column = self._columns.get(question_id)
+        if column is None:
+            column = COLUMN_CLASSES[dict(self.columns)[question_id]]()
+            for header, data_start in self._segments:
+                description = header['columns'][str(question_id)]
+                arrays = {}
+                for name, (typecode, start, size) in \
+                        description['arrays'].items():
+                    arrays[name] = _view(typecode, self._data,
+                                         data_start + start, size,
+                                         header['byteorder'])
+                column.add_segment(description['dictionary'], arrays)
+            self._columns[question_id] = column
+        return column
+
+    def append(self, response_id, values):
+        """Append a response and its ``{question_id: value}`` answers."""
+        self.responses.append(response_id)
+        for question_id, question_type in self.columns:
+            self.column(question_id).append(values.get(question_id))
+
+    def _write_segment(self, output):
+        """Write the responses appended since the last save."""
+        blobs = []
+        columns = {}
+        offset = 0
+        for question_id, question_type in self.columns:
+            column = self.column(question_id)
+            arrays = {}
+            for name, typecode in column.arrays:
+                values = column.pending[name]
+                size = len(values) * values.itemsize
+                arrays[name] = (typecode, offset, size)
+                blobs.append(values)
+                offset += size + (-size % ALIGNMENT)
+            columns[str(question_id)] = {
+                'dictionary': column.dictionary[column.saved:],
+                'arrays': arrays}
+            column.add_segment((), column.pending)
+            column.pending = column.new_arrays()
+        size = len(self.responses) * self.responses.itemsize
+        header = json.dumps({
+            'survey_id': self.survey_id,
+            'columns_spec': self.columns,
+            'high_water': (self.high_water.isoformat()
+                           if self.high_water else None),
+            'boundary_ids': self.boundary_ids,
+            'byteorder': sys.byteorder,
+            'responses': (self.responses.typecode, offset, size),
+            'length': offset + size + (-size % ALIGNMENT),
+            'columns': columns,
+        }).encode('utf-8')
+        blobs.append(self.responses)
+        self.response_segments.append(self.responses)
+        self.responses = array('i')
+        output.write(PREAMBLE.pack(MAGIC, len(header)))
+        output.write(header)
+        output.write(b'\0' * (-output.tell() % ALIGNMENT))
+        for values in blobs:
+            values.tofile(output)
+            output.write(b'\0' * (-output.tell() % ALIGNMENT))
+        self._end = output.tell()
+
+    def save(self, path):
+        """
+        Append the new responses to the file of the snapshot, or write the
+        file, replaced atomically, if the snapshot was not loaded from one.
+        Nothing is written when there are no new responses.
+        """
+        if self._end is not None:
+            if self.responses:
+                with open(path, 'r+b') as output:
+                    # drop what an interrupted save left
+                    output.seek(self._end)
+                    self._write_segment(output)
+                    output.truncate()
+            return
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                self._write_segment(output)
+            os.rename(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Map a snapshot file, its columns are read when first used."""
+        with open(path, 'rb') as snapshot_file:
+            # the ctypes arrays need a writable map, the pages are private
+            data = mmap.mmap(snapshot_file.fileno(), 0,
+                             access=mmap.ACCESS_COPY)
+        segments = []
+        end = 0
+        while end + PREAMBLE.size <= len(data):
+            magic, size = PREAMBLE.unpack_from(data, end)
+            header_end = end + PREAMBLE.size + size
+            if magic != MAGIC or header_end > len(data):
+                break
+            header = json.loads(
+                data[end + PREAMBLE.size:header_end].decode('utf-8'))
+            data_start = header_end + (-header_end % ALIGNMENT)
+            if data_start + header['length'] > len(data):
+                break
+            segments.append((header, data_start))
+            end = data_start + header['length']
+        if not segments:
+            raise ValueError("%s is not a survey snapshot." % path)
+        first, last = segments[0][0], segments[-1][0]
+        high_water = last['high_water']
+        snapshot = cls(
+            first['survey_id'], first['columns_spec'],
+            parse_datetime(high_water) if high_water else None,
+            last['boundary_ids'])
+        for header, data_start in segments:
+            typecode, start, size = header['responses']
+            snapshot.response_segments.append(_view(
+                typecode, data, data_start + start, size,
+                header['byteorder']))
+        snapshot._data = data
+        snapshot._segments = segments
+        snapshot._end = end
+        return snapshot
+
+    def mask(self, filters=()):
+        """
+        Return a bytearray flagging the responses matching the filters,
+        or None without filters.
+        """
+        mask = None
+        for answer_filter in filters:
+            match = self.column(answer_filter.question.pk).match(
+                answer_filter)
+            if mask is None:
+                mask = match
+            else:
+                mask = bytearray(map(operator.and_, mask, match))
+        return mask
+
+    def response_count(self, filters=()):
+        mask = self.mask(filters)
+        return len(self) if mask is None else mask.count(b'\1')
+
+    def answer_counts(self, question, filters=()):
+        """Like ``survey.analytics.answer_counts``."""
+        column = self.column(question.pk)
+        counts = dict((column.decode(code), count) for code, count
+                      in column.counts(self.mask(filters)).items())
+        return [(value, counts[value])
+                for value in order_values(question, counts)]
+
+    def crosstab(self, row_question, column_question, filters=()):
+        """Like ``survey.analytics.crosstab``."""
+        row_column = self.column(row_question.pk)
+        column_column = self.column(column_question.pk)
+        cells = Counter()
+        for row_codes, column_codes in _select(
+                zip(row_column.row_codes(), column_column.row_codes()),
+                self.mask(filters)):
+            for row_code in row_codes:
+                for column_code in column_codes:
+                    cells[(row_code, column_code)] += 1
+        return crosstab_table(row_question, column_question, dict(
+            ((row_column.decode(r), column_column.decode(c)), count)
+            for (r, c), count in cells.items()))
+
+    def numeric_summary(self, question, filters=(), bins=HISTOGRAM_BINS):
+        """Like ``survey.analytics.numeric_summary``."""
+        values = sorted(self.column(question.pk).answers(self.mask(filters)))
+        count = len(values)
+        summary = {'count': count, 'mean': None, 'median': None,
+                   'minimum': None, 'maximum': None, 'histogram': []}
+        if not count:
+            return summary
+        minimum, maximum = values[0], values[-1]
+        middle = values[(count - 1) // 2:count // 2 + 1]
+        width = bucket_width(minimum, maximum, bins)
+        counts = Counter((value - minimum) // width for value in values)
+        summary.update({
+            'mean': sum(values) / float(count),
+            'median': sum(middle) / float(len(middle)),
+            'minimum': minimum,
+            'maximum': maximum,
+            'histogram': histogram(minimum, maximum, width, counts),
+        })
+        return summary
+
+
+def load_snapshot(survey, path=None):
+    """
+    Return the snapshot of a survey, or None if there is none or if the
+    questions of the survey changed since it was built.
+    """
+    if path is None:
+        if not snapshot_dir():
+            return None
+        path = snapshot_path(survey)
+    if not os.path.exists(path):
+        return None
+    snapshot = Snapshot.load(path)
+    if snapshot.columns != survey_columns(survey):
+        return None
+    return snapshot
+
+
+def refresh_snapshot(survey, path=None, rebuild=False,
+                     chunk_size=CHUNK_SIZE):
+    """
+    Append the new responses of a survey to its snapshot, creating it if
+    needed. Return the number of appended responses.
+    """
+    if path is None:
+        path = snapshot_path(survey)
+    snapshot = None if rebuild else load_snapshot(survey, path)
+    if snapshot is None:
+        snapshot = Snapshot.empty(survey)
+    lag = datetime.timedelta(
+        seconds=getattr(settings, 'TANUKI_SNAPSHOT_LAG', 60))
+    qs = Response.objects.filter(survey=survey,
+                                 created__lt=timezone.now() - lag)
+    if snapshot.high_water is not None:
+        qs = qs.filter(created__gte=snapshot.high_water).exclude(
+            pk__in=snapshot.boundary_ids)
+    qs = qs.order_by('created', 'pk').values_list('pk', 'created')
+    appended = 0
+    last = None
+    while True:
+        page = qs
+        if last is not None:
+            last_pk, last_created = last
+            same_date = Q(created=last_created, pk__gt=last_pk)
+            page = qs.filter(Q(created__gt=last_created) | same_date)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            break
+        values = answer_values([row[0] for row in chunk])
+        for pk, created in chunk:
+            snapshot.append(pk, values[pk])
+            if created != snapshot.high_water:
+                snapshot.high_water = created
+                snapshot.boundary_ids = []
+            snapshot.boundary_ids.append(pk)
+        appended += len(chunk)
+        last = chunk[-1]
+    snapshot.save(path)
+    return appended
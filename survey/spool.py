@@ -0,0 +1,216 @@
+"""Write-behind ingestion of the survey responses.
+
+When ``TANUKI_SPOOL_PATH`` names a file, ``SurveyDetail`` does not save the
+validated responses itself: it appends them to a local SQLite spool in WAL
+mode and answers at once with their interview uuid. The ``drain_spool``
+command then saves the spooled responses in batches, with the bulk writes
+of ``save_cleaned_responses``, and only afterwards removes them from the
+spool. A drainer that crashed leaves its batch in the spool, and the next
+run saves it again, skipping the interview uuids already saved. Only one
+drainer must run for a spool.
+
+Once ``TANUKI_SPOOL_MAX_PENDING`` responses (100000 by default) wait in the
+spool, ``spool_values`` raises ``SpoolFull`` and the view answers 503, so
+a drainer falling behind does not fill the disk.
+
+The responses of surveys that need a logged user are still saved at once,
+as the completion check of the next request has to see them. Spooled
+responses keep the date they were submitted as their creation date, so a
+drainer falling behind does not shift them.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from survey.answers import LOOKUP_BATCH_SIZE
+from survey.forms import ResponseForm
+from survey.models import Response, Survey
+from survey.submission import save_cleaned_responses
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spooled_response (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id INTEGER NOT NULL,
+    interview_uuid TEXT NOT NULL,
+    user_id INTEGER,
+    callback_code TEXT,
+    value_data TEXT NOT NULL,
+    created TEXT
+)
+"""
+
+SpooledResponse = namedtuple('SpooledResponse', [
+    'id', 'survey_id', 'interview_uuid', 'user_id', 'callback_code', 'values',
+    'created',
+])
+
+
+class SpoolFull(Exception):
+    """Raised when too many responses wait in the spool."""
+
+
+class Spool(object):
+    """Queue of validated responses, in a SQLite database file."""
+
+    def __init__(self, path, max_pending=None, timeout=30.0):
+        self.path = path
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        """Return the connection of the current thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # autocommit: each append is its own transaction
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            columns = [row[1] for row in connection.execute(
+                'PRAGMA table_info(spooled_response)')]
+            if 'created' not in columns:
+                # spooled before the submission dates were kept
+                connection.execute(
+                    'ALTER TABLE spooled_response ADD COLUMN created TEXT')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def pending(self):
+        """Return the number of spooled responses."""
+        # the responses are removed from the lowest id, so the bounds of
+        # the ids count them without scanning the table
+        low, high = self.connection().execute(
+            'SELECT MIN(id), MAX(id) FROM spooled_response').fetchone()
+        if low is None:
+            return 0
+        return high - low + 1
+
+    def append(self, survey_id, interview_uuid, user_id, callback_code,
+               values, created=None):
+        """Spool a response, raise SpoolFull if the spool is full."""
+        if self.max_pending is not None and \
+                self.pending() >= self.max_pending:
+            raise SpoolFull("%d responses are waiting in %s." %
+                            (self.max_pending, self.path))
+        self.connection().execute(
+            'INSERT INTO spooled_response (survey_id, interview_uuid, '
+            'user_id, callback_code, value_data, created) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (survey_id, interview_uuid, user_id, callback_code,
+             json.dumps(values, cls=DjangoJSONEncoder),
+             created.isoformat() if created is not None else None))
+
+    def fetch(self, limit):
+        """Return the oldest spooled responses."""
+        rows = self.connection().execute(
+            'SELECT id, survey_id, interview_uuid, user_id, callback_code, '
+            'value_data, created FROM spooled_response ORDER BY id LIMIT ?',
+            (limit,))
+        return [SpooledResponse(*(row[:5] + (
+            json.loads(row[5]), parse_datetime(row[6]) if row[6] else None)))
+            for row in rows]
+
+    def remove(self, last_id):
+        """Remove the spooled responses up to ``last_id``."""
+        self.connection().execute(
+            'DELETE FROM spooled_response WHERE id <= ?', (last_id,))
+
+
+_spools = {}
+
+
+def get_spool():
+    """Return the spool set in the settings, or None."""
+    path = getattr(settings, 'TANUKI_SPOOL_PATH', None)
+    if not path:
+        return None
+    max_pending = getattr(settings, 'TANUKI_SPOOL_MAX_PENDING', 100000)
+    key = (path, max_pending)
+    if key not in _spools:
+        _spools[key] = Spool(path, max_pending)
+    return _spools[key]
+
+
+def spool_values(form, values, spool=None):
+    """
+    Spool the response of a form from already cleaned field values.
+
+    Like ``ResponseForm.save_values``, return the response, which is only
+    saved by the drainer.
+    """
+    if spool is None:
+        spool = get_spool()
+    user_id = form.user.pk if form.user.is_authenticated() else None
+    created = timezone.now()
+    spool.append(
+        form.survey.pk, form.uuid, user_id, form.callback_code,
+        dict((name, value) for name, value in values.items()
+             if name.startswith('question_')), created)
+    return Response(survey=form.survey, interview_uuid=form.uuid,
+                    user_id=user_id, created=created)
+
+
+def drain(spool=None, batch_size=BATCH_SIZE, send_signals=True):
+    """
+    Save a batch of spooled responses and remove it from the spool.
+
+    Return the number of responses taken from the spool. The answers to
+    questions deleted in the meantime are dropped, as well as the responses
+    of deleted surveys.
+    """
+    if spool is None:
+        spool = get_spool()
+    rows = spool.fetch(batch_size)
+    if not rows:
+        return 0
+    uuids = [row.interview_uuid for row in rows]
+    saved = set()
+    for start in range(0, len(uuids), LOOKUP_BATCH_SIZE):
+        saved.update(Response.objects.filter(
+            interview_uuid__in=uuids[start:start + LOOKUP_BATCH_SIZE]
+        ).values_list('interview_uuid', flat=True))
+    by_survey = {}
+    for row in rows:
+        # saved before a crash of the drainer, or a replayed submission
+        if row.interview_uuid in saved:
+            continue
+        saved.add(row.interview_uuid)
+        by_survey.setdefault(row.survey_id, []).append(row)
+    surveys = Survey.objects.in_bulk(list(by_survey))
+    for survey_id, survey_rows in sorted(by_survey.items()):
+        survey = surveys.get(survey_id)
+        if survey is None:
+            logger.warning("Dropping %d spooled responses of the deleted "
+                           "survey %d", len(survey_rows), survey_id)
+            continue
+        form = ResponseForm(survey=survey, user=AnonymousUser())
+        save_cleaned_responses(form, [
+            (Response(interview_uuid=row.interview_uuid,
+                      user_id=row.user_id, created=row.created),
+             dict((name, value) for name, value in row.values.items()
+                  if name in form.fields),
+             row.callback_code)
+            for row in survey_rows
+        ], send_signals=send_signals)
+    spool.remove(rows[-1].id)
+    return len(rows)
@@ -0,0 +1,273 @@
+"""Pre-aggregated statistics of the answers of a survey.
+
+``QuestionChoiceCount`` stores how many answers picked each choice of the
+radio/select/select multiple questions and ``QuestionNumericSummary``
+summarizes the integer questions. Both are updated incrementally, with a
+constant number of queries, when a response is saved so reading them costs
+O(choices) rows instead of a scan of the answers. ``rebuild_survey_stats``
+recomputes them from scratch.
+
+Deleting answers, or the responses holding them, through the ORM (as the
+admin does) takes them out of the counts and of the count and total of the
+summaries. The minimum and maximum are not narrowed back, they are only
+exact again after ``rebuild_survey_stats``. The raw deletes of
+``survey.answers.delete_answers`` send no signal and leave the statistics
+as they are, which is what the archival and the moves between answer
+stores need.
+"""
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import (BigIntegerField, Case, Count, F, IntegerField,
+                              Max, Min, Q, Sum, Value, When)
+
+from survey.models import (Answer, AnswerInteger, AnswerRadio, AnswerSelect,
+                           AnswerSelectMultiple, AnswerSelectMultipleChoice,
+                           Question, QuestionChoiceCount,
+                           QuestionNumericSummary)
+from survey.utils import parse_multiple
+
+CHOICE_MAX_LENGTH = QuestionChoiceCount._meta.get_field('choice').max_length
+
+
+def _choice_key(choice):
+    return choice[:CHOICE_MAX_LENGTH]
+
+
+def _choice_counts(counts):
+    """Return the stored counts of the ``(question_id, choice)`` keys."""
+    choices = defaultdict(set)
+    for question_id, choice in counts:
+        choices[question_id].add(choice)
+    return QuestionChoiceCount.objects.filter(reduce(operator.or_, [
+        Q(question_id=question_id, choice__in=question_choices)
+        for question_id, question_choices in choices.items()
+    ]))
+
+
+def _add_choice_counts(counts):
+    """Add ``{(question_id, choice): count}`` to the stored counts."""
+    if not counts:
+        return
+    existing = _choice_counts(counts).values_list('question_id', 'choice',
+                                                  'pk')
+    existing = dict(((q, c), pk) for q, c, pk in existing)
+    missing = [key for key in counts if key not in existing]
+    if missing:
+        try:
+            with transaction.atomic():
+                QuestionChoiceCount.objects.bulk_create(
+                    QuestionChoiceCount(question_id=q, choice=c,
+                                        count=counts[(q, c)])
+                    for q, c in missing
+                )
+        except IntegrityError:
+            # some rows were created by a concurrent response, start again
+            # now that they exist.
+            return _add_choice_counts(counts)
+    if existing:
+        QuestionChoiceCount.objects.filter(pk__in=existing.values()).update(
+            count=F('count') + Case(
+                *[When(pk=pk, then=Value(counts[key]))
+                  for key, pk in existing.items()],
+                output_field=IntegerField()
+            )
+        )
+
+
+def _add_numeric_values(values):
+    """Add ``{question_id: [values]}`` to the stored summaries."""
+    if not values:
+        return
+    existing = dict(QuestionNumericSummary.objects.select_for_update().filter(
+        question_id__in=values.keys()
+    ).values_list('question_id', 'pk'))
+    missing = [q for q in values if q not in existing]
+    if missing:
+        try:
+            with transaction.atomic():
+                QuestionNumericSummary.objects.bulk_create(
+                    QuestionNumericSummary(
+                        question_id=q, count=len(values[q]),
+                        total=sum(values[q]), minimum=min(values[q]),
+                        maximum=max(values[q]))
+                    for q in missing
+                )
+        except IntegrityError:
+            # some rows were created by a concurrent response, start again
+            # now that they exist.
+            return _add_numeric_values(values)
+    if not existing:
+        return
+    values = dict((q, v) for q, v in values.items() if q in existing)
+    minimum = dict((q, min(v)) for q, v in values.items())
+    maximum = dict((q, max(v)) for q, v in values.items())
+    QuestionNumericSummary.objects.filter(pk__in=existing.values()).update(
+        count=F('count') + Case(
+            *[When(pk=existing[q], then=Value(len(v)))
+              for q, v in values.items()],
+            output_field=IntegerField()
+        ),
+        total=F('total') + Case(
+            *[When(pk=existing[q], then=Value(sum(v)))
+              for q, v in values.items()],
+            output_field=BigIntegerField()
+        ),
+        minimum=Case(
+            *[When(Q(pk=existing[q]) & (Q(minimum=None) | Q(minimum__gt=v)),
+                   then=Value(v))
+              for q, v in minimum.items()],
+            default=F('minimum'), output_field=IntegerField()
+        ),
+        maximum=Case(
+            *[When(Q(pk=existing[q]) & (Q(maximum=None) | Q(maximum__lt=v)),
+                   then=Value(v))
+              for q, v in maximum.items()],
+            default=F('maximum'), output_field=IntegerField()
+        ),
+    )
+
+
+def _answer_stats(answers):
+    """
+    Return the ``{(question_id, choice): count}`` and the
+    ``{question_id: [values]}`` of answer objects, legacy ones or rows of
+    the unified ``Answer`` table.
+    """
+    counts = defaultdict(int)
+    numbers = defaultdict(list)
+    for answer in answers:
+        if isinstance(answer, Answer):
+            if answer.kind == Question.INTEGER:
+                if answer.number is not None:
+                    numbers[answer.question_id].append(answer.number)
+            elif answer.kind in Question.CHOICES_TYPES and \
+                    answer.choice not in (None, ''):
+                counts[(answer.question_id,
+                        _choice_key(answer.choice))] += 1
+            continue
+        if answer.body in (None, ''):
+            continue
+        if isinstance(answer, AnswerInteger):
+            numbers[answer.question_id].append(int(answer.body))
+        elif isinstance(answer, AnswerSelectMultiple):
+            choices = answer.body
+            if not isinstance(choices, (list, tuple)):
+                choices = parse_multiple(choices)
+            for choice in choices:
+                counts[(answer.question_id, _choice_key(choice))] += 1
+        elif isinstance(answer, (AnswerRadio, AnswerSelect)):
+            counts[(answer.question_id, _choice_key(answer.body))] += 1
+    return dict(counts), dict(numbers)
+
+
+def record_answers(answers):
+    """Update the statistics with newly saved answer objects."""
+    counts, numbers = _answer_stats(answers)
+    _add_choice_counts(counts)
+    _add_numeric_values(numbers)
+
+
+def forget_answers(answers):
+    """Take deleted answer objects out of the statistics."""
+    counts, numbers = _answer_stats(answers)
+    if counts:
+        existing = dict(((q, c), pk) for q, c, pk in _choice_counts(
+            counts).values_list('question_id', 'choice', 'pk'))
+        for key, pk in existing.items():
+            QuestionChoiceCount.objects.filter(
+                pk=pk, count__gte=counts[key]
+            ).update(count=F('count') - counts[key])
+    for question_id, values in numbers.items():
+        QuestionNumericSummary.objects.filter(
+            question_id=question_id, count__gte=len(values)
+        ).update(count=F('count') - len(values),
+                 total=F('total') - sum(values))
+
+
+def rebuild_survey_stats(survey):
+    """Recompute the statistics of a survey from its answers."""
+    questions = Question.objects.filter(survey=survey)
+    with transaction.atomic():
+        QuestionChoiceCount.objects.filter(question__in=questions).delete()
+        QuestionNumericSummary.objects.filter(question__in=questions).delete()
+
+        # survey.answers imports this module
+        from survey.answers import unified_store
+        counts = defaultdict(int)
+        if unified_store():
+            rows = Answer.objects.filter(
+                question__survey=survey, kind__in=Question.CHOICES_TYPES
+            ).exclude(choice=None).exclude(choice='')
+            rows = rows.values('question_id', 'choice')
+            for row in rows.annotate(count=Count('pk')).order_by():
+                counts[(row['question_id'], row['choice'])] += row['count']
+            rows = Answer.objects.filter(
+                question__survey=survey, kind=Question.INTEGER
+            ).exclude(number=None).values('question_id')
+            rows = rows.annotate(count=Count('pk'), total=Sum('number'),
+                                 minimum=Min('number'),
+                                 maximum=Max('number'))
+        else:
+            for model in (AnswerRadio, AnswerSelect):
+                rows = model.objects.filter(question__survey=survey).exclude(
+                    body=None).exclude(body='').values('question_id', 'body')
+                for row in rows.annotate(count=Count('pk')).order_by():
+                    key = (row['question_id'], _choice_key(row['body']))
+                    counts[key] += row['count']
+            rows = AnswerSelectMultipleChoice.objects.filter(
+                question__survey=survey).values('question_id', 'choice')
+            for row in rows.annotate(count=Count('pk')).order_by():
+                counts[(row['question_id'], row['choice'])] += row['count']
+            rows = AnswerInteger.objects.filter(
+                question__survey=survey).exclude(body=None).values(
+                    'question_id')
+            rows = rows.annotate(count=Count('pk'), total=Sum('body'),
+                                 minimum=Min('body'), maximum=Max('body'))
+        numbers = _archived_answers(survey, counts)
+        QuestionChoiceCount.objects.bulk_create(
+            QuestionChoiceCount(question_id=question_id, choice=choice,
+                                count=count)
+            for (question_id, choice), count in counts.items()
+        )
+
+        summaries = dict((row['question_id'], QuestionNumericSummary(**row))
+                         for row in rows.order_by())
+        for question_id, values in numbers.items():
+            summary = summaries.setdefault(
+                question_id, QuestionNumericSummary(question_id=question_id))
+            summary.count += len(values)
+            summary.total += sum(values)
+            known = [v for v in (summary.minimum, summary.maximum)
+                     if v is not None]
+            summary.minimum = min(values + known)
+            summary.maximum = max(values + known)
+        QuestionNumericSummary.objects.bulk_create(summaries.values())
+
+
+def _archived_answers(survey, counts):
+    """
+    Add the choices of the archived answers of a survey to counts.
+
+    Return the values of the archived integer answers, by question.
+    """
+    # survey.archive imports survey.answers, which imports this module
+    from survey.archive import iter_archived
+    question_types = dict(Question.objects.filter(
+        survey=survey).values_list('pk', 'question_type'))
+    numbers = defaultdict(list)
+    for archived, values in iter_archived(survey):
+        for question_id, value in values.items():
+            question_type = question_types.get(question_id)
+            if value in (None, '') or question_type is None:
+                continue
+            if question_type == Question.INTEGER:
+                numbers[question_id].append(int(value))
+            elif question_type == Question.SELECT_MULTIPLE:
+                for choice in value:
+                    counts[(question_id, _choice_key(choice))] += 1
+            elif question_type in Question.CHOICES_TYPES:
+                counts[(question_id, _choice_key(value))] += 1
+    return numbers
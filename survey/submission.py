@@ -0,0 +1,129 @@
+"""Batched submission of complete responses.
+
+Used by the JSON API of ``survey.views.SubmissionView``, which lets offline
+clients upload their queued responses in a few requests. A submission is a
+list of responses, each one a dict holding its answers keyed by question
+id and an optional callback code::
+
+    [{"answers": {"12": "yes", "13": ["a", "c"]}, "callback_code": "abc"}]
+
+The answers are validated with the fields of a single unbound
+``ResponseForm``, so they follow the same rules as the HTML form, then all
+the responses are saved with one bulk write.
+"""
+import uuid
+
+from django.conf import settings
+
+from survey import outbox
+from survey.answers import save_responses
+from survey.forms import ResponseForm
+from survey.instrumentation import timer
+from survey.models import Question, Response
+from survey.signals import survey_completed
+
+
+def max_responses():
+    return getattr(settings, 'TANUKI_API_MAX_RESPONSES', 1000)
+
+
+def parse_payload(payload):
+    """
+    Return the list of responses of a decoded JSON submission.
+
+    The payload is either a list of responses, a dict holding this list as
+    ``responses`` or a single response. Raise ValueError if it is none of
+    them.
+    """
+    if isinstance(payload, dict):
+        if 'responses' in payload:
+            payload = payload['responses']
+        elif 'answers' in payload:
+            payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of responses.")
+    if len(payload) > max_responses():
+        raise ValueError("At most %d responses can be submitted at once."
+                         % max_responses())
+    return payload
+
+
+def clean_responses(form, items):
+    """
+    Validate a list of submitted responses.
+
+    Return the ``(cleaned values, callback code)`` of each response and the
+    errors, a list of ``{'index': i, 'errors': {question_id: messages}}``.
+    """
+    cleaned = []
+    errors = []
+    for index, item in enumerate(items):
+        answers = item.get('answers') if isinstance(item, dict) else None
+        if not isinstance(answers, dict):
+            errors.append({'index': index,
+                           'errors': {'answers': ["Expected a dict."]}})
+            continue
+        values = {}
+        item_errors = {}
+        for question_id, value in answers.items():
+            field_name = 'question_%s' % question_id
+            if field_name not in form.fields:
+                item_errors[question_id] = ["Unknown question."]
+            else:
+                values[field_name] = value
+        values, field_errors = form.clean_values(values)
+        for field_name, messages in field_errors.items():
+            item_errors[field_name.split('_', 1)[1]] = messages
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            cleaned.append((values, item.get('callback_code')))
+    return cleaned, errors
+
+
+def save_cleaned_responses(form, cleaned, send_signals=True):
+    """
+    Save responses validated with the fields of an unbound ResponseForm.
+
+    ``cleaned`` is a list of ``(response, values, callback_code)``, the
+    unsaved responses having their ``interview_uuid`` set. The
+    survey_completed signal is sent, or queued in the outbox, for each
+    response unless ``send_signals`` is False.
+    """
+    questions = Question.objects.in_bulk([
+        int(field_name.split('_')[1]) for field_name in form.fields
+        if field_name.startswith('question_')
+    ])
+    queue = send_signals and outbox.is_async()
+    to_save = []
+    events = []
+    for response, values, callback_code in cleaned:
+        answers, data = form.build_response(response, values, callback_code,
+                                            questions)
+        events.append(data)
+        # survey_completed is sent later by deliver_survey_events
+        to_save.append((response, answers, data if queue else None))
+    responses = save_responses(to_save)
+    if send_signals and not queue:
+        for response, data in zip(responses, events):
+            survey_completed.send(sender=Response, instance=response,
+                                  data=data)
+    return responses
+
+
+@timer('form_save')
+def submit_responses(survey, user, items):
+    """
+    Validate and save a list of submitted responses.
+
+    Return the saved responses and an empty list, or no responses and the
+    validation errors: a submission is saved entirely or not at all.
+    """
+    form = ResponseForm(survey=survey, user=user)
+    cleaned, errors = clean_responses(form, items)
+    if errors:
+        return [], errors
+    return save_cleaned_responses(form, [
+        (Response(interview_uuid=uuid.uuid4().hex), values, callback_code)
+        for values, callback_code in cleaned
+    ]), []
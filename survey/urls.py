@@ -4,6 +4,8 @@ from .views import IndexView
 from .views import SurveyDetail
 from .views import ConfirmView
 from .views import SurveyCompleted
+from .views import SubmissionView
+from .views import AnalyticsView
 
 urlpatterns = patterns(
     '',
@@ -28,4 +30,14 @@ urlpatterns = patterns(
         ConfirmView.as_view(),
         name='survey-confirmation'
     ),
+    url(
+        r'^api/survey/(?P<id>\d+)/responses/$',
+        SubmissionView.as_view(),
+        name='survey-api-responses'
+    ),
+    url(
+        r'^api/survey/(?P<id>\d+)/analytics/$',
+        AnalyticsView.as_view(),
+        name='survey-api-analytics'
+    ),
 )
@@ -1,4 +1,5 @@
 """Utils for taniku app."""
+import ast
 
 from django.core.exceptions import ValidationError
 
@@ -26,3 +27,36 @@ def get_choices(value, separator=','):
         choices_list.append((c, c))
     choices_tuple = tuple(choices_list)
     return choices_tuple
+
+
+def parse_choices(value, separator=',', images=False):
+    """
+    Parse the choices of a question and return (value, label, image) tuples.
+
+    With images, each choice is written as "value:image source".
+    """
+    choices = []
+    for choice, label in get_choices(value or '', separator=separator):
+        image = ''
+        if images and ':' in choice:
+            choice, image = choice.split(':', 1)
+            label = choice
+        choices.append((choice, label, image))
+    return choices
+
+
+def parse_multiple(value):
+    """
+    Parse the body of an AnswerSelectMultiple and return a list.
+
+    The body is the representation of the list of selected choices.
+    """
+    if not value:
+        return []
+    try:
+        choices = ast.literal_eval(value)
+    except (SyntaxError, ValueError):
+        return [value]
+    if isinstance(choices, (list, tuple)):
+        return list(choices)
+    return [choices]
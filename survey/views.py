@@ -1,40 +1,83 @@
 """
 Survey views
 """
+import json
+import uuid
+
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.csrf import csrf_exempt
 
-from .models import Survey, Category, Response
+from .analytics import survey_results
+from .models import Survey, Response
+from .completion import completed_survey_ids, has_completed
+from .drafts import (delete_draft, draft_key, load_values, missing_step,
+                     save_step)
 from .forms import ResponseForm
+from .fragments import LazyHTML, cached_questions, render_questions
+from .instrumentation import InstrumentedView, timer
+from .listing import published_surveys
+from .schema import get_schema
+from .snapshot import load_snapshot
+from .spool import SpoolFull, get_spool, spool_values
+from .submission import parse_payload, submit_responses
 
 
 from django.views.generic import TemplateView, View
 
 
-class IndexView(TemplateView):
+class IndexView(InstrumentedView, TemplateView):
     """Display a list of the published survey available to all users."""
 
     template_name = "survey/list.html"
 
+    def get_paginate_by(self):
+        return getattr(settings, 'TANUKI_SURVEY_LIST_PAGINATE_BY', None)
+
     def get_context_data(self, **kwargs):
         context = super(IndexView, self).get_context_data(**kwargs)
-        qs = Survey.objects.filter(is_published=True)
-        if not self.request.user.is_authenticated():
-            qs = qs.filter(need_logged_user=False)
-        context['surveys'] = qs
+        user = self.request.user
+        surveys = published_surveys(user.is_authenticated())
+        paginate_by = self.get_paginate_by()
+        if paginate_by:
+            paginator = Paginator(surveys, paginate_by)
+            try:
+                page = paginator.page(self.request.GET.get('page', 1))
+            except InvalidPage:
+                raise Http404
+            surveys = page.object_list
+            context.update({
+                'paginator': paginator,
+                'page_obj': page,
+                'is_paginated': page.has_other_pages(),
+            })
+        completed = completed_survey_ids(user, surveys)
+        for survey in surveys:
+            survey.is_completed = survey.pk in completed
+        context['surveys'] = surveys
         return context
 
 
-class SurveyDetail(View):
+class SurveyDetail(InstrumentedView, View):
 
     def get_survey_categories(self, survey):
-        return Category.objects.filter(survey=survey).order_by('order')
+        return get_schema(survey).categories
 
     def get_user_response(self, user, survey):
         return Response.objects.filter(survey=survey, user=user)
 
+    def save_values(self, form, values):
+        """Save the response of a form, or spool it, see survey.spool."""
+        if get_spool() is None or form.survey.need_logged_user:
+            return form.save_values(values)
+        return spool_values(form, values)
+
     def get(self, request, *args, **kwargs):
         survey = get_object_or_404(Survey, is_published=True, id=kwargs['id'])
         callback_code = request.GET.get('callback_code', None)
@@ -48,24 +91,43 @@ class SurveyDetail(View):
         if survey.need_logged_user and not request.user.is_authenticated():
             return redirect('%s?next=%s' % (settings.LOGIN_URL, request.path))
         if survey.need_logged_user and request.user.is_authenticated():
-            if self.get_user_response(request.user, survey).exists():
+            if has_completed(request.user, survey):
                 return redirect('survey-completed', id=survey.id)
 
         category_items = self.get_survey_categories(survey)
         categories = [c.name for c in category_items]
         step = kwargs.get('step', 0)
-        form = ResponseForm(survey=survey,
-                            user=request.user,
-                            step=step,
-                            callback_code=callback_code)
+        # rendered outside of the cached questions, see survey.fragments
+        submission_token = uuid.uuid4().hex
+
+        forms = []
+
+        def build_form():
+            if not forms:
+                forms.append(ResponseForm(survey=survey,
+                                          user=request.user,
+                                          step=step,
+                                          callback_code=callback_code,
+                                          submission_token=submission_token))
+            return forms[0]
+        # the form is only built if the template uses it, or to render the
+        # questions on a fragment cache miss.
+        form = SimpleLazyObject(build_form)
+        if request.user.is_authenticated():
+            questions_html = LazyHTML(lambda: render_questions(build_form()))
+        else:
+            questions_html = cached_questions(survey, step, build_form)
         context = {
             'response_form': form,
+            'questions_html': questions_html,
             'survey': survey,
             'categories': categories,
             'callback_code': callback_code,
+            'submission_token': submission_token,
         }
 
-        return render(request, template_name, context)
+        with timer('render'):
+            return render(request, template_name, context)
 
     def post(self, request, *args, **kwargs):
         survey = get_object_or_404(Survey, is_published=True, id=kwargs['id'])
@@ -73,7 +135,7 @@ class SurveyDetail(View):
         if survey.need_logged_user and not request.user.is_authenticated():
             return redirect('%s?next=%s' % (settings.LOGIN_URL, request.path))
         if survey.need_logged_user and request.user.is_authenticated():
-            if self.get_user_response(request.user, survey).exists():
+            if has_completed(request.user, survey):
                 return redirect('survey-completed', id=survey.id)
         category_items = self.get_survey_categories(survey)
         categories = [c.name for c in category_items]
@@ -84,32 +146,52 @@ class SurveyDetail(View):
                             callback_code=callback_code)
         context = {
             'response_form': form,
+            'questions_html': LazyHTML(lambda: render_questions(form)),
             'survey': survey,
-            'categories': categories
+            'categories': categories,
+            'callback_code': callback_code,
+            'submission_token': form.uuid,
         }
         if form.is_valid():
-            session_key = 'survey_%s' % (kwargs['id'],)
-            if session_key not in request.session:
-                request.session[session_key] = {}
-            for key, value in form.cleaned_data.items():
-                request.session[session_key][key] = value
-                request.session.modified = True
-
             next_url = form.next_step_url()
             response = None
-            if survey.display_by_question:
-                if not form.has_next_step():
-                    save_form = ResponseForm(request.session[session_key],
-                                             survey=survey,
-                                             user=request.user)
-                    response = save_form.save()
-            else:
-                response = form.save()
+            try:
+                if survey.display_by_question:
+                    if not form.has_next_step() and Response.objects.filter(
+                            survey=survey, interview_uuid=form.uuid).exists():
+                        # a replay of the last step, the draft is gone
+                        return redirect('survey-confirmation',
+                                        uuid=form.uuid)
+                    key = draft_key(request)
+                    values = dict(form.cleaned_data)
+                    # only the token of the last step identifies the response
+                    values.pop('tanuki_submission_token', None)
+                    save_step(survey, key, request.user, values)
+                    if not form.has_next_step():
+                        values = load_values(survey, key)
+                        # an expired draft, or skipped steps
+                        step = missing_step(survey, values)
+                        if step is not None:
+                            return redirect('survey-detail-step',
+                                            id=survey.id, step=step)
+                        save_form = ResponseForm(
+                            survey=survey, user=request.user,
+                            callback_code=values.get('tanuki_callback_code'),
+                            submission_token=form.uuid)
+                        response = self.save_values(save_form, values)
+                        delete_draft(survey, key)
+                else:
+                    response = self.save_values(form, form.cleaned_data)
+            except SpoolFull:
+                unavailable = HttpResponse(
+                    "Too many responses are being saved, please retry.",
+                    status=503, content_type='text/plain')
+                unavailable['Retry-After'] = '5'
+                return unavailable
 
             if next_url is not None:
                 return redirect(next_url)
             else:
-                del request.session[session_key]
                 if response is None:
                     return redirect('/')
                 else:
@@ -128,10 +210,11 @@ class SurveyDetail(View):
                 template_name = 'survey/survey.html'
             else:
                 template_name = 'survey/one_page_survey.html'
-        return render(request, template_name, context)
+        with timer('render'):
+            return render(request, template_name, context)
 
 
-class ConfirmView(TemplateView):
+class ConfirmView(InstrumentedView, TemplateView):
     template_name = 'survey/confirm.html'
 
     def get_context_data(self, **kwargs):
@@ -140,7 +223,7 @@ class ConfirmView(TemplateView):
         return context
 
 
-class SurveyCompleted(TemplateView):
+class SurveyCompleted(InstrumentedView, TemplateView):
     template_name = 'survey/completed.html'
 
     def get_context_data(self, **kwargs):
@@ -148,3 +231,64 @@ class SurveyCompleted(TemplateView):
         survey = get_object_or_404(Survey, is_published=True, id=kwargs['id'])
         context['survey'] = survey
         return context
+
+
+class SubmissionView(InstrumentedView, View):
+    """
+    JSON API receiving one or many complete responses of a survey.
+
+    See survey.submission for the format of the submissions. Answer with
+    the interview uuids of the saved responses, in the submitted order.
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(SubmissionView, self).dispatch(request, *args, **kwargs)
+
+    def error(self, message, status=400):
+        return JsonResponse({'error': message}, status=status)
+
+    def post(self, request, *args, **kwargs):
+        survey = get_object_or_404(Survey, is_published=True, id=kwargs['id'])
+        # requiring JSON keeps the API out of reach of cross-site forms
+        content_type = request.META.get('CONTENT_TYPE', '')
+        if content_type.split(';')[0].strip() != 'application/json':
+            return self.error("Expected application/json content.", 415)
+        if survey.need_logged_user and not request.user.is_authenticated():
+            return self.error("Authentication required.", 403)
+        try:
+            payload = json.loads(request.body.decode(
+                request.encoding or 'utf-8'))
+            items = parse_payload(payload)
+        except ValueError as e:
+            return self.error(str(e))
+        if survey.need_logged_user:
+            if len(items) > 1:
+                return self.error("Only one response can be submitted.")
+            if has_completed(request.user, survey):
+                return self.error("Survey already completed.", 409)
+        responses, errors = submit_responses(survey, request.user, items)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+        return JsonResponse(
+            {'interview_uuids': [r.interview_uuid for r in responses]},
+            status=201)
+
+
+class AnalyticsView(View):
+    """
+    JSON results of a survey for the staff, see ``survey_results``.
+
+    They are computed from the snapshot of the survey if there is one.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            return JsonResponse({'error': "Staff only."}, status=403)
+        survey = get_object_or_404(Survey, id=kwargs['id'])
+        try:
+            results = survey_results(survey, request.GET,
+                                     load_snapshot(survey))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(results)
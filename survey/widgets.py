@@ -12,15 +12,19 @@ class ImageSelectWidget(forms.widgets.Widget):
             'js/survey.js',
         )
 
+    def __init__(self, attrs=None, images=None):
+        super(ImageSelectWidget, self).__init__(attrs)
+        # image source of each choice value
+        self.images = images or {}
+
     def render(self, name, value, *args, **kwargs):
         template_name = "survey/forms/image_select.html"
         choices = []
         for index, choice in enumerate(self.choices):
             if choice[0] != '':
-                value, img_src = choice[0].split(":", 1)
                 choices.append({
-                    'img_src': img_src,
-                    'value': value,
+                    'img_src': self.images.get(choice[0], ''),
+                    'value': choice[0],
                     'full_value': choice[0],
                     'index': index
                 })
@@ -2,13 +2,18 @@ import os
 
 
 def local_path(path):
-    os.path.join(os.path.dirname(__file__), path)
+    return os.path.join(os.path.dirname(__file__), path)
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'TEST_NAME': ':memory:'
-    }
+    },
+    # stand-in of a read replica for the survey.routers tests
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'TEST_NAME': ':memory:'
+    },
 }
 
 SITE_ID = 1
@@ -18,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sites',
     'django.contrib.staticfiles',
     'django.contrib.auth',
+    'django.contrib.sessions',
     'django.contrib.admin',
     'survey',
     'tests',
@@ -25,6 +31,8 @@ INSTALLED_APPS = [
 
 MEDIA_URL = '/media/'
 
+STATIC_URL = '/static/'
+
 MEDIA_ROOT = local_path('media')
 
 SECRET_KEY = "app-test"
@@ -33,6 +41,9 @@ TEMPLATE_DIRS = (
     local_path('templates'),
 )
 
-MIDDLEWARE_CLASSES = ()
+MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+)
 
 ROOT_URLCONF = 'survey.urls'
@@ -0,0 +1,55 @@
+"""Test for survey.admin module."""
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from survey.forms import ResponseForm
+from tests.utils import create_survey, form_data
+
+
+@override_settings(ROOT_URLCONF='tests.urls')
+class ResponseAdminTestCase(TestCase):
+    """Test the admin of the responses."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'a@b.c', 'pass')
+        self.client.login(username='admin', password='pass')
+
+    def respond(self, survey):
+        form = ResponseForm(form_data(survey), survey=survey,
+                            user=self.admin)
+        self.assertTrue(form.is_valid())
+        return form.save()
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_change_view(self):
+        """The answers are read with a constant number of queries."""
+        small = self.respond(create_survey())
+        large = self.respond(create_survey(repeat=5))
+        url = 'admin:survey_response_change'
+        # warm the caches of the admin
+        self.client.get(reverse(url, args=[small.pk]))
+        self.assertEqual(
+            self.queries(reverse(url, args=[small.pk])),
+            self.queries(reverse(url, args=[large.pk])))
+        response = self.client.get(reverse(url, args=[large.pk]))
+        self.assertContains(response, '<th>integer 4</th><td>42</td>')
+        self.assertContains(response, '<td>a, c</td>', count=5)
+
+    def test_changelist(self):
+        """The changelist does not query the survey and user of each row."""
+        survey = create_survey()
+        self.respond(survey)
+        url = reverse('admin:survey_response_changelist')
+        self.client.get(url)
+        count = self.queries(url)
+        for i in range(3):
+            self.respond(survey)
+        self.assertEqual(self.queries(url), count)
@@ -0,0 +1,163 @@
+"""Test for survey.analytics module."""
+import json
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.urlresolvers import reverse
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from survey.analytics import (Filter, answer_counts, crosstab,
+                              numeric_summary, parse_filters, response_count)
+from survey.forms import ResponseForm
+from survey.models import Question
+from tests.utils import create_survey, form_data
+
+RESPONSES = [
+    # radio, select multiple, integer
+    ('yes', ['a', 'c'], 10),
+    ('yes', ['a'], 20),
+    ('no', ['b'], 30),
+    ('no', ['a', 'b'], 41),
+]
+
+
+class ResultsMixin(object):
+    """Answer a survey with RESPONSES."""
+
+    def setUp(self):
+        self.survey = create_survey()
+        self.questions = dict((q.question_type, q)
+                              for q in self.survey.questions())
+        self.radio = self.questions[Question.RADIO]
+        self.multiple = self.questions[Question.SELECT_MULTIPLE]
+        self.integer = self.questions[Question.INTEGER]
+        for radio, multiple, integer in RESPONSES:
+            data = form_data(self.survey)
+            data.update({
+                'question_%d' % self.radio.pk: radio,
+                'question_%d' % self.multiple.pk: multiple,
+                'question_%d' % self.integer.pk: integer,
+            })
+            form = ResponseForm(data, survey=self.survey,
+                                user=AnonymousUser())
+            self.assertTrue(form.is_valid())
+            form.save()
+
+
+class AnalyticsTestCase(ResultsMixin, TestCase):
+    """Test the analytics over the legacy answer tables."""
+
+    def test_answer_counts(self):
+        """The choices are counted in their order."""
+        self.assertEqual(answer_counts(self.radio),
+                         [('yes', 2), ('no', 2)])
+        self.assertEqual(answer_counts(self.multiple),
+                         [('a', 3), ('b', 2), ('c', 1)])
+
+    def test_filters(self):
+        """The filters on several questions are combined."""
+        filters = [Filter(self.radio, values=['no'])]
+        self.assertEqual(answer_counts(self.multiple, filters),
+                         [('a', 1), ('b', 2)])
+        filters.append(Filter(self.integer, minimum=35))
+        self.assertEqual(answer_counts(self.multiple, filters),
+                         [('a', 1), ('b', 1)])
+        self.assertEqual(response_count(self.survey, filters), 1)
+
+    def test_crosstab(self):
+        """The answers of two questions are counted by pair."""
+        table = crosstab(self.radio, self.multiple)
+        self.assertEqual(table['rows'], ['yes', 'no'])
+        self.assertEqual(table['columns'], ['a', 'b', 'c'])
+        self.assertEqual(table['counts'], [[2, 0, 1], [1, 2, 0]])
+        table = crosstab(self.radio, self.multiple,
+                         [Filter(self.integer, maximum=20)])
+        self.assertEqual(table['columns'], ['a', 'c'])
+        self.assertEqual(table['counts'], [[2, 1]])
+
+    def test_numeric_summary(self):
+        """Mean, median and histogram of the integer answers."""
+        summary = numeric_summary(self.integer, bins=4)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['mean'], 25.25)
+        self.assertEqual(summary['median'], 25.0)
+        self.assertEqual((summary['minimum'], summary['maximum']), (10, 41))
+        self.assertEqual(
+            [(b['start'], b['end'], b['count'])
+             for b in summary['histogram']],
+            [(10, 17, 1), (18, 25, 1), (26, 33, 1), (34, 41, 1)])
+        summary = numeric_summary(
+            self.integer, [Filter(self.radio, values=['yes'])])
+        self.assertEqual(summary['median'], 15.0)
+        summary = numeric_summary(
+            self.integer, [Filter(self.radio, values=['maybe'])])
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['histogram'], [])
+
+    def test_parse_filters(self):
+        questions = dict((q.pk, q) for q in self.questions.values())
+        query = QueryDict('filter=%d:yes&filter=%d:no&min=%d:3' % (
+            self.radio.pk, self.radio.pk, self.integer.pk))
+        filters = parse_filters(questions, query)
+        self.assertEqual([(f.question, f.values, f.minimum) for f in filters],
+                         [(self.radio, ['yes', 'no'], None),
+                          (self.integer, None, 3)])
+        with self.assertRaises(ValueError):
+            parse_filters(questions, QueryDict('min=%d:x' % self.integer.pk))
+        with self.assertRaises(ValueError):
+            parse_filters(questions, QueryDict('filter=0:yes'))
+        with self.assertRaises(ValueError):
+            parse_filters(questions, QueryDict('max=%d:3' % self.radio.pk))
+
+
+@override_settings(TANUKI_ANSWER_STORE='unified')
+class UnifiedAnalyticsTestCase(AnalyticsTestCase):
+    """Test the analytics over the unified answer table."""
+
+
+@override_settings(ROOT_URLCONF='tests.urls')
+class AnalyticsViewsTestCase(ResultsMixin, TestCase):
+    """Test the JSON endpoint and the admin view of the results."""
+
+    def setUp(self):
+        super(AnalyticsViewsTestCase, self).setUp()
+        self.url = reverse('survey-api-analytics',
+                           kwargs={'id': self.survey.pk})
+        User.objects.create_superuser('admin', 'a@b.c', 'pass')
+
+    def get_json(self, params, status=200):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_endpoint(self):
+        """Counts, summaries and crosstabs are served to the staff."""
+        self.get_json({'question': self.radio.pk}, status=403)
+        self.client.login(username='admin', password='pass')
+        results = self.get_json({'question': self.radio.pk})
+        self.assertEqual(results['counts'], [['yes', 2], ['no', 2]])
+        self.assertEqual(results['responses'], 4)
+        results = self.get_json({
+            'question': self.integer.pk,
+            'filter': '%d:yes' % self.radio.pk,
+        })
+        self.assertEqual(results['responses'], 2)
+        self.assertEqual(results['summary']['mean'], 15)
+        results = self.get_json({'row': self.radio.pk,
+                                 'column': self.multiple.pk})
+        self.assertEqual(results['counts'], [[2, 0, 1], [1, 2, 0]])
+        self.get_json({'row': self.radio.pk}, status=400)
+        self.get_json({'question': 0}, status=400)
+
+    def test_admin_results(self):
+        self.client.login(username='admin', password='pass')
+        url = reverse('admin:survey_survey_results', args=[self.survey.pk])
+        response = self.client.get(url, {
+            'row': self.radio.pk, 'column': self.multiple.pk,
+            'filter': '%d:no' % self.radio.pk,
+        })
+        self.assertContains(response, '2 responses')
+        self.assertEqual(response.context['crosstab']['rows'],
+                         [('no', [1, 2])])
+        response = self.client.get(reverse('admin:survey_survey_changelist'))
+        self.assertContains(response, url)
@@ -0,0 +1,96 @@
+"""Test for the unified answer store of survey.answers."""
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from survey.answers import answer_values, response_answers
+from survey.export import iter_responses
+from survey.forms import ResponseForm
+from survey.models import (Answer, AnswerBase, AnswerSelectMultipleChoice,
+                           QuestionChoiceCount, Response, Survey)
+from survey.stats import rebuild_survey_stats
+from tests.utils import create_survey, form_data
+
+
+class AnswerStoreTestCase(TestCase):
+    """Test the unified answer store."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(pk=create_survey(repeat=2).pk)
+
+    def respond(self):
+        form = ResponseForm(form_data(self.survey), survey=self.survey,
+                            user=AnonymousUser())
+        self.assertTrue(form.is_valid())
+        return form.save()
+
+    def snapshot(self):
+        return (list(iter_responses(self.survey)),
+                [(q.pk, v) for q, v in response_answers(
+                    Response.objects.get())])
+
+    def test_unified(self):
+        """The same answers are read back from both stores."""
+        with CaptureQueriesContext(connection) as legacy_queries:
+            self.respond()
+        legacy = self.snapshot()
+        Response.objects.all().delete()
+        with self.settings(TANUKI_ANSWER_STORE='unified'):
+            with CaptureQueriesContext(connection) as unified_queries:
+                self.respond()
+            self.assertFalse(AnswerBase.objects.exists())
+            # select multiple answers take one row per selected choice
+            self.assertEqual(Answer.objects.count(), 16)
+            unified = self.snapshot()
+        self.assertLess(len(unified_queries), len(legacy_queries))
+        # the uuids differ
+        for row in legacy[0] + unified[0]:
+            del row['interview_uuid'], row['created']
+        self.assertEqual(unified, legacy)
+
+    @override_settings(TANUKI_ANSWER_STORE='unified')
+    def test_stats(self):
+        self.respond()
+        self.respond()
+        counts = sorted(QuestionChoiceCount.objects.values_list(
+            'question_id', 'choice', 'count'))
+        QuestionChoiceCount.objects.all().delete()
+        rebuild_survey_stats(self.survey)
+        self.assertEqual(sorted(QuestionChoiceCount.objects.values_list(
+            'question_id', 'choice', 'count')), counts)
+
+    def test_migrate(self):
+        """The answers can be moved from one store to the other."""
+        self.respond()
+        self.respond()
+        ids = list(Response.objects.values_list('pk', flat=True))
+        values = answer_values(ids)
+        call_command('migrate_answers', 'unified', '--chunk-size', '1',
+                     stdout=StringIO())
+        self.assertFalse(AnswerBase.objects.exists())
+        self.assertEqual(answer_values(ids, unified=True), values)
+        call_command('migrate_answers', 'legacy', stdout=StringIO())
+        self.assertFalse(Answer.objects.exists())
+        self.assertEqual(AnswerSelectMultipleChoice.objects.count(), 8)
+        self.assertEqual(answer_values(ids), values)
+
+    def test_migrate_mixed_stores(self):
+        """The answers already in the target store are kept."""
+        self.respond()
+        with self.settings(TANUKI_ANSWER_STORE='unified'):
+            self.respond()
+        ids = list(Response.objects.order_by('pk').values_list('pk',
+                                                               flat=True))
+        values = answer_values(ids[:1])
+        values.update(answer_values(ids[1:], unified=True))
+        for i in range(2):
+            out = StringIO()
+            call_command('migrate_answers', 'unified', stdout=out)
+            self.assertEqual(out.getvalue().strip(),
+                             "Moved the answers of %d responses to the "
+                             "unified store" % (1 - i))
+            self.assertFalse(AnswerBase.objects.exists())
+            self.assertEqual(answer_values(ids, unified=True), values)
@@ -0,0 +1,89 @@
+"""Test for survey.archive module and the archival commands."""
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from survey.answers import answer_values
+from survey.export import iter_responses
+from survey.forms import ResponseForm
+from survey.models import (AnswerBase, AnswerSelectMultipleChoice,
+                           ArchivedResponse, Question, QuestionChoiceCount,
+                           QuestionNumericSummary, Response, Survey,
+                           SurveyCompletion)
+from survey.stats import rebuild_survey_stats
+from tests.utils import create_survey, form_data
+
+
+class ArchiveTestCase(TestCase):
+    """Test the archival and restoration of responses."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(pk=create_survey().pk)
+        self.user = User.objects.create_user('user')
+        integer = self.survey.questions().get(question_type=Question.INTEGER)
+        for value in ('10', '20', '3'):
+            data = form_data(self.survey)
+            data['question_%d' % integer.pk] = value
+            form = ResponseForm(data, survey=self.survey, user=self.user)
+            self.assertTrue(form.is_valid())
+            form.save()
+        self.other = create_survey(name='Other')
+        form = ResponseForm(form_data(self.other), survey=self.other,
+                            user=self.user)
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.exported = list(iter_responses(self.survey))
+        self.values = sorted(answer_values(Response.objects.filter(
+            survey=self.survey).values_list('pk', flat=True)).values())
+        Survey.objects.filter(pk=self.survey.pk).update(is_published=False)
+
+    def archive(self):
+        call_command('archive_responses', str(self.survey.pk),
+                     '--chunk-size', '2', stdout=StringIO())
+
+    def test_archive(self):
+        """Archived responses leave the hot tables, not the exports."""
+        self.archive()
+        self.assertEqual(ArchivedResponse.objects.count(), 3)
+        self.assertEqual(list(Response.objects.values_list(
+            'survey_id', flat=True)), [self.other.pk])
+        self.assertEqual(AnswerBase.objects.count(), 7)
+        self.assertEqual(AnswerSelectMultipleChoice.objects.count(), 2)
+        self.assertEqual(SurveyCompletion.objects.count(), 2)
+        self.assertEqual(list(iter_responses(self.survey)), self.exported)
+
+    def test_stats(self):
+        """Rebuilt statistics count the archived answers."""
+        counts = sorted(QuestionChoiceCount.objects.values_list(
+            'question_id', 'choice', 'count'))
+        self.archive()
+        rebuild_survey_stats(self.survey)
+        self.assertEqual(sorted(QuestionChoiceCount.objects.values_list(
+            'question_id', 'choice', 'count')), counts)
+        summary = QuestionNumericSummary.objects.get(
+            question__survey=self.survey)
+        self.assertEqual((summary.count, summary.total, summary.minimum,
+                          summary.maximum), (3, 33, 3, 20))
+
+    def test_restore(self):
+        """Restored responses are the archived ones."""
+        self.archive()
+        call_command('restore_responses', str(self.survey.pk),
+                     '--chunk-size', '2', stdout=StringIO())
+        self.assertFalse(ArchivedResponse.objects.exists())
+        self.assertEqual(list(iter_responses(self.survey)), self.exported)
+        self.assertEqual(sorted(answer_values(Response.objects.filter(
+            survey=self.survey).values_list('pk', flat=True)).values()),
+            self.values)
+        self.assertEqual(AnswerSelectMultipleChoice.objects.count(), 8)
+
+    def test_published(self):
+        """Published surveys are only archived on demand."""
+        with self.assertRaises(CommandError):
+            call_command('archive_responses', str(self.other.pk),
+                         stdout=StringIO())
+        call_command('archive_responses', str(self.other.pk), '--force',
+                     stdout=StringIO())
+        self.assertEqual(ArchivedResponse.objects.count(), 1)
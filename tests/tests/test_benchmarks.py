@@ -0,0 +1,31 @@
+"""Smoke tests for the benchmarks."""
+from django.test import TestCase
+
+from benchmarks import ingestion
+from benchmarks.hot_paths import run
+from survey.models import Response
+
+
+class HotPathsBenchmarkTestCase(TestCase):
+    """Test the hot paths benchmark runs and reports every measure."""
+
+    def test_run(self):
+        report = run(questions=7, categories=2, choices=3, repeat=1)
+        self.assertEqual(report['config']['questions'], 7)
+        results = report['results']
+        self.assertEqual(results['response_form_init']['queries'], 0)
+        self.assertEqual(results['survey_detail_post_steps']['steps'], 7)
+        for result in results.values():
+            self.assertIn('median', result['wall_time'])
+            self.assertIsNotNone(result['peak_memory_kb'])
+
+
+class IngestionBenchmarkTestCase(TestCase):
+    """Test the ingestion benchmark drains every spooled response."""
+
+    def test_run(self):
+        report = ingestion.run(questions=7, responses=20, batch_size=8)
+        self.assertEqual(report['config']['responses'], 20)
+        self.assertEqual(Response.objects.count(), 40)
+        for name in ('synchronous_save', 'spool_append', 'spool_drain'):
+            self.assertIn(name, report['results'])
@@ -0,0 +1,76 @@
+"""Test for survey.export module and the export_responses command."""
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from survey.actions import export_responses_csv
+from survey.export import csv_lines, get_columns, jsonl_lines
+from survey.forms import ResponseForm
+from survey.models import Question, Survey
+from tests.utils import create_survey, form_data
+
+
+class ExportTestCase(TestCase):
+    """Test the export of responses."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(pk=create_survey().pk)
+        self.uuids = []
+        for i in range(3):
+            form = ResponseForm(form_data(self.survey), survey=self.survey,
+                                user=AnonymousUser())
+            self.assertTrue(form.is_valid())
+            self.uuids.append(form.save().interview_uuid)
+        self.multiple = self.survey.questions().get(
+            question_type=Question.SELECT_MULTIPLE)
+        self.integer = self.survey.questions().get(
+            question_type=Question.INTEGER)
+
+    def test_csv(self):
+        """CSV export has a header and one line per response."""
+        lines = list(csv_lines(self.survey, chunk_size=2))
+        rows = list(csv.DictReader(lines))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[0].strip().split(','),
+                         get_columns(self.survey))
+        self.assertEqual([r['interview_uuid'] for r in rows], self.uuids)
+        self.assertEqual(rows[0]['question_%d' % self.multiple.pk], 'a,c')
+        self.assertEqual(rows[0]['question_%d' % self.integer.pk], '42')
+
+    def test_jsonl(self):
+        """JSONL export keeps the value types."""
+        rows = [json.loads(line)
+                for line in jsonl_lines(self.survey, chunk_size=1)]
+        self.assertEqual([r['interview_uuid'] for r in rows], self.uuids)
+        self.assertEqual(rows[2]['question_%d' % self.multiple.pk],
+                         ['a', 'c'])
+        self.assertEqual(rows[2]['question_%d' % self.integer.pk], 42)
+
+    def test_command(self):
+        """The command writes to stdout or to the given file."""
+        out = StringIO()
+        call_command('export_responses', str(self.survey.pk), format='jsonl',
+                     stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'export.csv')
+        call_command('export_responses', str(self.survey.pk), output=path)
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+    def test_admin_action(self):
+        """The admin action streams the export."""
+        qs = Survey.objects.filter(pk=self.survey.pk)
+        response = export_responses_csv(None, None, qs)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(content.splitlines()), 4)
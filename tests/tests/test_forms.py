@@ -0,0 +1,112 @@
+"""Test for survey.forms module."""
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.forms import Textarea
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from survey.forms import ResponseForm
+from survey.models import (AnswerInteger, AnswerRadio, AnswerSelect,
+                           AnswerSelectMultiple, AnswerSelectMultipleChoice,
+                           AnswerText, Response, Survey)
+from survey.schema import get_schema
+from survey.signals import survey_completed
+from tests.utils import create_survey, form_data
+
+
+class ResponseFormSaveTestCase(TestCase):
+    """Test for ResponseForm.save."""
+
+    def save_form(self, survey):
+        form = ResponseForm(form_data(survey), survey=survey,
+                            user=AnonymousUser())
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            response = form.save()
+        return response, len(queries)
+
+    def test_save_answers(self):
+        """Every answer is stored in its own table."""
+        survey = create_survey()
+        received = []
+
+        def receiver(sender, instance, data, **kwargs):
+            received.append(data)
+        survey_completed.connect(receiver)
+        self.addCleanup(survey_completed.disconnect, receiver)
+
+        response, count = self.save_form(survey)
+        self.assertEqual(Response.objects.count(), 1)
+        self.assertEqual(
+            sorted(AnswerText.objects.values_list('body', flat=True)),
+            ['short', 'some long text']
+        )
+        self.assertEqual(AnswerRadio.objects.get().body, 'yes')
+        self.assertEqual(
+            sorted(AnswerSelect.objects.values_list('body', flat=True)),
+            ['dog', 'green']
+        )
+        self.assertEqual(AnswerSelectMultiple.objects.get().body,
+                         "[u'a', u'c']")
+        self.assertEqual(AnswerInteger.objects.get().body, 42)
+        self.assertTrue(all(a.response_id == response.pk and a.created
+                            for a in AnswerText.objects.all()))
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['interview_uuid'],
+                         response.interview_uuid)
+        self.assertEqual(len(received[0]['responses']), 7)
+        self.assertIn((AnswerInteger.objects.get().question_id, 42),
+                      received[0]['responses'])
+
+    def test_save_query_count(self):
+        """The number of queries does not depend on the survey size."""
+        small = self.save_form(create_survey())[1]
+        large = self.save_form(create_survey(repeat=10))[1]
+        self.assertEqual(small, large)
+
+    def test_select_multiple_choices(self):
+        """Selected choices are also stored one per row."""
+        survey = create_survey()
+        response = self.save_form(survey)[0]
+        answer = AnswerSelectMultiple.objects.get(response=response)
+        self.assertEqual(
+            sorted(answer.selected_choices.values_list('choice', flat=True)),
+            ['a', 'c']
+        )
+        self.assertEqual(
+            AnswerSelectMultipleChoice.objects.filter(
+                question=answer.question, choice='c').count(),
+            1
+        )
+
+
+class ResponseFormStepTestCase(TestCase):
+    """Test for ResponseForm in display_by_question mode."""
+
+    def test_step_fields(self):
+        """Only the question of the current step becomes a field."""
+        survey = create_survey(display_by_question=True)
+        questions = list(survey.questions())
+        get_schema(survey)
+        for step, question in enumerate(questions):
+            with self.assertNumQueries(0):
+                form = ResponseForm(survey=survey, user=AnonymousUser(),
+                                    step=step)
+            self.assertEqual(
+                [f for f in form.fields if f.startswith('question_')],
+                ['question_%d' % question.pk]
+            )
+            self.assertEqual(form.steps_count, len(questions))
+            self.assertEqual(form.has_next_step(),
+                             step < len(questions) - 1)
+
+    def test_uncategorized_fields(self):
+        """Questions without category nor required flag get no css class."""
+        survey = create_survey()
+        survey.questions().update(category=None)
+        survey = Survey.objects.get(pk=survey.pk)
+        form = ResponseForm(survey=survey, user=AnonymousUser())
+        text_field = [f for f in form.fields.values()
+                      if isinstance(f.widget, Textarea)][0]
+        self.assertNotIn('class', text_field.widget.attrs)
@@ -0,0 +1,114 @@
+"""Test for survey.importer module and the import_responses command."""
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from survey.answers import answer_values
+from survey.export import csv_lines, jsonl_lines
+from survey.forms import ResponseForm
+from survey.importer import Importer, jsonl_rows
+from survey.models import (AnswerBase, Question, QuestionChoiceCount,
+                           Response, Survey)
+from tests.utils import create_survey, form_data
+
+
+class ImportTestCase(TestCase):
+    """Test the import of responses."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(pk=create_survey().pk)
+        for i in range(3):
+            form = ResponseForm(form_data(self.survey), survey=self.survey,
+                                user=AnonymousUser())
+            self.assertTrue(form.is_valid())
+            form.save()
+        self.values = answer_values(
+            Response.objects.values_list('pk', flat=True))
+        self.uuids = set(
+            Response.objects.values_list('interview_uuid', flat=True))
+        self.integer = self.survey.questions().get(
+            question_type=Question.INTEGER)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as output:
+            for line in lines:
+                if not isinstance(line, bytes):
+                    line = line.encode('utf-8')
+                output.write(line)
+        return path
+
+    def assertImported(self):
+        """The responses are saved as they were before the export."""
+        self.assertEqual(
+            set(Response.objects.values_list('interview_uuid', flat=True)),
+            self.uuids)
+        values = answer_values(
+            Response.objects.values_list('pk', flat=True))
+        self.assertEqual(sorted(values.values()),
+                         sorted(self.values.values()))
+
+    def test_csv(self):
+        """An exported CSV file can be imported back."""
+        path = self.write('export.csv', csv_lines(self.survey))
+        Response.objects.all().delete()
+        stdout = StringIO()
+        call_command('import_responses', str(self.survey.pk), path,
+                     '--chunk-size', '2', stdout=stdout)
+        self.assertIn('Imported 3 responses, rejected 0 rows',
+                      stdout.getvalue())
+        self.assertImported()
+
+    def test_jsonl(self):
+        """An exported JSON lines file can be imported back."""
+        path = self.write('export.jsonl', jsonl_lines(self.survey))
+        Response.objects.all().delete()
+        QuestionChoiceCount.objects.all().delete()
+        call_command('import_responses', str(self.survey.pk), path,
+                     stdout=StringIO())
+        self.assertImported()
+        self.assertEqual(QuestionChoiceCount.objects.get(choice='yes').count,
+                         3)
+
+    def test_reject(self):
+        """Invalid rows are written in the reject file."""
+        lines = list(csv_lines(self.survey))
+        invalid = lines[1].replace(',42\r\n', ',forty-two\r\n')
+        path = self.write('import.csv', lines + [invalid])
+        reject = os.path.join(self.tmpdir, 'reject.csv')
+        stdout = StringIO()
+        call_command('import_responses', str(self.survey.pk), path,
+                     '--reject', reject, stdout=stdout)
+        self.assertIn('Imported 0 responses, rejected 4 rows',
+                      stdout.getvalue())
+        with open(reject) as rejected:
+            rows = list(csv.DictReader(rejected))
+        self.assertEqual(len(rows), 4)
+        # invalid rows are rejected before the chunk is checked
+        self.assertEqual(list(json.loads(rows[0]['errors'])),
+                         ['question_%d' % self.integer.pk])
+        self.assertEqual(json.loads(rows[1]['errors']),
+                         {'interview_uuid': ["Duplicate interview uuid."]})
+        self.assertEqual(Response.objects.count(), 3)
+
+    def test_chunks(self):
+        """Rows are saved in chunks, the reject callback gets the errors."""
+        rejected = []
+        importer = Importer(self.survey, chunk_size=2,
+                            reject=lambda row, errors: rejected.append(row))
+        answers = {'question_%d' % self.integer.pk: '1'}
+        rows = jsonl_rows(
+            [json.dumps(answers)] * 5 + ['not json', '', '{"user": "x"}'])
+        self.assertEqual(importer.run(rows), (5, 2))
+        self.assertEqual(rejected[0], 'not json')
+        self.assertEqual(Response.objects.count(), 8)
+        self.assertEqual(AnswerBase.objects.count(), 21 + 5 * 7)
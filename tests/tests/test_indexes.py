@@ -0,0 +1,13 @@
+"""Test that the hot lookups use the indexes added for them."""
+from django.test import TestCase
+
+from benchmarks.query_plans import report
+
+
+class IndexesTestCase(TestCase):
+    """Test the query plans of the hot lookups."""
+
+    def test_query_plans(self):
+        """Every hot lookup uses its composite or unique index."""
+        for result in report():
+            self.assertTrue(result['uses_index'], result)
@@ -0,0 +1,84 @@
+"""Test for survey.instrumentation module and its middleware."""
+import socket
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from survey.instrumentation import RingBufferSink
+from tests.utils import create_survey, form_data
+
+MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'survey.middleware.InstrumentationMiddleware',
+)
+
+
+class InstrumentationTestCase(TestCase):
+    """Test the metrics recorded for the survey views."""
+
+    def setUp(self):
+        # local stand-in for a StatsD server
+        self.statsd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.statsd.bind(('127.0.0.1', 0))
+        self.statsd.settimeout(5)
+        self.addCleanup(self.statsd.close)
+        RingBufferSink.buffer.clear()
+        self.survey = create_survey()
+        self.url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+
+    def settings(self):
+        return override_settings(
+            MIDDLEWARE_CLASSES=MIDDLEWARE_CLASSES,
+            TANUKI_METRICS_SINKS=[
+                'survey.instrumentation.RingBufferSink',
+                ('survey.instrumentation.StatsdSink',
+                 {'port': self.statsd.getsockname()[1]}),
+            ]
+        )
+
+    def test_detail_metrics(self):
+        """Queries, form build and render times are recorded."""
+        with self.settings():
+            self.client.get(self.url)
+        metrics = RingBufferSink.entries()[0]
+        self.assertEqual(metrics['view'], 'SurveyDetail')
+        self.assertEqual(metrics['status'], 200)
+        self.assertGreater(metrics['queries'], 0)
+        self.assertGreater(metrics['form_build'], 0)
+        self.assertGreater(metrics['render'], 0)
+        self.assertEqual(metrics['form_save'], 0)
+
+        packet = self.statsd.recv(4096).decode('ascii').split('\n')
+        self.assertIn('tanuki.SurveyDetail.queries:%d|c' %
+                      metrics['queries'], packet)
+        self.assertTrue(any(line.startswith('tanuki.SurveyDetail.render:')
+                            for line in packet))
+
+    def test_save_and_template_views(self):
+        """Save time and the render of template views are recorded."""
+        with self.settings():
+            self.client.post(self.url, form_data(self.survey))
+            self.client.get(reverse('survey-list'))
+        index, detail = RingBufferSink.entries()
+        self.assertGreater(detail['form_save'], 0)
+        self.assertEqual(detail['status'], 302)
+        self.assertEqual(index['view'], 'IndexView')
+        self.assertGreater(index['render'], 0)
+
+    def test_other_views(self):
+        """Views outside of the survey app are not instrumented."""
+        with self.settings():
+            self.client.get('/missing/')
+        self.assertEqual(RingBufferSink.entries(), [])
+
+    @override_settings(ROOT_URLCONF='tests.urls')
+    def test_admin_page(self):
+        """The buffered metrics are shown in the admin."""
+        User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.login(username='admin', password='pass')
+        with self.settings():
+            self.client.get(self.url)
+        response = self.client.get(reverse('admin:survey_survey_metrics'))
+        self.assertContains(response, 'SurveyDetail')
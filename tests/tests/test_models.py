@@ -1,4 +1,13 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core import serializers
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from survey.forms import ResponseForm
+from survey.models import Question, QuestionChoice, Survey
+from survey.schema import get_schema
+from tests.utils import create_survey
 
 
 class PostUrlsTestCase(TestCase):
@@ -7,3 +16,78 @@ class PostUrlsTestCase(TestCase):
 
     def test_x(self):
         self.assertEqual(True, True)
+
+
+class QuestionChoiceTestCase(TestCase):
+    """Test the choice rows parsed when a question is saved."""
+
+    def setUp(self):
+        self.survey = create_survey()
+
+    def test_choices(self):
+        question = self.survey.questions().get(question_type=Question.SELECT)
+        self.assertEqual(question.get_choices(),
+                         (('red', 'red'), ('green', 'green'),
+                          ('blue', 'blue')))
+        question.choices = 'blue, yellow'
+        question.save()
+        self.assertEqual(question.get_choices(),
+                         (('blue', 'blue'), ('yellow', 'yellow')))
+        question.question_type = Question.TEXT
+        question.save()
+        self.assertEqual(question.get_choices(), ())
+
+    def test_image_choices(self):
+        """Image sources are stored apart from the values."""
+        question = self.survey.questions().get(
+            question_type=Question.SELECT_IMAGE)
+        self.assertEqual(
+            list(question.question_choices.values_list('value', 'image')),
+            [('cat', '/cat.png'), ('dog', '/dog.png')])
+        form = ResponseForm(survey=self.survey, user=AnonymousUser())
+        html = form['question_%d' % question.pk].as_widget()
+        self.assertIn('src="/dog.png"', html)
+        self.assertIn("'dog');", html)
+
+    def test_separator_change(self):
+        """The choices are parsed again with the new separator."""
+        question = self.survey.questions().get(question_type=Question.RADIO)
+        Question.objects.filter(pk=question.pk).update(choices='yes;no')
+        self.survey.separator = ';'
+        self.survey.save()
+        self.assertEqual(question.get_choices(),
+                         (('yes', 'yes'), ('no', 'no')))
+        schema = get_schema(Survey.objects.get(pk=self.survey.pk))
+        spec = [q for q in schema.questions if q.pk == question.pk][0]
+        self.assertEqual(spec.choices, (('yes', 'yes'), ('no', 'no')))
+
+    def test_without_rows(self):
+        """Without rows, loaded or updated questions parse their choices."""
+        question = self.survey.questions().get(question_type=Question.RADIO)
+        data = serializers.serialize('json', [question])
+        QuestionChoice.objects.all().delete()
+        self.assertEqual(question.get_choices(),
+                         (('yes', 'yes'), ('no', 'no')))
+        for loaded in serializers.deserialize('json', data):
+            loaded.save()
+        self.assertEqual(question.question_choices.count(), 2)
+
+    def test_unchanged_choices(self):
+        """Only the rows of the changed choices are written."""
+        question = self.survey.questions().get(question_type=Question.SELECT)
+        rows = dict(question.question_choices.values_list('value', 'pk'))
+        question.survey = self.survey
+        with CaptureQueriesContext(connection) as queries:
+            question.save_choices()
+        self.assertEqual(len(queries), 1)
+        question.choices = 'red, green, purple, white'
+        question.save()
+        self.assertEqual(question.get_choices(),
+                         (('red', 'red'), ('green', 'green'),
+                          ('purple', 'purple'), ('white', 'white')))
+        kept = dict(question.question_choices.values_list('value', 'pk'))
+        self.assertEqual((kept['red'], kept['green'], kept['purple']),
+                         (rows['red'], rows['green'], rows['blue']))
+        question.choices = 'red, green'
+        question.save()
+        self.assertEqual(question.question_choices.count(), 2)
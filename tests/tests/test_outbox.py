@@ -0,0 +1,63 @@
+"""Test for survey.outbox module."""
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from survey.forms import ResponseForm
+from survey.models import OutboxMessage, Survey
+from survey.outbox import deliver_pending
+from survey.signals import survey_completed
+from tests.utils import create_survey, form_data
+
+
+@override_settings(TANUKI_ASYNC_SIGNALS=True)
+class OutboxTestCase(TestCase):
+    """Test the asynchronous dispatch of survey_completed."""
+
+    def setUp(self):
+        self.received = []
+        survey_completed.connect(self.receiver)
+        self.addCleanup(survey_completed.disconnect, self.receiver)
+        self.fail_delivery = False
+        survey = Survey.objects.get(pk=create_survey().pk)
+        form = ResponseForm(form_data(survey), survey=survey,
+                            user=AnonymousUser(), callback_code='abc')
+        self.assertTrue(form.is_valid())
+        self.response = form.save()
+
+    def receiver(self, sender, instance, data, **kwargs):
+        if self.fail_delivery:
+            raise ValueError("receiver failure")
+        self.received.append((instance, data))
+
+    def test_delivery(self):
+        """The signal is sent by the worker with the same payload."""
+        self.assertEqual(self.received, [])
+        self.assertEqual(OutboxMessage.objects.get().response, self.response)
+        call_command('deliver_survey_events', workers=1, stdout=StringIO())
+        instance, data = self.received[0]
+        self.assertEqual(instance, self.response)
+        self.assertEqual(data['interview_uuid'],
+                         self.response.interview_uuid)
+        self.assertEqual(data['callback_code'], 'abc')
+        self.assertEqual(len(data['responses']), 7)
+        self.assertTrue(all(isinstance(r, tuple) for r in data['responses']))
+        self.assertTrue(OutboxMessage.objects.get().delivered)
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_retry(self):
+        """A failed delivery is retried later."""
+        self.fail_delivery = True
+        self.assertEqual(deliver_pending(), (0, 1))
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('receiver failure', message.last_error)
+        self.assertGreater(message.next_attempt, timezone.now())
+        self.assertEqual(deliver_pending(), (0, 0))
+
+        self.fail_delivery = False
+        OutboxMessage.objects.update(next_attempt=timezone.now())
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(len(self.received), 1)
@@ -0,0 +1,77 @@
+"""Test for survey.routers module."""
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import router
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from survey import routers
+from survey.listing import invalidate_survey_list
+from survey.models import (Category, Question, QuestionChoice, Response,
+                           Survey)
+from tests.utils import create_survey, form_data
+
+MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'survey.middleware.ReplicaPinningMiddleware',
+)
+
+
+@override_settings(DATABASE_ROUTERS=['survey.routers.ReplicaRouter'],
+                   TANUKI_REPLICA_DATABASE='replica',
+                   MIDDLEWARE_CLASSES=MIDDLEWARE_CLASSES)
+class ReplicaRouterTestCase(TestCase):
+    """Test the routing of the reads to the replica."""
+
+    multi_db = True
+
+    def setUp(self):
+        self.survey = create_survey()
+        # replicate the schema, with a different name to know where the
+        # survey is read from.
+        for model in (Survey, Category, Question, QuestionChoice):
+            model.objects.using('replica').bulk_create(model.objects.all())
+        Survey.objects.using('replica').update(name='Replica')
+        invalidate_survey_list()
+        routers.reset()
+        self.addCleanup(routers.reset)
+
+    def survey_names(self):
+        response = self.client.get(reverse('survey-list'))
+        invalidate_survey_list()
+        return [s.name for s in response.context['surveys']]
+
+    def test_routing(self):
+        self.assertEqual(router.db_for_read(Survey), 'replica')
+        self.assertEqual(router.db_for_read(Response), 'default')
+        self.assertEqual(router.db_for_write(Survey), 'default')
+        # reads are pinned to the primary once survey data is written
+        self.assertEqual(router.db_for_read(Survey), 'default')
+        self.assertIsNone(routers.replica_database())
+        routers.reset()
+        self.assertEqual(routers.replica_database(), 'replica')
+
+    def test_read_your_writes(self):
+        """A client reads from the primary after submitting a response."""
+        self.assertEqual(self.survey_names(), ['Replica'])
+        url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+        response = self.client.post(url, form_data(self.survey))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Response.objects.using('default').count(), 1)
+        self.assertFalse(Response.objects.using('replica').exists())
+        self.assertIn('tanuki_primary', response.cookies)
+        self.assertEqual(self.survey_names(), ['Survey'])
+        # until the pin expires
+        del self.client.cookies['tanuki_primary']
+        self.assertEqual(self.survey_names(), ['Replica'])
+
+    def test_export(self):
+        """Exports read the responses from the replica."""
+        url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+        self.client.post(url, form_data(self.survey))
+        routers.reset()
+        stdout = StringIO()
+        call_command('export_responses', str(self.survey.pk), stdout=stdout)
+        # only the header, the response is not replicated
+        self.assertEqual(len(stdout.getvalue().splitlines()), 1)
@@ -0,0 +1,51 @@
+"""Test for survey.schema module."""
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from survey.forms import ResponseForm
+from survey.models import Category, Question, Survey
+from survey.schema import get_schema, local_cache
+from tests.utils import create_survey
+
+
+class SchemaTestCase(TestCase):
+    """Test for the compiled survey schema."""
+
+    def setUp(self):
+        local_cache.clear()
+        self.survey = Survey.objects.get(pk=create_survey().pk)
+
+    def test_schema(self):
+        """The schema holds the ordered questions and parsed choices."""
+        schema = get_schema(self.survey)
+        self.assertEqual(len(schema.questions), len(Question.QUESTION_TYPES))
+        self.assertEqual([c.name for c in schema.categories], ['main'])
+        radio = [q for q in schema.questions
+                 if q.question_type == Question.RADIO][0]
+        self.assertEqual(radio.choices, (('yes', 'yes'), ('no', 'no')))
+        self.assertEqual(radio.category_name, 'main')
+
+    def test_cached_form_construction(self):
+        """Once compiled, building a form does not hit the database."""
+        get_schema(self.survey)
+        with self.assertNumQueries(0):
+            form = ResponseForm(survey=self.survey, user=AnonymousUser())
+        self.assertEqual(form.steps_count, len(Question.QUESTION_TYPES))
+
+    def test_invalidation(self):
+        """Any change to the survey, its questions or categories is seen."""
+        schema = get_schema(self.survey)
+        Question.objects.create(survey=self.survey, order=100, text='new',
+                                category=Category.objects.get())
+        survey = Survey.objects.get(pk=self.survey.pk)
+        self.assertNotEqual(get_schema(survey), schema)
+        self.assertEqual(get_schema(survey).questions[-1].text, 'new')
+
+        Category.objects.filter(survey=survey).get().delete()
+        survey = Survey.objects.get(pk=self.survey.pk)
+        self.assertEqual(get_schema(survey).categories, ())
+
+        survey.separator = ';'
+        survey.save()
+        self.assertNotEqual(survey.schema_version,
+                            get_schema(self.survey).version)
@@ -0,0 +1,162 @@
+"""Test for survey.snapshot module."""
+import ctypes
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import CommandError, call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from survey.analytics import (Filter, answer_counts, crosstab,
+                              numeric_summary, response_count)
+from survey.forms import ResponseForm
+from survey.models import Category, Question, Response
+from survey.snapshot import load_snapshot, refresh_snapshot, snapshot_path
+from tests.tests.test_analytics import RESPONSES, ResultsMixin
+from tests.utils import form_data
+
+
+class SnapshotTestCase(ResultsMixin, TestCase):
+    """Test the columnar snapshots of the answers."""
+
+    def setUp(self):
+        super(SnapshotTestCase, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(TANUKI_SNAPSHOT_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # the snapshot leaves the responses of the last minute out
+        self.created = timezone.now() - datetime.timedelta(seconds=120)
+        Response.objects.update(created=self.created)
+
+    def respond(self, radio):
+        data = form_data(self.survey)
+        data['question_%d' % self.radio.pk] = radio
+        form = ResponseForm(data, survey=self.survey, user=AnonymousUser())
+        self.assertTrue(form.is_valid())
+        return form.save()
+
+    def test_results(self):
+        """The snapshot gives the results of survey.analytics."""
+        self.assertEqual(refresh_snapshot(self.survey), len(RESPONSES))
+        snapshot = load_snapshot(self.survey)
+        self.assertEqual(snapshot._columns, {})
+        for filters in ([], [Filter(self.radio, values=['no'])],
+                        [Filter(self.integer, minimum=15, maximum=35),
+                         Filter(self.multiple, values=['a'])]):
+            self.assertEqual(snapshot.response_count(filters),
+                             response_count(self.survey, filters))
+            for question in (self.radio, self.multiple, self.integer):
+                self.assertEqual(snapshot.answer_counts(question, filters),
+                                 answer_counts(question, filters))
+            self.assertEqual(
+                snapshot.crosstab(self.radio, self.multiple, filters),
+                crosstab(self.radio, self.multiple, filters))
+            self.assertEqual(
+                snapshot.numeric_summary(self.integer, filters, bins=3),
+                numeric_summary(self.integer, filters, bins=3))
+        self.assertEqual(len(snapshot._columns), 3)
+
+    def test_incremental_refresh(self):
+        """Only the responses newer than the high-water date are added."""
+        refresh_snapshot(self.survey)
+        self.assertEqual(refresh_snapshot(self.survey), 0)
+        self.respond('no')
+        self.respond('yes')
+        self.assertEqual(refresh_snapshot(self.survey), 0)
+        # created at the high-water date
+        Response.objects.filter(created__gt=self.created).update(
+            created=self.created)
+        self.assertEqual(refresh_snapshot(self.survey), 2)
+        self.respond('no')
+        self.assertEqual(refresh_snapshot(self.survey), 0)
+        with override_settings(TANUKI_SNAPSHOT_LAG=-60):
+            self.assertEqual(refresh_snapshot(self.survey), 1)
+        snapshot = load_snapshot(self.survey)
+        self.assertEqual(len(snapshot), 7)
+        self.assertEqual(snapshot.answer_counts(self.radio),
+                         [('yes', 3), ('no', 4)])
+        self.assertEqual(refresh_snapshot(self.survey, rebuild=True), 6)
+
+    def test_append_only(self):
+        """A refresh appends the new responses to the end of the file."""
+        refresh_snapshot(self.survey)
+        path = snapshot_path(self.survey)
+        with open(path, 'rb') as snapshot_file:
+            before = snapshot_file.read()
+        refresh_snapshot(self.survey)
+        with open(path, 'rb') as snapshot_file:
+            self.assertEqual(snapshot_file.read(), before)
+        self.respond('no')
+        with override_settings(TANUKI_SNAPSHOT_LAG=-60):
+            self.assertEqual(refresh_snapshot(self.survey), 1)
+        with open(path, 'rb') as snapshot_file:
+            after = snapshot_file.read()
+        self.assertTrue(after.startswith(before))
+        self.assertGreater(len(after), len(before))
+        snapshot = load_snapshot(self.survey)
+        self.assertEqual(len(snapshot._segments), 2)
+        self.assertEqual(snapshot.answer_counts(self.radio),
+                         [('yes', 2), ('no', 3)])
+        # the arrays are read from the map, not copied
+        codes = snapshot.column(self.radio.pk).segments[0]['codes']
+        self.assertIsInstance(codes, ctypes.Array)
+
+    def test_interrupted_save(self):
+        """A segment left incomplete is ignored, then overwritten."""
+        refresh_snapshot(self.survey)
+        path = snapshot_path(self.survey)
+        with open(path, 'ab') as snapshot_file:
+            snapshot_file.write(b'TNKSNAP2\xff\xff\x00\x00{"len')
+        self.assertEqual(len(load_snapshot(self.survey)), len(RESPONSES))
+        self.respond('no')
+        with override_settings(TANUKI_SNAPSHOT_LAG=-60):
+            self.assertEqual(refresh_snapshot(self.survey), 1)
+        snapshot = load_snapshot(self.survey)
+        self.assertEqual(len(snapshot), len(RESPONSES) + 1)
+        self.assertEqual(snapshot.answer_counts(self.radio),
+                         [('yes', 2), ('no', 3)])
+
+    def test_schema_change(self):
+        """A snapshot is rebuilt once the questions change."""
+        refresh_snapshot(self.survey)
+        Question.objects.create(
+            survey=self.survey, order=100, text='New', required=False,
+            question_type=Question.RADIO, choices='x,y',
+            category=Category.objects.get(survey=self.survey))
+        self.assertIsNone(load_snapshot(self.survey))
+        self.assertEqual(refresh_snapshot(self.survey), len(RESPONSES))
+        self.assertTrue(os.path.exists(snapshot_path(self.survey)))
+
+    @override_settings(ROOT_URLCONF='tests.urls')
+    def test_endpoint(self):
+        """The JSON endpoint reads the snapshot when there is one."""
+        User.objects.create_superuser('admin', 'a@b.c', 'pass')
+        self.client.login(username='admin', password='pass')
+        url = reverse('survey-api-analytics', kwargs={'id': self.survey.pk})
+        results = json.loads(self.client.get(url, {
+            'question': self.radio.pk}).content.decode('utf-8'))
+        self.assertNotIn('snapshot', results)
+        refresh_snapshot(self.survey)
+        self.respond('no')
+        results = json.loads(self.client.get(url, {
+            'question': self.radio.pk}).content.decode('utf-8'))
+        self.assertIn('snapshot', results)
+        self.assertEqual(results['counts'], [['yes', 2], ['no', 2]])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('refresh_snapshots', str(self.survey.pk), stdout=out)
+        self.assertEqual(out.getvalue().strip(),
+                         "Added 4 responses to the snapshot of survey %d" %
+                         self.survey.pk)
+        with override_settings(TANUKI_SNAPSHOT_DIR=None):
+            with self.assertRaises(CommandError):
+                call_command('refresh_snapshots', stdout=StringIO())
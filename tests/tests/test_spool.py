@@ -0,0 +1,143 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from mock import patch
+
+from survey.models import (AnswerBase, QuestionChoiceCount, Response,
+                           Survey, SurveyCompletion)
+from survey.signals import survey_completed
+from survey.spool import Spool, drain, get_spool
+from tests.utils import create_survey, form_data
+
+
+class SpoolTestCase(TestCase):
+    """Test the write-behind ingestion of the responses."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        spool_settings = override_settings(
+            TANUKI_SPOOL_PATH=os.path.join(directory, 'spool.sqlite3'))
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        self.addCleanup(lambda: get_spool().close())
+        self.survey = create_survey()
+        self.url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+
+    def post(self):
+        return self.client.post(self.url, form_data(self.survey))
+
+    def test_spool_and_drain(self):
+        """The response is spooled, then saved by the drainer."""
+        received = []
+
+        def receiver(sender, instance, data, **kwargs):
+            received.append(data)
+        survey_completed.connect(receiver)
+        self.addCleanup(survey_completed.disconnect, receiver)
+        response = self.post()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Response.objects.exists())
+        self.assertEqual(get_spool().pending(), 1)
+        out = StringIO()
+        call_command('drain_spool', stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Drained 1 responses")
+        saved = Response.objects.get()
+        self.assertTrue(response['Location'].endswith(
+            saved.interview_uuid + '/'))
+        self.assertEqual(AnswerBase.objects.count(), 7)
+        self.assertEqual(QuestionChoiceCount.objects.get(choice='yes').count,
+                         1)
+        self.assertEqual(received[0]['interview_uuid'], saved.interview_uuid)
+        self.assertEqual(get_spool().pending(), 0)
+
+    def test_submission_date(self):
+        """A drained response is dated from its submission."""
+        submitted = timezone.now() - datetime.timedelta(hours=1)
+        with patch('survey.spool.timezone.now', return_value=submitted):
+            self.post()
+        drain()
+        self.assertEqual(Response.objects.get().created, submitted)
+
+    def test_spool_without_dates(self):
+        """A spool written before the dates were kept is upgraded."""
+        connection = sqlite3.connect(settings.TANUKI_SPOOL_PATH)
+        connection.execute(
+            'CREATE TABLE spooled_response (id INTEGER PRIMARY KEY '
+            'AUTOINCREMENT, survey_id INTEGER NOT NULL, interview_uuid TEXT '
+            'NOT NULL, user_id INTEGER, callback_code TEXT, value_data TEXT '
+            'NOT NULL)')
+        connection.execute(
+            'INSERT INTO spooled_response (survey_id, interview_uuid, '
+            'value_data) VALUES (?, ?, ?)', (self.survey.pk, 'c' * 32, '{}'))
+        connection.commit()
+        connection.close()
+        self.assertIsNone(get_spool().fetch(1)[0].created)
+        self.assertEqual(drain(), 1)
+        self.assertIsNotNone(Response.objects.get().created)
+
+    @override_settings(TANUKI_SPOOL_MAX_PENDING=2)
+    def test_backpressure(self):
+        """A full spool rejects the submissions until it is drained."""
+        self.assertEqual(self.post().status_code, 302)
+        self.assertEqual(self.post().status_code, 302)
+        response = self.post()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(drain(), 2)
+        self.assertEqual(self.post().status_code, 302)
+
+    def test_crash_recovery(self):
+        """A batch saved before a crash is not saved twice."""
+        self.post()
+        self.post()
+        with patch.object(Spool, 'remove', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                drain(batch_size=1)
+        self.assertEqual(Response.objects.count(), 1)
+        self.assertEqual(drain(), 2)
+        self.assertEqual(Response.objects.count(), 2)
+        self.assertEqual(AnswerBase.objects.count(), 14)
+        self.assertEqual(drain(), 0)
+
+    def test_replayed_submission(self):
+        """A replayed form is spooled twice but saved once."""
+        data = form_data(self.survey)
+        data['tanuki_submission_token'] = 'b' * 32
+        self.client.post(self.url, data)
+        self.client.post(self.url, data)
+        self.assertEqual(drain(), 2)
+        self.assertEqual(Response.objects.get().interview_uuid, 'b' * 32)
+
+    def test_deleted_survey(self):
+        """The responses of a deleted survey are dropped."""
+        self.post()
+        Survey.objects.filter(pk=self.survey.pk).delete()
+        self.assertEqual(drain(), 1)
+        self.assertFalse(Response.objects.exists())
+
+    def test_logged_user(self):
+        """Surveys needing a logged user are saved at once."""
+        user = User.objects.create_user('user', password='password')
+        self.client.login(username='user', password='password')
+        Survey.objects.filter(pk=self.survey.pk).update(
+            need_logged_user=True)
+        self.post()
+        self.assertEqual(get_spool().pending(), 0)
+        self.assertTrue(SurveyCompletion.objects.filter(
+            user=user, survey=self.survey).exists())
+
+    def test_not_configured(self):
+        with override_settings(TANUKI_SPOOL_PATH=None):
+            with self.assertRaises(CommandError):
+                call_command('drain_spool', stdout=StringIO())
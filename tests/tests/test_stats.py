@@ -0,0 +1,76 @@
+"""Test for survey.stats module."""
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from survey.forms import ResponseForm
+from survey.models import (Answer, AnswerBase, Question, QuestionChoiceCount,
+                           QuestionNumericSummary, Response, Survey)
+from tests.utils import create_survey, form_data
+
+
+class StatsTestCase(TestCase):
+    """Test the incremental and rebuilt answer statistics."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(pk=create_survey().pk)
+        for value in ('10', '20', '3'):
+            data = form_data(self.survey)
+            integer = self.survey.questions().get(
+                question_type=Question.INTEGER)
+            data['question_%d' % integer.pk] = value
+            form = ResponseForm(data, survey=self.survey,
+                                user=AnonymousUser())
+            self.assertTrue(form.is_valid())
+            form.save()
+
+    def counts(self):
+        return dict(
+            ((c.question.question_type, c.choice), c.count)
+            for c in QuestionChoiceCount.objects.all()
+        )
+
+    def test_incremental(self):
+        """Saving a response updates the statistics."""
+        self.assertEqual(self.counts(), {
+            (Question.RADIO, 'yes'): 3,
+            (Question.SELECT, 'green'): 3,
+            (Question.SELECT_IMAGE, 'dog'): 3,
+            (Question.SELECT_MULTIPLE, 'a'): 3,
+            (Question.SELECT_MULTIPLE, 'c'): 3,
+        })
+        summary = QuestionNumericSummary.objects.get()
+        self.assertEqual((summary.count, summary.total, summary.minimum,
+                          summary.maximum), (3, 33, 3, 20))
+        self.assertEqual(summary.mean, 11.0)
+
+    def test_rebuild(self):
+        """The command recomputes the same statistics."""
+        counts = self.counts()
+        QuestionChoiceCount.objects.update(count=0)
+        QuestionNumericSummary.objects.all().delete()
+        call_command('rebuild_survey_stats', str(self.survey.pk),
+                     stdout=StringIO())
+        self.assertEqual(self.counts(), counts)
+        summary = QuestionNumericSummary.objects.get()
+        self.assertEqual((summary.count, summary.total, summary.minimum,
+                          summary.maximum), (3, 33, 3, 20))
+
+    def test_delete(self):
+        """Deleting responses or answers takes them out of the counts."""
+        Response.objects.filter(
+            pk=Response.objects.order_by('pk')[0].pk).delete()
+        for model in (AnswerBase, Answer):
+            model.objects.filter(
+                question__question_type=Question.RADIO).delete()
+        counts = self.counts()
+        self.assertEqual(counts[(Question.RADIO, 'yes')], 0)
+        self.assertEqual(counts[(Question.SELECT_MULTIPLE, 'a')], 2)
+        summary = QuestionNumericSummary.objects.get()
+        self.assertEqual((summary.count, summary.total), (2, 23))
+
+
+@override_settings(TANUKI_ANSWER_STORE='unified')
+class UnifiedStatsTestCase(StatsTestCase):
+    """Test the statistics of the unified answer table."""
@@ -0,0 +1,95 @@
+import json
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from survey.models import (AnswerBase, AnswerSelectMultipleChoice,
+                           QuestionChoiceCount, Response)
+from survey.signals import survey_completed
+from tests.utils import VALUES, create_survey
+
+
+class SubmissionTestCase(TestCase):
+    """Test the JSON submission API."""
+
+    def setUp(self):
+        self.survey = create_survey()
+        self.url = reverse('survey-api-responses',
+                           kwargs={'id': self.survey.pk})
+        self.answers = dict(
+            (str(q.pk), VALUES[q.question_type])
+            for q in self.survey.questions()
+        )
+
+    def submit(self, payload, content_type='application/json'):
+        return self.client.post(self.url, json.dumps(payload),
+                                content_type=content_type)
+
+    def test_submit(self):
+        """Each response is saved and its interview uuid returned."""
+        received = []
+
+        def receiver(sender, instance, data, **kwargs):
+            received.append(data)
+        survey_completed.connect(receiver)
+        self.addCleanup(survey_completed.disconnect, receiver)
+        response = self.submit({'responses': [
+            {'answers': self.answers, 'callback_code': 'abc'},
+            {'answers': self.answers},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        uuids = json.loads(response.content.decode('utf-8'))[
+            'interview_uuids']
+        self.assertEqual(
+            sorted(uuids),
+            sorted(Response.objects.values_list('interview_uuid', flat=True))
+        )
+        self.assertEqual(AnswerBase.objects.count(), 14)
+        self.assertEqual(AnswerSelectMultipleChoice.objects.count(), 4)
+        self.assertEqual(QuestionChoiceCount.objects.get(choice='yes').count,
+                         2)
+        self.assertEqual([d['interview_uuid'] for d in received], uuids)
+        self.assertEqual(received[0]['callback_code'], 'abc')
+
+    def test_bulk_write(self):
+        """The number of queries does not depend on the batch size."""
+        # warm the schema cache
+        self.submit([{'answers': self.answers}])
+        with CaptureQueriesContext(connection) as single:
+            self.submit([{'answers': self.answers}])
+        with CaptureQueriesContext(connection) as batch:
+            self.submit([{'answers': self.answers}] * 20)
+        self.assertEqual(len(single), len(batch))
+        self.assertEqual(Response.objects.count(), 22)
+
+    def test_validation(self):
+        """A submission with an invalid response is not saved at all."""
+        question = self.survey.questions().get(question_type='integer')
+        invalid = dict(self.answers)
+        invalid[str(question.pk)] = 'forty-two'
+        invalid['0'] = 'unknown'
+        response = self.submit([{'answers': self.answers},
+                                {'answers': invalid}, 'garbage'])
+        self.assertEqual(response.status_code, 400)
+        errors = json.loads(response.content.decode('utf-8'))['errors']
+        self.assertEqual([e['index'] for e in errors], [1, 2])
+        self.assertEqual(sorted(errors[0]['errors']),
+                         sorted(['0', str(question.pk)]))
+        self.assertFalse(Response.objects.exists())
+
+    def test_bad_requests(self):
+        self.assertEqual(self.submit([], 'text/plain').status_code, 415)
+        self.assertEqual(
+            self.client.post(self.url, '{', content_type='application/json'
+                             ).status_code,
+            400)
+        with self.settings(TANUKI_API_MAX_RESPONSES=1):
+            self.assertEqual(self.submit([{'answers': {}}] * 2).status_code,
+                             400)
+        private = create_survey(need_logged_user=True)
+        response = self.client.post(
+            reverse('survey-api-responses', kwargs={'id': private.pk}),
+            '[]', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
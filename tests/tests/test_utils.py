@@ -4,6 +4,8 @@ from django.core.exceptions import ValidationError
 
 from survey.utils import validate_list
 from survey.utils import get_choices
+from survey.utils import parse_choices
+from survey.utils import parse_multiple
 
 
 class UtilsTestCase(TestCase):
@@ -33,3 +35,18 @@ class UtilsTestCase(TestCase):
             get_choices("1;2", separator=";"),
             (('1', '1'), ('2', '2'))
         )
+
+    def test_parse_multiple(self):
+        """Test parse_multiple function."""
+        self.assertEqual(parse_multiple("[u'a', u'b']"), ['a', 'b'])
+        self.assertEqual(parse_multiple("['a']"), ['a'])
+        self.assertEqual(parse_multiple("a"), ['a'])
+        self.assertEqual(parse_multiple(None), [])
+
+    def test_parse_choices(self):
+        """Test parse_choices function."""
+        self.assertEqual(parse_choices("a, b"),
+                         [('a', 'a', ''), ('b', 'b', '')])
+        self.assertEqual(
+            parse_choices("cat:/cat.png;dog", separator=';', images=True),
+            [('cat', 'cat', '/cat.png'), ('dog', 'dog', '')])
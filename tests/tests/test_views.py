@@ -1,4 +1,27 @@
-from django.test import TestCase
+import threading
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.six import StringIO
+from django.utils.six.moves import range
+from mock import Mock, patch
+
+from survey.actions import make_published
+from survey.completion import on_commit
+from survey.drafts import load_values
+from survey.forms import ResponseForm
+from survey.listing import invalidate_survey_list
+from survey.models import (AnswerBase, AnswerSelectMultiple, Question,
+                           Response, ResponseDraft, ResponseDraftValue, Survey,
+                           SurveyCompletion)
+from survey.signals import survey_completed
+from tests.utils import create_survey, form_data
 
 
 class PostUrlsTestCase(TestCase):
@@ -7,3 +30,304 @@ class PostUrlsTestCase(TestCase):
 
     def test_x(self):
         self.assertEqual(True, True)
+
+
+class CompletionTestCase(TestCase):
+    """Test the already answered checks of the views."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+        self.client.login(username='user', password='password')
+        self.survey = Survey.objects.get(
+            pk=create_survey(need_logged_user=True).pk)
+        self.url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+
+    def test_completion(self):
+        """Once answered, the survey redirects to the completed page."""
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.post(self.url, form_data(self.survey))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(SurveyCompletion.objects.filter(
+            user=self.user, survey=self.survey).exists())
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response,
+            reverse('survey-completed', kwargs={'id': self.survey.pk})
+        )
+
+    def test_index_completion(self):
+        """The list of surveys flags the completed ones in one query."""
+        create_survey(name='Other')
+        SurveyCompletion.objects.create(user=self.user, survey=self.survey)
+        response = self.client.get(reverse('survey-list'))
+        surveys = dict((s.name, s.is_completed)
+                       for s in response.context['surveys'])
+        self.assertEqual(surveys, {'Survey': True, 'Other': False})
+
+    def test_on_commit_fallback(self):
+        """Without transaction.on_commit the cache is set right away."""
+        func = Mock()
+        with patch('survey.completion.transaction', Mock(spec=[])):
+            on_commit(func)
+        func.assert_called_once_with()
+
+
+@override_settings(TANUKI_SURVEY_LIST_CACHE='default')
+class IndexViewTestCase(TestCase):
+    """Test the cached list of surveys."""
+
+    def setUp(self):
+        self.survey = create_survey()
+        create_survey(name='Private', need_logged_user=True)
+        create_survey(name='Draft', is_published=False)
+
+    def test_cached_list(self):
+        """The list is annotated and served from the cache."""
+        url = reverse('survey-list')
+        response = self.client.get(url)
+        surveys = response.context['surveys']
+        self.assertEqual([s.name for s in surveys], ['Survey'])
+        self.assertEqual(surveys[0].question_count, 7)
+        self.assertEqual(surveys[0].category_count, 1)
+        self.assertEqual(surveys[0].response_count, 0)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    @override_settings(TANUKI_SURVEY_LIST_CACHE=None)
+    def test_not_cached(self):
+        """Without a cache the list is read from the database."""
+        url = reverse('survey-list')
+        self.client.get(url)
+        Survey.objects.filter(name='Draft').update(is_published=True)
+        response = self.client.get(url)
+        self.assertEqual([s.name for s in response.context['surveys']],
+                         ['Survey', 'Draft'])
+
+    def test_make_published(self):
+        """Publishing surveys from the admin refreshes the list."""
+        url = reverse('survey-list')
+        self.client.get(url)
+        make_published(Mock(), None, Survey.objects.filter(name='Draft'))
+        response = self.client.get(url)
+        self.assertEqual([s.name for s in response.context['surveys']],
+                         ['Survey', 'Draft'])
+
+    @override_settings(TANUKI_SURVEY_LIST_PAGINATE_BY=1)
+    def test_pagination(self):
+        """The list can be paginated."""
+        Survey.objects.filter(name='Draft').update(is_published=True)
+        invalidate_survey_list()
+        response = self.client.get(reverse('survey-list'), {'page': 2})
+        self.assertEqual([s.name for s in response.context['surveys']],
+                         ['Draft'])
+        self.assertEqual(response.context['paginator'].num_pages, 2)
+        response = self.client.get(reverse('survey-list'), {'page': 3})
+        self.assertEqual(response.status_code, 404)
+
+
+class StepSurveyTestCase(TestCase):
+    """Test the multi-step surveys."""
+
+    def setUp(self):
+        self.survey = Survey.objects.get(
+            pk=create_survey(display_by_question=True).pk)
+        self.data = form_data(self.survey)
+
+    def step_url(self, step):
+        return reverse('survey-detail-step',
+                       kwargs={'id': self.survey.pk, 'step': step})
+
+    def test_steps(self):
+        """Each step is stored in the draft, the last one saves it all."""
+        questions = list(self.survey.questions())
+        for step, question in enumerate(questions[:-1]):
+            name = 'question_%d' % question.pk
+            response = self.client.post(self.step_url(step), {
+                name: self.data[name], 'tanuki_callback_code': 'abc'})
+            self.assertRedirects(response, self.step_url(step + 1))
+            self.assertFalse('survey_%d' % self.survey.pk in
+                             self.client.session)
+        self.assertEqual(ResponseDraftValue.objects.count(),
+                         len(questions))
+
+        name = 'question_%d' % questions[-1].pk
+        received = []
+
+        def receiver(sender, instance, data, **kwargs):
+            received.append(data)
+        survey_completed.connect(receiver)
+        self.addCleanup(survey_completed.disconnect, receiver)
+        response = self.client.post(self.step_url(len(questions) - 1), {
+            name: self.data[name], 'tanuki_callback_code': 'abc'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(received[0]['responses']), len(questions))
+        self.assertEqual(received[0]['callback_code'], 'abc')
+        self.assertEqual(AnswerSelectMultiple.objects.get().body,
+                         "[u'a', u'c']")
+        self.assertFalse(ResponseDraft.objects.exists())
+
+    def test_last_step_only(self):
+        """The last step alone redirects to the first missing answer."""
+        questions = list(self.survey.questions())
+        for question in questions[2:4]:
+            question.required = True
+            question.save()
+        name = 'question_%d' % questions[-1].pk
+        response = self.client.post(self.step_url(len(questions) - 1), {
+            name: self.data[name]})
+        self.assertRedirects(response, self.step_url(2),
+                             fetch_redirect_response=False)
+        self.assertFalse(Response.objects.exists())
+        self.assertTrue(ResponseDraft.objects.exists())
+
+    def test_clear_expired_drafts(self):
+        """Expired drafts are ignored and removed by the command."""
+        question = self.survey.questions()[0]
+        name = 'question_%d' % question.pk
+        self.client.post(self.step_url(0), {name: self.data[name]})
+        draft = ResponseDraft.objects.get()
+        self.assertEqual(load_values(self.survey, draft.key),
+                         {name: self.data[name],
+                          'tanuki_callback_code': ''})
+        ResponseDraft.objects.update(expires=timezone.now())
+        self.assertEqual(load_values(self.survey, draft.key), {})
+        call_command('clear_expired_drafts', stdout=StringIO())
+        self.assertFalse(ResponseDraftValue.objects.exists())
+        self.assertFalse(ResponseDraft.objects.exists())
+
+
+@override_settings(TANUKI_FRAGMENT_CACHE='default')
+class FragmentCacheTestCase(TestCase):
+    """Test the cache of the rendered questions."""
+
+    def setUp(self):
+        self.survey = create_survey()
+        self.url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+
+    def test_cached_questions(self):
+        """A cache hit neither builds the form nor renders its widgets."""
+        first = self.client.get(self.url, {'callback_code': 'abc'})
+        self.assertContains(first, 'name="question_')
+        with patch('survey.views.ResponseForm') as form_class:
+            second = self.client.get(self.url, {'callback_code': 'xyz'})
+        self.assertFalse(form_class.called)
+        self.assertEqual(second.context['questions_html'],
+                         first.context['questions_html'])
+        self.assertContains(second, 'value="xyz"')
+
+    def test_invalidation(self):
+        """Changing the survey renders the questions again."""
+        self.client.get(self.url)
+        self.survey.questions().filter(
+            question_type=Question.TEXT).get().delete()
+        with patch('survey.views.ResponseForm',
+                   side_effect=ResponseForm) as form_class:
+            self.client.get(self.url)
+        self.assertTrue(form_class.called)
+
+    def test_logged_user(self):
+        """Logged users are not served from the cache."""
+        User.objects.create_user('user', password='password')
+        self.client.login(username='user', password='password')
+        self.client.get(self.url)
+        with patch('survey.views.ResponseForm',
+                   side_effect=ResponseForm) as form_class:
+            self.client.get(self.url)
+        self.assertTrue(form_class.called)
+
+
+class SubmissionTokenTestCase(TestCase):
+    """Test the protection against replayed submissions."""
+
+    def setUp(self):
+        self.survey = create_survey()
+        self.url = reverse('survey-detail', kwargs={'id': self.survey.pk})
+
+    def test_replay(self):
+        """A replayed post returns the original response."""
+        token = self.client.get(self.url).context['submission_token']
+        data = form_data(self.survey)
+        data['tanuki_submission_token'] = token
+        first = self.client.post(self.url, data)
+        self.assertRedirects(first, reverse('survey-confirmation',
+                                            kwargs={'uuid': token}))
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(self.url, data)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(Response.objects.get().interview_uuid, token)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'survey_answer' in query['sql']])
+
+    def test_replay_last_step(self):
+        """A replayed last step returns the original response."""
+        survey = create_survey(name='Steps', display_by_question=True)
+        survey.questions().update(required=True)
+        data = form_data(survey)
+        questions = list(survey.questions())
+        url = reverse('survey-detail-step',
+                      kwargs={'id': survey.pk, 'step': len(questions) - 1})
+        name = 'question_%d' % questions[-1].pk
+        post = {
+            name: data[name],
+            'tanuki_submission_token': self.client.get(
+                url).context['submission_token'],
+        }
+        for step, question in enumerate(questions[:-1]):
+            name = 'question_%d' % question.pk
+            self.client.post(reverse('survey-detail-step', kwargs={
+                'id': survey.pk, 'step': step}), {name: data[name]})
+        first = self.client.post(url, post)
+        self.assertRedirects(first, reverse('survey-confirmation', kwargs={
+            'uuid': post['tanuki_submission_token']}))
+        second = self.client.post(url, post)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(Response.objects.count(), 1)
+        self.assertFalse(ResponseDraft.objects.exists())
+
+    def test_invalid_token(self):
+        """A malformed token is replaced by a fresh one."""
+        data = form_data(self.survey)
+        data['tanuki_submission_token'] = 'not-a-token'
+        self.client.post(self.url, data)
+        self.client.post(self.url, data)
+        self.assertEqual(Response.objects.count(), 2)
+
+
+class ConcurrentSubmissionTestCase(TransactionTestCase):
+    """Test parallel posts of the same form."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db(
+                connection.settings_dict['NAME']) and \
+                not connection.features.can_share_in_memory_db:
+            self.skipTest("The threads cannot share an in-memory database.")
+
+    def test_parallel_posts(self):
+        """Identical posts sent in parallel save a single response."""
+        survey = create_survey()
+        url = reverse('survey-detail', kwargs={'id': survey.pk})
+        data = form_data(survey)
+        data['tanuki_submission_token'] = 'a' * 32
+        locations = []
+        errors = []
+        start = threading.Event()
+
+        def post():
+            start.wait()
+            try:
+                locations.append(Client().post(url, data)['Location'])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=post) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(locations)), 1)
+        self.assertTrue(locations[0].endswith('a' * 32 + '/'))
+        self.assertEqual(Response.objects.count(), 1)
+        self.assertEqual(AnswerBase.objects.count(), 7)
@@ -0,0 +1,46 @@
+"""Helpers shared by the test cases."""
+from survey.models import Category, Question, Survey
+
+CHOICES = {
+    Question.RADIO: 'yes,no',
+    Question.SELECT: 'red,green,blue',
+    Question.SELECT_IMAGE: 'cat:/cat.png,dog:/dog.png',
+    Question.SELECT_MULTIPLE: 'a,b,c',
+}
+
+VALUES = {
+    Question.TEXT: 'some long text',
+    Question.SHORT_TEXT: 'short',
+    Question.RADIO: 'yes',
+    Question.SELECT: 'green',
+    Question.SELECT_IMAGE: 'dog',
+    Question.SELECT_MULTIPLE: ['a', 'c'],
+    Question.INTEGER: '42',
+}
+
+
+def create_survey(repeat=1, **kwargs):
+    """Create a published survey with `repeat` questions of each type."""
+    defaults = {'name': 'Survey', 'description': 'A survey',
+                'is_published': True}
+    defaults.update(kwargs)
+    survey = Survey.objects.create(**defaults)
+    category = Category.objects.create(name='main', survey=survey, order=1)
+    order = 0
+    for i in range(repeat):
+        for question_type, label in Question.QUESTION_TYPES:
+            order += 1
+            Question.objects.create(
+                survey=survey, category=category, order=order,
+                text='%s %d' % (label, i), question_type=question_type,
+                choices=CHOICES.get(question_type)
+            )
+    return survey
+
+
+def form_data(survey):
+    """Return valid POST data answering every question of the survey."""
+    return dict(
+        ('question_%d' % q.pk, VALUES[q.question_type])
+        for q in survey.questions()
+    )